@@ -0,0 +1,7 @@
+"""
+Benchmarks del Data Connector.
+
+Ejecutar desde la raíz del repo:
+  python -m bench.run_bench --quick
+  python -m bench.compare bench/results/<a>.json bench/baseline.json
+"""
@@ -0,0 +1,352 @@
+"""
+Micro-benchmarks del camino de datos de DataLoader.
+
+Mide, sobre los mismos fixtures en cada corrida:
+
+  - load: load_from_file por formato (csv, parquet, feather, json, duckdb)
+  - encode: serialización Arrow IPC por batch (DataLoader._serialize_batch)
+    + compresión de transferencia, por max_chunksize, codec
+    (none, zstd con varios niveles, lz4) y con/sin transfer_optimize
+  - generate: load_or_generate_dataset a 1M/10M filas
+
+Cada operación corre en un proceso nuevo (spawn) para que la memoria pico y
+el estado de cachés no dependan de las operaciones anteriores. Por operación
+se reporta tiempo, throughput, RSS pico y pico de memoria del pool de Arrow.
+
+Los fixtures se generan una vez con semilla fija en bench/fixtures/ (a partir
+del dataset sintético de ventas) y se reutilizan mientras existan.
+
+Uso (desde la raíz del repo):
+  python -m bench.bench_data_loader --quick
+  python -m bench.bench_data_loader --rows 1000000 --chunksize 16384 65536 262144 \\
+      --codecs none zstd:1 zstd:3 zstd:9 lz4 --generate-rows 1000000 10000000
+  python -m bench.bench_data_loader --ops encode --baseline bench/baseline-data-loader.json
+"""
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import pyarrow as pa
+
+import data_loader as data_loader_module
+from bench.compare import compare, format_report
+from bench.harness import environment_info, write_results
+from data_loader import DataLoader
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+try:
+    import zstandard as zstd
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+logger = logging.getLogger("bench.data_loader")
+
+BENCH_DIR = Path(__file__).resolve().parent
+FIXTURES_DIR = BENCH_DIR / "fixtures"
+FORMATS = ("csv", "parquet", "feather", "json", "duckdb")
+
+
+# =============================================================================
+# Medición
+# =============================================================================
+
+class Measure:
+    """
+    Mide el bloque: duración, RSS pico y pico de bytes del pool de Arrow
+    (muestreados en un hilo; los picos muy breves pueden escaparse).
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.process = psutil.Process() if PSUTIL_AVAILABLE else None
+        self.pool = pa.default_memory_pool()
+        self.result: dict = {}
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _sample(self):
+        if self.process is not None:
+            self._rss_peak = max(self._rss_peak, self.process.memory_info().rss)
+        self._arrow_peak = max(self._arrow_peak, self.pool.bytes_allocated())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._rss_start = self._rss_peak = self.process.memory_info().rss if self.process else 0
+        self._arrow_start = self._arrow_peak = self.pool.bytes_allocated()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self._started
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        self.result = {
+            "seconds": round(seconds, 4),
+            "rss_peak_mb": round((self._rss_peak - self._rss_start) / 1024 / 1024, 1) if self.process else None,
+            "arrow_peak_mb": round((self._arrow_peak - self._arrow_start) / 1024 / 1024, 1),
+        }
+        return False
+
+
+# =============================================================================
+# Fixtures
+# =============================================================================
+
+def fixture_name(rows: int) -> str:
+    return f"bench_{rows}"
+
+
+def write_fixtures(directory: Path, rows: int, seed: int, formats=FORMATS) -> Path:
+    """Escribe el dataset sintético (semilla fija) en cada formato, si falta"""
+    import duckdb
+    import pyarrow.csv as pcsv
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    directory.mkdir(parents=True, exist_ok=True)
+    name = fixture_name(rows)
+    missing = [fmt for fmt in formats if not (directory / f"{name}.{fmt}").exists()]
+    if not missing:
+        return directory
+
+    logger.info(f"Writing fixtures {name} ({rows:,} rows): {', '.join(missing)}")
+    loader = DataLoader()
+    loader.synthetic_seed = seed
+    loader.load_or_generate_dataset(rows=rows)
+    table = pa.Table.from_batches(loader.get_record_batches(as_bytes=False), schema=loader.get_schema())
+
+    for fmt in missing:
+        path = directory / f"{name}.{fmt}"
+        tmp = path.with_name(path.name + ".tmp")
+        if fmt == "csv":
+            pcsv.write_csv(table, tmp)
+        elif fmt == "parquet":
+            pq.write_table(table, tmp)
+        elif fmt == "feather":
+            feather.write_feather(table, tmp)
+        elif fmt == "json":
+            # Lista de registros: lo que DataLoader lee con pandas.read_json
+            table.to_pandas().to_json(tmp, orient="records")
+        elif fmt == "duckdb":
+            # DataLoader lee la tabla 'data'
+            con = duckdb.connect(str(tmp))
+            try:
+                con.register("fixture", table)
+                con.execute("CREATE TABLE data AS SELECT * FROM fixture")
+            finally:
+                con.close()
+        tmp.replace(path)
+    return directory
+
+
+def make_codec(codec: str):
+    """
+    'none', 'zstd[:nivel]' o 'lz4' -> función bytes -> bytes (o None).
+    lz4 (frame, vía pyarrow) se mide como alternativa: hoy el cable sólo usa zstd.
+    """
+    name, _, level = codec.partition(":")
+    if name == "none":
+        return None
+    if name == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("zstandard is not installed")
+        return zstd.ZstdCompressor(level=int(level) if level else 3).compress
+    if name == "lz4":
+        lz4 = pa.Codec("lz4")
+        return lambda data: lz4.compress(data, asbytes=True)
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+# =============================================================================
+# Operaciones (corren en el proceso hijo)
+# =============================================================================
+
+def _loader(fixtures_dir: str) -> DataLoader:
+    data_loader_module.DATASETS_DIR = Path(fixtures_dir)
+    return DataLoader()
+
+
+def op_load(fixtures_dir: str, rows: int, fmt: str) -> dict:
+    loader = _loader(fixtures_dir)
+    file_name = f"{fixture_name(rows)}.{fmt}"
+    with Measure() as m:
+        ok = loader.load_from_file(file_name)
+    if not ok:
+        raise RuntimeError(f"Could not load {file_name}")
+    file_mb = (Path(fixtures_dir) / file_name).stat().st_size / 1024 / 1024
+    return {
+        **m.result,
+        "rows_loaded": loader.total_records,
+        "file_mb": round(file_mb, 2),
+        "table_mb": round(loader.total_bytes / 1024 / 1024, 2),
+        "throughput_mb_s": round(file_mb / m.result["seconds"], 2),
+        "rows_per_s": round(loader.total_records / m.result["seconds"]),
+    }
+
+
+def op_encode(fixtures_dir: str, rows: int, chunksize: int, codec: str, optimize: str = "off") -> dict:
+    loader = _loader(fixtures_dir)
+    if not loader.load_from_file(f"{fixture_name(rows)}.feather"):
+        raise RuntimeError("Could not load the feather fixture")
+    compress = make_codec(codec)
+    loader.transfer_optimize = optimize == "on"
+    batches = loader.get_partition_batches(max_chunksize=chunksize)
+    arrow_bytes = wire_bytes = 0
+    encode_s = compress_s = 0.0
+    with Measure() as m:
+        # El análisis del esquema (una vez por dataset) entra en la medición
+        schema = loader.get_transfer_schema(loader._table)
+        for batch in batches:
+            started = time.perf_counter()
+            data = DataLoader._serialize_batch(DataLoader._transfer_batch(batch, schema), schema)
+            encoded = time.perf_counter()
+            arrow_bytes += len(data)
+            if compress:
+                data = compress(data)
+            wire_bytes += len(data)
+            compress_s += time.perf_counter() - encoded
+            encode_s += encoded - started
+    seconds = m.result["seconds"]
+    return {
+        **m.result,
+        "batches": len(batches),
+        "encode_ms": round(encode_s * 1000, 2),
+        "compress_ms": round(compress_s * 1000, 2),
+        "arrow_mb": round(arrow_bytes / 1024 / 1024, 2),
+        "wire_mb": round(wire_bytes / 1024 / 1024, 2),
+        "compression_ratio": round(arrow_bytes / wire_bytes, 3) if wire_bytes else None,
+        "throughput_mb_s": round(arrow_bytes / 1024 / 1024 / seconds, 2),
+        "rows_per_s": round(loader.total_records / seconds),
+    }
+
+
+def op_generate(rows: int, seed: int) -> dict:
+    loader = DataLoader()
+    loader.synthetic_seed = seed
+    with Measure() as m:
+        loader.load_or_generate_dataset(rows=rows)
+    return {
+        **m.result,
+        "table_mb": round(loader.total_bytes / 1024 / 1024, 2),
+        "rows_per_s": round(rows / m.result["seconds"]),
+    }
+
+
+OPERATIONS = {"load": op_load, "encode": op_encode, "generate": op_generate}
+
+
+def run_op(op: str, isolate: bool, **params) -> dict:
+    """Ejecuta una operación (en un proceso nuevo si isolate) y arma su resultado"""
+    key = f"{op}/" + "/".join(f"{k}={v}" for k, v in params.items() if k != "fixtures_dir")
+    result = {"key": key, "op": op, **{k: v for k, v in params.items() if k != "fixtures_dir"}}
+    try:
+        if isolate:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                result.update(pool.submit(OPERATIONS[op], **params).result())
+        else:
+            result.update(OPERATIONS[op](**params))
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+
+def run_suite(args) -> list[dict]:
+    results = []
+
+    def record(result: dict):
+        if result.get("error"):
+            logger.error(f"{result['key']}: {result['error']}")
+        else:
+            logger.info(f"{result['key']}: {result['seconds']:.3f}s, "
+                        f"{result.get('throughput_mb_s', '-')} MB/s, RSS +{result['rss_peak_mb']} MB, "
+                        f"Arrow +{result['arrow_peak_mb']} MB")
+        results.append(result)
+
+    if "load" in args.ops or "encode" in args.ops:
+        formats = args.formats if "load" in args.ops else ["feather"]
+        write_fixtures(args.fixtures, args.rows, args.seed, sorted(set(formats) | {"feather"}))
+
+    fixtures_dir = str(args.fixtures)
+    if "load" in args.ops:
+        for fmt in args.formats:
+            record(run_op("load", args.isolate, fixtures_dir=fixtures_dir, rows=args.rows, fmt=fmt))
+    if "encode" in args.ops:
+        for chunksize in args.chunksize:
+            for codec in args.codecs:
+                for optimize in args.optimize:
+                    record(run_op("encode", args.isolate, fixtures_dir=fixtures_dir, rows=args.rows,
+                                  chunksize=chunksize, codec=codec, optimize=optimize))
+    if "generate" in args.ops:
+        for rows in args.generate_rows:
+            record(run_op("generate", args.isolate, rows=rows, seed=args.seed))
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="DataLoader micro-benchmarks (load, encode, generate)")
+    parser.add_argument("--ops", nargs="+", default=list(OPERATIONS), choices=list(OPERATIONS))
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Fixture size for load/encode")
+    parser.add_argument("--formats", nargs="+", default=list(FORMATS), choices=FORMATS)
+    parser.add_argument("--chunksize", nargs="+", type=int, default=[16_384, 65_536, 262_144],
+                        help="max_chunksize values for encode")
+    parser.add_argument("--codecs", nargs="+", default=["none", "zstd:1", "zstd:3", "zstd:9", "lz4"],
+                        help="Transfer codecs: none, zstd[:level], lz4")
+    parser.add_argument("--optimize", nargs="+", default=["off", "on"], choices=["off", "on"],
+                        help="Encode with DataLoader.transfer_optimize off and/or on")
+    parser.add_argument("--generate-rows", nargs="+", type=int, default=[1_000_000, 10_000_000])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--fixtures", type=Path, default=FIXTURES_DIR)
+    parser.add_argument("--no-isolate", dest="isolate", action="store_false",
+                        help="Run every operation in this process (memory peaks become cumulative)")
+    parser.add_argument("--quick", action="store_true",
+                        help="100k-row fixtures, chunksize 65536, codecs none/zstd:3, generate 1M rows")
+    parser.add_argument("--output", type=Path,
+                        help="Results file (default: bench/results/data_loader-<timestamp>.json)")
+    parser.add_argument("--baseline", type=Path, help="Compare against a previous results file")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in %%")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.rows, args.chunksize, args.codecs, args.generate_rows = 100_000, [65_536], ["none", "zstd:3"], [1_000_000]
+    return args
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    args = parse_args(argv)
+
+    meta = environment_info()
+    meta["args"] = {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()}
+    results = run_suite(args)
+
+    output = args.output or BENCH_DIR / "results" / f"data_loader-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    write_results(output, meta, results)
+    logger.info(f"Results written to {output}")
+
+    if args.baseline:
+        rows = compare({"results": results}, json.loads(args.baseline.read_text()), args.threshold)
+        print(format_report(rows))
+        if args.fail_on_regression and any(r["regression"] for r in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
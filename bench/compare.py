@@ -0,0 +1,118 @@
+"""
+Comparación de resultados de benchmark contra un baseline.
+
+Las celdas se emparejan por su configuración (transporte, dataset, filas,
+particiones, compresión, concurrencia), o por su campo 'key' si lo tienen
+(micro-benchmarks de bench_data_loader). Cada métrica se marca como regresión
+si empeora más que el umbral (%) respecto del baseline.
+
+Uso:
+  python -m bench.compare bench/results/bench-20250101-120000.json bench/baseline.json
+  python -m bench.compare actual.json baseline.json --threshold 5 --fail-on-regression
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Campos que identifican una celda de la matriz
+KEY_FIELDS = ("transport", "dataset", "rows", "partitions", "compression", "concurrency")
+
+# Métrica -> dirección buena (+1 = mayor es mejor, -1 = menor es mejor)
+METRICS = {
+    "throughput_mb_s": +1,
+    "rows_per_s": +1,
+    "ttfb_ms.p50": -1,
+    "ttfb_ms.p99": -1,
+    "latency_ms.p50": -1,
+    "latency_ms.p99": -1,
+    "rss_peak_mb": -1,
+    "cpu_seconds_per_query": -1,
+    "seconds": -1,
+    "arrow_peak_mb": -1,
+}
+
+
+def cell_key(cell: dict) -> tuple:
+    if "key" in cell:
+        return (cell["key"],)
+    return tuple(cell.get(field) for field in KEY_FIELDS)
+
+
+def cell_label(cell: dict) -> str:
+    if "key" in cell:
+        return cell["key"]
+    return (f"{cell['transport']}/{cell['dataset']}/{cell['rows'] or '-'}/p{cell['partitions']}"
+            f"/{cell['compression']}/c{cell['concurrency']}")
+
+
+def _get(cell: dict, path: str):
+    value = cell
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def compare(results: dict, baseline: dict, threshold: float = 10.0) -> list[dict]:
+    """
+    Compara dos archivos de resultados ya cargados.
+
+    Returns:
+        Una fila por (celda, métrica) presente en ambos, con el cambio en % y
+        'regression' = True si empeoró más que threshold
+    """
+    base_cells = {cell_key(c): c for c in baseline.get("results", [])}
+    rows = []
+    for cell in results.get("results", []):
+        base = base_cells.get(cell_key(cell))
+        if base is None:
+            continue
+        for metric, direction in METRICS.items():
+            current, previous = _get(cell, metric), _get(base, metric)
+            if current is None or not previous:
+                continue
+            change = (current - previous) / previous * 100
+            rows.append({
+                "cell": cell_label(cell),
+                "metric": metric,
+                "baseline": previous,
+                "current": current,
+                "change_pct": round(change, 1),
+                "regression": change * direction < -threshold,
+            })
+    return rows
+
+
+def format_report(rows: list[dict]) -> str:
+    """Tabla legible con las comparaciones (regresiones marcadas con !!)"""
+    if not rows:
+        return "No matching cells between results and baseline."
+    lines = [f"{'cell':<48} {'metric':<22} {'baseline':>12} {'current':>12} {'change':>8}"]
+    for row in rows:
+        label = row["cell"]
+        flag = " !!" if row["regression"] else ""
+        lines.append(f"{label:<48} {row['metric']:<22} {row['baseline']:>12.2f} {row['current']:>12.2f} "
+                     f"{row['change_pct']:>+7.1f}%{flag}")
+    regressions = sum(1 for r in rows if r["regression"])
+    lines.append(f"\n{regressions} regression(s) in {len(rows)} comparisons")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare benchmark results against a baseline")
+    parser.add_argument("results", type=Path, help="Results JSON from bench.run_bench")
+    parser.add_argument("baseline", type=Path, help="Baseline JSON")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in %% (default: 10)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 on regressions")
+    args = parser.parse_args()
+
+    rows = compare(json.loads(args.results.read_text()), json.loads(args.baseline.read_text()), args.threshold)
+    print(format_report(rows))
+    if args.fail_on_regression and any(r["regression"] for r in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+"""
+Gateways locales de reemplazo para benchmarks.
+
+Implementan el lado Gateway de ambos transportes para que bench/ pueda
+manejar un conector real sin el Gateway de producción:
+
+  - GrpcGateway: ConnectorService.Connect (add_ConnectorServiceServicer_to_server)
+  - WebSocketGateway: protocolo JSON + chunks binarios con request_id de 36 bytes,
+    incluyendo chunks repartidos entre varias conexiones (stripe_requests), que
+    se reordenan por su secuencia de 4 bytes
+
+Ambos exponen la misma API async:
+    await gateway.start()
+    await gateway.wait_registered()
+    info = await gateway.flight_info("sales", rows=1_000_000)
+    result = await gateway.do_get(partition=0, total_partitions=info.partitions)
+    await gateway.stop()
+"""
+import asyncio
+import base64
+import itertools
+import json
+import struct
+import time
+import uuid
+from dataclasses import dataclass
+
+import grpc
+import pyarrow as pa
+import websockets
+
+from proto import connector_pb2, connector_pb2_grpc
+
+try:
+    import zstandard as zstd
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+
+@dataclass
+class FlightInfoResult:
+    total_records: int
+    total_bytes: int
+    partitions: int
+    dataset: str
+    latency: float  # Segundos desde el comando hasta la respuesta
+    version: str | None = None
+    not_modified: bool = False
+    error: str | None = None
+
+
+@dataclass
+class TransferResult:
+    partition: int
+    wire_bytes: int
+    chunks: int
+    ttfb: float          # Segundos hasta el primer chunk
+    duration: float      # Segundos hasta el stream_end
+    queue_wait: float | None = None  # Segundos hasta el stream_start (espera en la cola del conector)
+    rows: int | None = None  # Sólo con verify=True
+    error: str | None = None
+    high_watermark: str | None = None  # stream_end de un DoGet con watermark
+    version: str | None = None
+    not_modified: bool = False  # stream_end sin datos: known_version seguía vigente
+
+
+def _make_ticket(partition: int, total_partitions: int, watermark: dict | None = None,
+                 known_version: str | None = None, query: str | None = None) -> str:
+    """
+    Ticket igual al que genera el Gateway: base64 de JSON con la partición
+    (y opcionalmente el watermark, la versión cacheada y la consulta SQL)
+    """
+    ticket = {"partition": partition, "total_partitions": total_partitions}
+    if watermark:
+        ticket["watermark"] = watermark
+    if known_version:
+        ticket["known_version"] = known_version
+    if query:
+        ticket["query"] = query
+    data = json.dumps(ticket)
+    return base64.b64encode(data.encode("utf-8")).decode("ascii")
+
+
+def count_rows(chunks: list[bytes], compression: str) -> int:
+    """Decodifica los chunks (IPC stream independiente por batch) y cuenta filas"""
+    decompressor = zstd.ZstdDecompressor() if compression == "zstd" and ZSTD_AVAILABLE else None
+    rows = 0
+    for chunk in chunks:
+        if decompressor:
+            chunk = decompressor.decompress(chunk)
+        rows += pa.ipc.open_stream(chunk).read_all().num_rows
+    return rows
+
+
+class _Stream:
+    """Estado de un request en curso del lado Gateway"""
+
+    def __init__(self, verify: bool, kind: str = "do_get"):
+        self.verify = verify
+        self.kind = kind  # 'get_flight_info' o 'do_get'
+        self.sent_at = time.perf_counter()
+        self.started_at: float | None = None  # stream_start
+        self.first_chunk_at: float | None = None
+        self.last_chunk_at: float | None = None
+        self.ended_at: float | None = None
+        self.wire_bytes = 0
+        self.chunks = 0
+        self.expected_chunks: int | None = None  # WebSocket: total_chunks del stream_end
+        self.compression = "none"
+        # Striping: cada chunk empieza con su secuencia (uint32 big-endian). Puede
+        # llegar antes que el stream_start, así que se guarda tal cual y se ordena al final
+        self.chunk_seq = False
+        self.payloads: list[bytes] = []
+        self.error: str | None = None
+        self.high_watermark: str | None = None
+        self.version: str | None = None
+        self.not_modified = False
+        self.response: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.done: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    def on_chunk(self, data: bytes):
+        self.last_chunk_at = time.perf_counter()
+        if self.first_chunk_at is None:
+            self.first_chunk_at = self.last_chunk_at
+        self.wire_bytes += len(data)
+        self.chunks += 1
+        if self.verify:
+            self.payloads.append(data)
+        self._maybe_done()
+
+    def on_start(self, compression: str | None, version: str | None = None, chunk_seq: bool = False):
+        self.started_at = time.perf_counter()
+        self.compression = compression or "none"
+        self.version = version or None
+        self.chunk_seq = bool(chunk_seq)
+
+    def on_end(self, error: str | None = None, expected_chunks: int | None = None,
+               high_watermark=None, version: str | None = None, not_modified: bool = False):
+        self.error = error or None
+        self.version = version or self.version
+        self.not_modified = bool(not_modified)
+        self.high_watermark = str(high_watermark) if high_watermark not in (None, "") else None
+        self.expected_chunks = expected_chunks
+        self.ended_at = time.perf_counter()
+        if self.kind == "get_flight_info" and self.error and not self.response.done():
+            self.response.set_exception(ConnectionError(self.error))
+        self._maybe_done()
+
+    def _maybe_done(self):
+        if self.done.done() or self.ended_at is None:
+            return
+        # Con striping los últimos chunks pueden llegar por otro socket después del stream_end
+        if self.expected_chunks is not None and self.chunks < self.expected_chunks and not self.error:
+            return
+        self.done.set_result(None)
+
+    def ordered_payloads(self) -> list[bytes]:
+        """Payloads en orden de envío (sin la secuencia de los chunks con striping)"""
+        if not self.chunk_seq:
+            return self.payloads
+        ordered = sorted(self.payloads, key=lambda p: struct.unpack_from('>I', p)[0])
+        if [struct.unpack_from('>I', p)[0] for p in ordered] != list(range(len(ordered))):
+            self.error = self.error or "Striped chunk sequence has gaps or duplicates"
+        return [p[4:] for p in ordered]
+
+    def result(self, partition: int) -> TransferResult:
+        finished = max(self.ended_at, self.last_chunk_at or 0)
+        payloads = self.ordered_payloads() if self.verify else self.payloads
+        rows = count_rows(payloads, self.compression) if self.verify and not self.error else None
+        return TransferResult(
+            partition=partition,
+            wire_bytes=self.wire_bytes,
+            chunks=self.chunks,
+            ttfb=(self.first_chunk_at or finished) - self.sent_at,
+            duration=finished - self.sent_at,
+            queue_wait=self.started_at - self.sent_at if self.started_at is not None else None,
+            rows=rows,
+            error=self.error,
+            high_watermark=self.high_watermark,
+            version=self.version,
+            not_modified=self.not_modified,
+        )
+
+
+class _BaseGateway:
+    """Lógica común: registro de conectores y requests en curso"""
+
+    def __init__(self, host: str, port: int, verify: bool = False):
+        self.host = host
+        self.port = port
+        self.verify = verify
+        self.registered = asyncio.Event()
+        self._streams: dict[str, _Stream] = {}
+
+    async def wait_registered(self, timeout: float = 60.0):
+        await asyncio.wait_for(self.registered.wait(), timeout)
+
+    async def _send_command(self, request_id: str, kind: str, payload):
+        raise NotImplementedError
+
+    async def flight_info(self, dataset: str = "sales", rows: int | None = None,
+                          timeout: float = 600.0, known_version: str | None = None,
+                          query: str | None = None) -> FlightInfoResult:
+        request_id = str(uuid.uuid4())
+        stream = self._streams[request_id] = _Stream(False, "get_flight_info")
+        try:
+            await self._send_command(request_id, "get_flight_info", (dataset, rows, known_version, query))
+            info = await asyncio.wait_for(stream.response, timeout)
+        finally:
+            self._streams.pop(request_id, None)
+        info.latency = time.perf_counter() - stream.sent_at
+        return info
+
+    async def do_get(self, partition: int = 0, total_partitions: int = 1,
+                     timeout: float = 600.0, watermark: dict | None = None,
+                     known_version: str | None = None, query: str | None = None) -> TransferResult:
+        request_id = str(uuid.uuid4())
+        stream = self._streams[request_id] = _Stream(self.verify)
+        try:
+            await self._send_command(request_id, "do_get",
+                                     _make_ticket(partition, total_partitions, watermark, known_version, query))
+            await asyncio.wait_for(stream.done, timeout)
+        except asyncio.TimeoutError:
+            stream.on_end(error="timeout")
+        finally:
+            self._streams.pop(request_id, None)
+        return stream.result(partition)
+
+
+# =============================================================================
+# gRPC
+# =============================================================================
+
+class _ConnectorService(connector_pb2_grpc.ConnectorServiceServicer):
+    def __init__(self, gateway: "GrpcGateway"):
+        self.gateway = gateway
+
+    async def Connect(self, request_iterator, context):
+        gateway = self.gateway
+        commands: asyncio.Queue = asyncio.Queue()
+
+        async def reader():
+            async for msg in request_iterator:
+                gateway._on_message(msg, commands)
+
+        reader_task = asyncio.create_task(reader())
+        try:
+            while True:
+                command = await commands.get()
+                if command is None:
+                    break
+                yield command
+        finally:
+            reader_task.cancel()
+            if gateway._commands is commands:
+                gateway._commands = None
+                gateway.registered.clear()
+
+
+class GrpcGateway(_BaseGateway):
+    """Gateway gRPC mínimo: un conector registrado a la vez"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 50999, verify: bool = False):
+        super().__init__(host, port, verify)
+        self.uri = f"{host}:{port}"
+        self._server: grpc.aio.Server | None = None
+        self._commands: asyncio.Queue | None = None
+
+    async def start(self):
+        self._server = grpc.aio.server(options=[
+            ("grpc.max_receive_message_length", -1),
+            ("grpc.max_send_message_length", -1),
+        ])
+        connector_pb2_grpc.add_ConnectorServiceServicer_to_server(_ConnectorService(self), self._server)
+        self._server.add_insecure_port(self.uri)
+        await self._server.start()
+
+    async def stop(self):
+        if self._commands is not None:
+            self._commands.put_nowait(None)
+        if self._server is not None:
+            await self._server.stop(grace=0)
+
+    def _on_message(self, msg: connector_pb2.ConnectorMessage, commands: asyncio.Queue):
+        kind = msg.WhichOneof("payload")
+        if kind == "register":
+            self._commands = commands
+            commands.put_nowait(connector_pb2.GatewayCommand(
+                register_response=connector_pb2.RegisterResponse(status="ok", session_id="bench")))
+            self.registered.set()
+            return
+
+        stream = self._streams.get(msg.request_id)
+        if stream is None:
+            return
+        if kind == "flight_info":
+            info = msg.flight_info
+            if not stream.response.done():
+                stream.response.set_result(FlightInfoResult(
+                    info.total_records, info.total_bytes, info.partitions or 1, info.dataset, 0.0,
+                    info.version or None, info.not_modified, info.error or None))
+        elif kind == "arrow_chunk":
+            stream.on_chunk(msg.arrow_chunk.data)
+        elif kind == "stream_status":
+            status = msg.stream_status
+            if status.type == "stream_start":
+                stream.on_start(status.compression, status.version)
+            elif status.type == "stream_end":
+                stream.on_end(error=status.error, high_watermark=status.high_watermark,
+                              version=status.version, not_modified=status.not_modified)
+
+    async def _send_command(self, request_id: str, kind: str, payload):
+        if self._commands is None:
+            raise ConnectionError("No connector registered")
+        if kind == "get_flight_info":
+            dataset, rows, known_version, query = payload
+            command = connector_pb2.GatewayCommand(
+                request_id=request_id,
+                get_flight_info=connector_pb2.GetFlightInfoRequest(
+                    path=[dataset], rows=rows or 0, known_version=known_version or "", query=query or ""))
+        else:
+            command = connector_pb2.GatewayCommand(
+                request_id=request_id, do_get=connector_pb2.DoGetRequest(ticket=payload))
+        await self._commands.put(command)
+
+
+# =============================================================================
+# WebSocket
+# =============================================================================
+
+class WebSocketGateway(_BaseGateway):
+    """Gateway WebSocket mínimo: acepta varias conexiones del mismo conector"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8799, verify: bool = False):
+        super().__init__(host, port, verify)
+        self.uri = f"ws://{host}:{port}/ws/connect"
+        self._server = None
+        self._connections: list = []
+        self._next = itertools.count()
+
+    async def start(self):
+        self._server = await websockets.serve(self._handler, self.host, self.port, max_size=None)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handler(self, websocket):
+        register = json.loads(await websocket.recv())
+        if register.get("action") != "register":
+            return
+        await websocket.send(json.dumps({"status": "ok", "data": {"session_id": "bench"}}))
+        self._connections.append(websocket)
+        self.registered.set()
+        try:
+            async for message in websocket:
+                if isinstance(message, bytes):
+                    request_id = message[:36].decode("utf-8").strip()
+                    stream = self._streams.get(request_id)
+                    if stream is not None:
+                        stream.on_chunk(message[36:])
+                else:
+                    self._on_json(json.loads(message))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self._connections.remove(websocket)
+            if not self._connections:
+                self.registered.clear()
+
+    def _on_json(self, msg: dict):
+        stream = self._streams.get(msg.get("request_id"))
+        if stream is None:
+            return
+        msg_type = msg.get("type")
+        if msg.get("status") == "error" and stream.kind == "get_flight_info":
+            if not stream.response.done():
+                stream.response.set_result(FlightInfoResult(0, 0, 0, "", 0.0, error=msg.get("error", "error")))
+        elif msg.get("status") == "error":
+            stream.on_end(error=msg.get("error", "error"))
+        elif msg_type == "stream_start":
+            stream.on_start(msg.get("compression"), msg.get("version"), msg.get("chunk_seq", False))
+        elif msg_type == "stream_end":
+            stream.on_end(expected_chunks=msg.get("total_chunks"), high_watermark=msg.get("high_watermark"),
+                          version=msg.get("version"), not_modified=msg.get("not_modified", False))
+        elif "data" in msg and not stream.response.done():
+            data = msg["data"]
+            stream.response.set_result(FlightInfoResult(
+                data.get("total_records", 0), data.get("total_bytes", 0),
+                data.get("partitions", 1), data.get("dataset", ""), 0.0,
+                data.get("version"), data.get("not_modified", False)))
+
+    async def _send_command(self, request_id: str, kind: str, payload):
+        if not self._connections:
+            raise ConnectionError("No connector registered")
+        # Round-robin entre las conexiones del conector, como el Gateway
+        websocket = self._connections[next(self._next) % len(self._connections)]
+        if kind == "get_flight_info":
+            dataset, rows, known_version, query = payload
+            descriptor = {"path": [dataset]}
+            if rows:
+                descriptor["rows"] = rows
+            if known_version:
+                descriptor["known_version"] = known_version
+            if query:
+                descriptor["query"] = query
+            msg = {"action": "get_flight_info", "request_id": request_id, "descriptor": descriptor}
+        else:
+            msg = {"action": "do_get", "request_id": request_id, "ticket": payload}
+        await websocket.send(json.dumps(msg))
+
+
+def make_gateway(transport: str, verify: bool = False, port: int | None = None) -> _BaseGateway:
+    """Crea el gateway del transporte pedido ('grpc' o 'websocket')"""
+    if transport == "grpc":
+        return GrpcGateway(port=port or 50999, verify=verify)
+    return WebSocketGateway(port=port or 8799, verify=verify)
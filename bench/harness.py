@@ -0,0 +1,215 @@
+"""
+Infraestructura común de los benchmarks: conector en un subproceso con una
+configuración generada, y muestreo de memoria/CPU de ese proceso.
+
+El conector corre con `service.py --test` (el mismo punto de entrada que en
+producción) apuntando a un config.yml temporal vía CONNECTOR_CONFIG.
+"""
+import asyncio
+import copy
+import json
+import math
+import os
+import platform
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import yaml
+
+# psutil es opcional: sin él no se reportan RSS ni CPU
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+BASE_CONFIG_PATH = REPO_DIR / "config.yml"
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    """Percentil por rango más cercano (q en 0..1)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def summarize_ms(seconds: list[float], quantiles: tuple = (0.50, 0.99)) -> dict:
+    """Percentiles (p50/p99 por defecto) y max en milisegundos de duraciones en segundos"""
+    summary = {f"p{round(q * 100)}": (round(percentile(seconds, q) * 1000, 2) if seconds else None)
+               for q in quantiles}
+    summary["max"] = round(max(seconds) * 1000, 2) if seconds else None
+    return summary
+
+
+def write_bench_config(path: Path, transport: str, gateway_uri: str, compression: str,
+                       overrides: dict | None = None) -> Path:
+    """
+    Genera el config.yml del conector bajo prueba a partir del config.yml del
+    repo: apunta al gateway local y desactiva todo lo que no se mide.
+    """
+    base = {}
+    if BASE_CONFIG_PATH.exists():
+        base = yaml.safe_load(BASE_CONFIG_PATH.read_text(encoding="utf-8")) or {}
+    cfg = copy.deepcopy(base)
+
+    gateway = cfg.setdefault("gateway", {})
+    gateway["transport_mode"] = transport
+    if transport == "grpc":
+        gateway["grpc_uri"] = gateway_uri
+    else:
+        gateway["uri"] = gateway_uri
+    cfg.setdefault("tenant", {})["id"] = "bench"
+
+    performance = cfg.setdefault("performance", {})
+    performance["transfer_compression"] = compression
+    performance["parallel_partitions"] = True  # 'auto' usa las particiones recomendadas
+    performance["worker_processes"] = 1
+    performance["reconnect_delay"] = 1
+
+    metrics = cfg.setdefault("metrics", {})
+    metrics["enabled"] = False
+    metrics.setdefault("local_endpoint", {})["enabled"] = False
+    cfg.setdefault("tracing", {})["enabled"] = False
+
+    for section, values in (overrides or {}).items():
+        cfg.setdefault(section, {}).update(values)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(yaml.safe_dump(cfg, sort_keys=False), encoding="utf-8")
+    return path
+
+
+class ConnectorProcess:
+    """Conector real corriendo en un subproceso"""
+
+    def __init__(self, config_path: Path, log_path: Path):
+        self.config_path = config_path
+        self.log_path = log_path
+        self.proc: subprocess.Popen | None = None
+        self._log = None
+
+    def start(self):
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        self._log = open(self.log_path, "w", encoding="utf-8")
+        env = {**os.environ, "CONNECTOR_CONFIG": str(self.config_path), "PYTHONUNBUFFERED": "1"}
+        kwargs = {}
+        if sys.platform == "win32":
+            kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+        self.proc = subprocess.Popen([sys.executable, "service.py", "--test"], cwd=REPO_DIR, env=env,
+                                     stdout=self._log, stderr=subprocess.STDOUT, **kwargs)
+
+    @property
+    def pid(self) -> int | None:
+        return self.proc.pid if self.proc else None
+
+    def stop(self, timeout: float = 10.0):
+        if self.proc is None:
+            return
+        if self.proc.poll() is None:
+            # Ctrl+C: el conector cierra ordenadamente (KeyboardInterrupt)
+            self.proc.send_signal(signal.CTRL_BREAK_EVENT if sys.platform == "win32" else signal.SIGINT)
+            try:
+                self.proc.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+        self.proc = None
+        if self._log:
+            self._log.close()
+            self._log = None
+
+
+class ResourceSampler:
+    """Muestrea RSS (pico) y tiempo de CPU del conector y sus hijos"""
+
+    def __init__(self, pid: int | None, interval: float = 0.05):
+        self.interval = interval
+        self.process = psutil.Process(pid) if PSUTIL_AVAILABLE and pid else None
+        self.rss_peak = 0
+        self._cpu_start = 0.0
+        self._started = 0.0
+        self._task: asyncio.Task | None = None
+
+    def _processes(self) -> list:
+        try:
+            return [self.process] + self.process.children(recursive=True)
+        except psutil.Error:
+            return []
+
+    def _cpu_seconds(self) -> float:
+        total = 0.0
+        for p in self._processes():
+            try:
+                times = p.cpu_times()
+                total += times.user + times.system
+            except psutil.Error:
+                pass
+        return total
+
+    def _rss(self) -> int:
+        total = 0
+        for p in self._processes():
+            try:
+                total += p.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    def start(self):
+        """Empieza una ventana de medición"""
+        if self.process is None:
+            return
+        self.rss_peak = self._rss()
+        self._cpu_start = self._cpu_seconds()
+        self._started = time.perf_counter()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            self.rss_peak = max(self.rss_peak, self._rss())
+            await asyncio.sleep(self.interval)
+
+    def stop(self) -> dict:
+        """Cierra la ventana y retorna pico de RSS, CPU usada y % de CPU"""
+        if self.process is None:
+            return {"rss_peak_mb": None, "cpu_seconds": None, "cpu_percent": None}
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        cpu = self._cpu_seconds() - self._cpu_start
+        wall = max(time.perf_counter() - self._started, 1e-9)
+        return {
+            "rss_peak_mb": round(self.rss_peak / 1024 / 1024, 1),
+            "cpu_seconds": round(cpu, 3),
+            "cpu_percent": round(cpu / wall * 100, 1),
+        }
+
+
+def environment_info() -> dict:
+    """Metadata del entorno para interpretar (y comparar) los resultados"""
+    import pyarrow
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": commit or None,
+        "hostname": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "pyarrow": pyarrow.__version__,
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def write_results(path: Path, meta: dict, results: list[dict]) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"meta": meta, "results": results}, indent=2), encoding="utf-8")
+    return path
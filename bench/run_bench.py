@@ -0,0 +1,209 @@
+"""
+Benchmark end-to-end: conector real contra un Gateway local.
+
+Recorre la matriz transporte x compresión x dataset/filas x particiones x
+concurrencia. Para cada transporte y compresión levanta un gateway local
+(bench/gateways.py) y el conector en un subproceso. En cada celda ejecuta
+consultas completas (FlightInfo + DoGet de todas las particiones en paralelo)
+y mide:
+
+  - throughput (MB/s en el cable, filas/s)
+  - TTFB y latencia total por consulta (p50/p99)
+  - RSS pico y CPU del proceso conector
+
+Los resultados se guardan en bench/results/bench-<fecha>.json. Si existe un
+baseline (bench/baseline.json por defecto), se comparan con él.
+
+Uso (desde la raíz del repo):
+  python -m bench.run_bench --quick
+  python -m bench.run_bench --transports grpc websocket --rows 100000 1000000 \\
+      --partitions auto 1 4 --compression zstd none --concurrency 1 4 --repeat 3
+  python -m bench.run_bench --quick --save-baseline
+  python -m bench.run_bench --datasets dataset_10mb --partitions auto --verify
+"""
+import argparse
+import asyncio
+import json
+import logging
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench.compare import compare, format_report
+from bench.gateways import make_gateway
+from bench.harness import (ConnectorProcess, ResourceSampler, environment_info, summarize_ms,
+                           write_bench_config, write_results)
+
+logger = logging.getLogger("bench")
+
+BENCH_DIR = Path(__file__).resolve().parent
+SYNTHETIC_DATASET = "sales"
+
+
+async def run_query(gateway, dataset: str, rows: int | None, partitions: str) -> dict:
+    """Una consulta completa como la haría el cliente: FlightInfo y luego DoGet por partición"""
+    started = time.perf_counter()
+    info = await gateway.flight_info(dataset, rows)
+    total_partitions = info.partitions if partitions == "auto" else int(partitions)
+    transfers = await asyncio.gather(*[gateway.do_get(p, total_partitions) for p in range(total_partitions)])
+    errors = [t.error for t in transfers if t.error]
+    verified_rows = None
+    if all(t.rows is not None for t in transfers):
+        verified_rows = sum(t.rows for t in transfers)
+        if verified_rows != info.total_records:
+            errors.append(f"row mismatch: got {verified_rows}, expected {info.total_records}")
+    return {
+        "latency": time.perf_counter() - started,
+        "metadata": info.latency,
+        "ttfb": info.latency + min(t.ttfb for t in transfers),
+        "wire_bytes": sum(t.wire_bytes for t in transfers),
+        "records": info.total_records,
+        "partitions": total_partitions,
+        "errors": errors,
+    }
+
+
+async def run_cell(gateway, sampler: ResourceSampler, dataset: str, rows: int | None,
+                   partitions: str, concurrency: int, repeat: int) -> dict:
+    """Ejecuta una celda de la matriz: repeat rondas de `concurrency` consultas simultáneas"""
+    # Calentamiento: carga/genera el dataset fuera de la medición
+    await gateway.flight_info(dataset, rows)
+
+    queries: list[dict] = []
+    sampler.start()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        queries += await asyncio.gather(*[run_query(gateway, dataset, rows, partitions)
+                                          for _ in range(concurrency)])
+    wall = time.perf_counter() - started
+    resources = sampler.stop()
+
+    ok = [q for q in queries if not q["errors"]]
+    wire_bytes = sum(q["wire_bytes"] for q in ok)
+    records = sum(q["records"] for q in ok)
+    cpu = resources["cpu_seconds"]
+    return {
+        "queries": len(queries),
+        "errors": sum(1 for q in queries if q["errors"]),
+        "error_samples": sorted({e for q in queries for e in q["errors"]})[:3],
+        "partitions_used": queries[0]["partitions"] if queries else None,
+        "total_records": queries[0]["records"] if queries else None,
+        "wall_seconds": round(wall, 3),
+        "wire_mb": round(wire_bytes / 1024 / 1024, 2),
+        "throughput_mb_s": round(wire_bytes / 1024 / 1024 / wall, 2),
+        "rows_per_s": round(records / wall),
+        "metadata_ms": summarize_ms([q["metadata"] for q in queries]),
+        "ttfb_ms": summarize_ms([q["ttfb"] for q in ok]),
+        "latency_ms": summarize_ms([q["latency"] for q in ok]),
+        **resources,
+        "cpu_seconds_per_query": round(cpu / len(queries), 4) if cpu is not None and queries else None,
+    }
+
+
+async def run_matrix(args) -> list[dict]:
+    workdir = Path(tempfile.mkdtemp(prefix="connector-bench-"))
+    results = []
+    datasets = [(d, r) for d in args.datasets
+                for r in (args.rows if d == SYNTHETIC_DATASET else [None])]
+    try:
+        for transport in args.transports:
+            for compression in args.compression:
+                gateway = make_gateway(transport, verify=args.verify)
+                await gateway.start()
+                overrides = {"performance": {"parallel_connections": args.ws_connections}}
+                config_path = write_bench_config(workdir / f"config-{transport}-{compression}.yml",
+                                                 transport, gateway.uri, compression, overrides)
+                connector = ConnectorProcess(config_path, workdir / f"connector-{transport}-{compression}.log")
+                connector.start()
+                try:
+                    await gateway.wait_registered(timeout=args.startup_timeout)
+                    sampler = ResourceSampler(connector.pid)
+                    for dataset, rows in datasets:
+                        for partitions in args.partitions:
+                            for concurrency in args.concurrency:
+                                cell = {"transport": transport, "dataset": dataset, "rows": rows,
+                                        "partitions": partitions, "compression": compression,
+                                        "concurrency": concurrency}
+                                logger.info(f"Running {cell}")
+                                cell.update(await run_cell(gateway, sampler, dataset, rows, partitions,
+                                                           concurrency, args.repeat))
+                                logger.info(f"  {cell['throughput_mb_s']} MB/s, "
+                                            f"TTFB p50 {cell['ttfb_ms']['p50']} ms, "
+                                            f"latency p99 {cell['latency_ms']['p99']} ms, "
+                                            f"RSS {cell['rss_peak_mb']} MB, errors {cell['errors']}")
+                                results.append(cell)
+                except asyncio.TimeoutError:
+                    logger.error(f"Connector did not register over {transport}; "
+                                 f"see {connector.log_path}")
+                    args.keep_logs = True
+                finally:
+                    connector.stop()
+                    await gateway.stop()
+    finally:
+        if args.keep_logs:
+            logger.info(f"Connector configs and logs kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end Data Connector benchmark against local gateways")
+    parser.add_argument("--transports", nargs="+", default=["grpc", "websocket"], choices=["grpc", "websocket"])
+    parser.add_argument("--datasets", nargs="+", default=[SYNTHETIC_DATASET],
+                        help=f"Dataset names ('{SYNTHETIC_DATASET}' = synthetic, sized with --rows)")
+    parser.add_argument("--rows", nargs="+", type=int, default=[100_000, 1_000_000],
+                        help="Synthetic dataset sizes")
+    parser.add_argument("--partitions", nargs="+", default=["auto", "1", "4"],
+                        help="Partition counts per query ('auto' = connector recommendation)")
+    parser.add_argument("--compression", nargs="+", default=["zstd", "none"], choices=["zstd", "none"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4], help="Simultaneous queries")
+    parser.add_argument("--repeat", type=int, default=3, help="Rounds per cell")
+    parser.add_argument("--ws-connections", type=int, default=1, help="parallel_connections for WebSocket")
+    parser.add_argument("--verify", action="store_true", help="Decode every chunk and check row counts")
+    parser.add_argument("--quick", action="store_true",
+                        help="Small matrix: 100k rows, auto partitions, zstd, concurrency 1 and 4, 2 rounds")
+    parser.add_argument("--output", type=Path, help="Results file (default: bench/results/bench-<timestamp>.json)")
+    parser.add_argument("--baseline", type=Path, default=BENCH_DIR / "baseline.json")
+    parser.add_argument("--save-baseline", action="store_true", help="Also write the results as the baseline")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in %%")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--startup-timeout", type=float, default=120.0,
+                        help="Seconds to wait for the connector to register")
+    parser.add_argument("--keep-logs", action="store_true", help="Keep generated configs and connector logs")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.rows, args.partitions, args.compression = [100_000], ["auto"], ["zstd"]
+        args.concurrency, args.repeat = [1, 4], 2
+    return args
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    args = parse_args(argv)
+
+    meta = environment_info()
+    meta["args"] = {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()}
+    results = asyncio.run(run_matrix(args))
+
+    output = args.output or BENCH_DIR / "results" / f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    write_results(output, meta, results)
+    logger.info(f"Results written to {output}")
+
+    regressions = False
+    if args.save_baseline:
+        write_results(args.baseline, meta, results)
+        logger.info(f"Baseline saved to {args.baseline}")
+    elif args.baseline.exists():
+        rows = compare({"results": results}, json.loads(args.baseline.read_text()), args.threshold)
+        print(format_report(rows))
+        regressions = any(r["regression"] for r in rows)
+
+    if args.fail_on_regression and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
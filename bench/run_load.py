@@ -0,0 +1,321 @@
+"""
+Pruebas de carga por escenarios contra GRPCConnector.
+
+Reproduce localmente el escenario de Error.md (100 requests, 50 concurrentes
+contra dataset_1mb que terminan en DEADLINE_EXCEEDED) con el gateway gRPC
+local de bench/gateways.py. Cada escenario define un patrón de llegadas y
+una mezcla de datasets; cada request es una consulta completa del cliente
+(FlightInfo + DoGet de todas las particiones) con un deadline desde su llegada.
+
+Patrones de llegada:
+  - closed: `concurrency` clientes, cada uno lanza el siguiente request al
+    terminar el anterior (como `load-test -n 100 -c 50`)
+  - steady: llegadas a tasa fija (`rate` requests/s)
+  - burst: ráfagas de `burst_size` requests cada `burst_interval` segundos
+
+Cada escenario corre contra un conector recién iniciado, con la cola de
+requests habilitada y deshabilitada (--queue on off). Se reportan por request
+y agregados: latencia (p50/p90/p99), deadlines vencidos, errores, espera en la
+cola del conector (DoGet -> stream_start) y TTFB.
+
+Uso (desde la raíz del repo):
+  python -m bench.run_load                       # escenario de Error.md, cola on/off
+  python -m bench.run_load --scenarios error-md burst mixed --deadline 30
+  python -m bench.run_load --scenarios steady --rate 20 --requests 200 --queue on --queue-workers 1 4
+  python -m bench.run_load --list
+"""
+import argparse
+import asyncio
+import logging
+import random
+import shutil
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+
+from bench.gateways import GrpcGateway
+from bench.harness import (ConnectorProcess, ResourceSampler, environment_info, summarize_ms,
+                           write_bench_config, write_results)
+
+logger = logging.getLogger("bench.load")
+
+BENCH_DIR = Path(__file__).resolve().parent
+QUANTILES = (0.50, 0.90, 0.99)
+
+
+@dataclass
+class DatasetMix:
+    dataset: str
+    rows: int | None = None  # Sólo para el dataset sintético 'sales'
+    weight: float = 1.0
+
+    @property
+    def label(self) -> str:
+        return f"{self.dataset}:{self.rows}" if self.rows else self.dataset
+
+
+@dataclass
+class Scenario:
+    name: str
+    pattern: str                # 'closed', 'steady' o 'burst'
+    requests: int = 100
+    concurrency: int = 50       # closed
+    rate: float = 10.0          # steady: requests/s
+    burst_size: int = 25        # burst
+    burst_interval: float = 5.0  # burst: segundos entre ráfagas
+    deadline: float = 30.0      # Segundos desde la llegada del request
+    mix: list[DatasetMix] = field(default_factory=lambda: [DatasetMix("dataset_1mb")])
+
+
+SCENARIOS = {
+    "error-md": Scenario("error-md", "closed", requests=100, concurrency=50),
+    "steady": Scenario("steady", "steady", requests=100, rate=10.0),
+    "burst": Scenario("burst", "burst", requests=100, burst_size=25, burst_interval=5.0),
+    "mixed": Scenario("mixed", "steady", requests=100, rate=5.0,
+                      mix=[DatasetMix("dataset_1mb", weight=0.8), DatasetMix("sales", 1_000_000, weight=0.2)]),
+}
+
+
+def parse_mix(specs: list[str]) -> list[DatasetMix]:
+    """'dataset_1mb=0.8 sales:1000000=0.2' -> [DatasetMix, ...]"""
+    mix = []
+    for spec in specs:
+        name, _, weight = spec.partition("=")
+        dataset, _, rows = name.partition(":")
+        mix.append(DatasetMix(dataset, int(rows) if rows else None, float(weight) if weight else 1.0))
+    return mix
+
+
+def arrival_offsets(scenario: Scenario) -> list[float]:
+    """Segundos desde el inicio en que llega cada request (patrones abiertos)"""
+    if scenario.pattern == "steady":
+        return [i / scenario.rate for i in range(scenario.requests)]
+    if scenario.pattern == "burst":
+        return [(i // scenario.burst_size) * scenario.burst_interval for i in range(scenario.requests)]
+    raise ValueError(f"Unknown arrival pattern: {scenario.pattern}")
+
+
+async def run_request(gateway: GrpcGateway, index: int, mix: DatasetMix, deadline: float,
+                      started: float) -> dict:
+    """Una consulta del cliente con deadline; nunca lanza, el resultado va en 'status'"""
+    arrived = time.perf_counter()
+    record = {"index": index, "dataset": mix.label, "arrival": round(arrived - started, 4),
+              "status": "ok", "error": None, "partitions": None, "latency": None, "metadata": None,
+              "queue_wait": None, "ttfb": None, "wire_bytes": 0}
+    try:
+        info = await gateway.flight_info(mix.dataset, mix.rows, timeout=deadline)
+        record["metadata"] = info.latency
+        record["partitions"] = info.partitions
+        remaining = deadline - (time.perf_counter() - arrived)
+        if remaining <= 0:
+            raise asyncio.TimeoutError
+        transfers = await asyncio.gather(*[gateway.do_get(p, info.partitions, timeout=remaining)
+                                           for p in range(info.partitions)])
+        record["wire_bytes"] = sum(t.wire_bytes for t in transfers)
+        waits = [t.queue_wait for t in transfers if t.queue_wait is not None]
+        record["queue_wait"] = max(waits) if waits else None
+        if any(t.chunks for t in transfers):
+            record["ttfb"] = info.latency + min(t.ttfb for t in transfers if t.chunks)
+        errors = [t.error for t in transfers if t.error]
+        if "timeout" in errors:
+            record["status"] = "deadline"
+        elif errors:
+            record["status"], record["error"] = "error", errors[0]
+    except asyncio.TimeoutError:
+        record["status"] = "deadline"
+    except ConnectionError as e:
+        record["status"], record["error"] = "error", str(e)
+    record["latency"] = time.perf_counter() - arrived
+    # Tiempos por request en segundos (los agregados van en ms)
+    for key in ("latency", "metadata", "queue_wait", "ttfb"):
+        if record[key] is not None:
+            record[key] = round(record[key], 4)
+    return record
+
+
+async def run_scenario(gateway: GrpcGateway, scenario: Scenario, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    choices = rng.choices(scenario.mix, weights=[m.weight for m in scenario.mix], k=scenario.requests)
+    started = time.perf_counter()
+
+    if scenario.pattern == "closed":
+        pending = iter(enumerate(choices))
+
+        async def client() -> list[dict]:
+            records = []
+            for index, mix in pending:
+                records.append(await run_request(gateway, index, mix, scenario.deadline, started))
+            return records
+
+        per_client = await asyncio.gather(*[client() for _ in range(scenario.concurrency)])
+        records = [r for client_records in per_client for r in client_records]
+    else:
+        tasks = []
+        for index, (offset, mix) in enumerate(zip(arrival_offsets(scenario), choices)):
+            delay = started + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(run_request(gateway, index, mix, scenario.deadline, started)))
+        records = await asyncio.gather(*tasks)
+    return sorted(records, key=lambda r: r["index"])
+
+
+def summarize(records: list[dict], wall: float) -> dict:
+    """Agregados de un escenario: latencias, deadlines vencidos y espera en cola"""
+    ok = [r for r in records if r["status"] == "ok"]
+
+    def ms(key, rows):
+        return summarize_ms([r[key] for r in rows if r[key] is not None], QUANTILES)
+
+    by_dataset = {}
+    for label in sorted({r["dataset"] for r in records}):
+        rows = [r for r in records if r["dataset"] == label]
+        by_dataset[label] = {
+            "requests": len(rows),
+            "deadline_misses": sum(1 for r in rows if r["status"] == "deadline"),
+            "latency_ms": ms("latency", [r for r in rows if r["status"] == "ok"]),
+        }
+    first_miss = next((r for r in sorted(records, key=lambda r: r["arrival"]) if r["status"] == "deadline"), None)
+    return {
+        "requests": len(records),
+        "completed": len(ok),
+        "deadline_misses": sum(1 for r in records if r["status"] == "deadline"),
+        "errors": sum(1 for r in records if r["status"] == "error"),
+        "error_samples": sorted({r["error"] for r in records if r["error"]})[:3],
+        "first_miss_index": first_miss["index"] if first_miss else None,
+        "wall_seconds": round(wall, 3),
+        "throughput_mb_s": round(sum(r["wire_bytes"] for r in ok) / 1024 / 1024 / wall, 2),
+        "latency_ms": ms("latency", ok),
+        "queue_wait_ms": ms("queue_wait", records),
+        "ttfb_ms": ms("ttfb", ok),
+        "metadata_ms": ms("metadata", records),
+        "by_dataset": by_dataset,
+    }
+
+
+async def run_all(args, scenarios: list[Scenario]) -> list[dict]:
+    workdir = Path(tempfile.mkdtemp(prefix="connector-load-"))
+    results = []
+    modes = [(queue == "on", workers) for queue in args.queue
+             for workers in (args.queue_workers if queue == "on" else [None])]
+    try:
+        for scenario in scenarios:
+            for queue_enabled, workers in modes:
+                mode = f"queue-{workers}w" if queue_enabled else "no-queue"
+                gateway = GrpcGateway(port=args.port)
+                await gateway.start()
+                queue_cfg = {"enabled": queue_enabled, "max_size": args.queue_max_size}
+                if workers:
+                    queue_cfg["workers"] = workers
+                config_path = write_bench_config(workdir / f"config-{scenario.name}-{mode}.yml", "grpc",
+                                                 gateway.uri, args.compression, {"queue": queue_cfg})
+                connector = ConnectorProcess(config_path, workdir / f"connector-{scenario.name}-{mode}.log")
+                connector.start()
+                try:
+                    await gateway.wait_registered(timeout=args.startup_timeout)
+                    # Calentamiento: carga cada dataset de la mezcla antes de medir
+                    for mix in scenario.mix:
+                        await gateway.flight_info(mix.dataset, mix.rows)
+                    logger.info(f"Running scenario '{scenario.name}' ({scenario.pattern}, "
+                                f"{scenario.requests} requests) with {mode}")
+                    sampler = ResourceSampler(connector.pid)
+                    sampler.start()
+                    started = time.perf_counter()
+                    records = await run_scenario(gateway, scenario, args.seed)
+                    wall = time.perf_counter() - started
+                    summary = summarize(records, wall)
+                    result = {"scenario": scenario.name, "queue": mode, "config": asdict(scenario),
+                              **summary, **sampler.stop(), "records": records}
+                    logger.info(f"  {summary['completed']}/{summary['requests']} ok, "
+                                f"{summary['deadline_misses']} deadline misses "
+                                f"(first at #{summary['first_miss_index']}), {summary['errors']} errors, "
+                                f"latency p99 {summary['latency_ms']['p99']} ms, "
+                                f"queue wait p99 {summary['queue_wait_ms']['p99']} ms")
+                    results.append(result)
+                except asyncio.TimeoutError:
+                    logger.error(f"Connector did not register; see {connector.log_path}")
+                    args.keep_logs = True
+                finally:
+                    connector.stop()
+                    await gateway.stop()
+    finally:
+        if args.keep_logs:
+            logger.info(f"Connector configs and logs kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def format_report(results: list[dict]) -> str:
+    lines = [f"{'scenario':<12} {'queue':<10} {'ok':>5} {'miss':>5} {'err':>4} {'lat p50':>9} {'lat p90':>9} "
+             f"{'lat p99':>9} {'qwait p50':>10} {'qwait p99':>10}"]
+
+    def fmt(value):
+        return f"{value:.0f}" if value is not None else "-"
+
+    for r in results:
+        lat, wait = r["latency_ms"], r["queue_wait_ms"]
+        lines.append(f"{r['scenario']:<12} {r['queue']:<10} {r['completed']:>5} {r['deadline_misses']:>5} "
+                     f"{r['errors']:>4} {fmt(lat['p50']):>9} {fmt(lat['p90']):>9} {fmt(lat['p99']):>9} "
+                     f"{fmt(wait['p50']):>10} {fmt(wait['p99']):>10}")
+    return "\n".join(lines)
+
+
+def build_scenarios(args) -> list[Scenario]:
+    overrides = {name: getattr(args, name) for name in
+                 ("requests", "concurrency", "rate", "burst_size", "burst_interval", "deadline")
+                 if getattr(args, name) is not None}
+    if args.mix:
+        overrides["mix"] = parse_mix(args.mix)
+    return [replace(SCENARIOS[name], **overrides) for name in args.scenarios]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scenario load test for GRPCConnector against a local gateway")
+    parser.add_argument("--scenarios", nargs="+", default=["error-md"], choices=sorted(SCENARIOS))
+    parser.add_argument("--list", action="store_true", help="List the scenarios and exit")
+    parser.add_argument("--queue", nargs="+", default=["on", "off"], choices=["on", "off"])
+    parser.add_argument("--queue-workers", nargs="+", type=int, default=[1], help="queue.workers when the queue is on")
+    parser.add_argument("--queue-max-size", type=int, default=100)
+    parser.add_argument("--requests", type=int, help="Override the scenario request count")
+    parser.add_argument("--concurrency", type=int, help="Override clients for 'closed' scenarios")
+    parser.add_argument("--rate", type=float, help="Override requests/s for 'steady' scenarios")
+    parser.add_argument("--burst-size", type=int)
+    parser.add_argument("--burst-interval", type=float)
+    parser.add_argument("--deadline", type=float, help="Per-request deadline in seconds")
+    parser.add_argument("--mix", nargs="+", help="Dataset mix, e.g. dataset_1mb=0.8 sales:1000000=0.2")
+    parser.add_argument("--compression", default="zstd", choices=["zstd", "none"])
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the dataset mix")
+    parser.add_argument("--port", type=int, default=50999)
+    parser.add_argument("--output", type=Path, help="Results file (default: bench/results/load-<timestamp>.json)")
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--fail-on-miss", action="store_true", help="Exit with status 1 on deadline misses or errors")
+    parser.add_argument("--keep-logs", action="store_true", help="Keep generated configs and connector logs")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    args = parse_args(argv)
+    scenarios = build_scenarios(args)
+    if args.list:
+        for name, scenario in SCENARIOS.items():
+            print(f"{name:<10} {asdict(scenario)}")
+        return
+
+    meta = environment_info()
+    meta["args"] = {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()}
+    results = asyncio.run(run_all(args, scenarios))
+
+    output = args.output or BENCH_DIR / "results" / f"load-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    write_results(output, meta, results)
+    logger.info(f"Results written to {output}")
+    print(format_report(results))
+    if args.fail_on_miss and any(r["deadline_misses"] or r["errors"] for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
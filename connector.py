@@ -4,20 +4,35 @@ Lógica del Data Connector WebSocket con soporte para conexiones paralelas
 import asyncio
 import json
 import logging
+import os
 import platform
 import base64
+import struct
+import time
+from collections import deque
 from pathlib import Path
 
 import yaml
 import websockets
 from websockets.exceptions import ConnectionClosed
+from websockets.protocol import State
 
-from data_loader import data_loader
+from data_loader import configure_loader, data_loader
+from dataset_watch import watcher_from_config
+from metrics_reporter import MetricsReporter
+from loop_watchdog import watchdog_from_config
+from metrics_server import MetricsServer
+from pacing import BandwidthPacer, pacer_from_config
+from profiler import Profiler, ProfilerBusy, profiler_from_config
+from query_engine import QueryEngine, query_engine_from_config
+from tracing import NOOP_TRACE, Tracer, tracer_from_config
+from warmup import DatasetWarmup, warmup_from_config
 
 logger = logging.getLogger("Connector")
 
 # Cargar configuración desde config.yml
-CONFIG_PATH = Path(__file__).parent / "config.yml"
+# CONNECTOR_CONFIG permite usar otro archivo (p. ej. el que genera bench/)
+CONFIG_PATH = Path(os.environ.get("CONNECTOR_CONFIG") or Path(__file__).parent / "config.yml")
 
 def load_config():
     """Carga configuración desde YAML"""
@@ -38,16 +53,242 @@ MAX_CHUNK_SIZE = config.get('performance', {}).get('max_chunk_size', 65536)
 RECONNECT_DELAY = config.get('performance', {}).get('reconnect_delay', 5)
 # Compresión de transferencia: 'zstd' (recomendado) o None
 TRANSFER_COMPRESSION = config.get('performance', {}).get('transfer_compression', 'zstd')
+# Repartir los chunks de un mismo request entre todas las conexiones vivas
+STRIPE_REQUESTS = config.get('performance', {}).get('stripe_requests', False)
+
+# Backpressure: watermarks del buffer de escritura de cada socket (bytes)
+WRITE_BUFFER_HIGH = config.get('performance', {}).get('write_buffer_high', 1024 * 1024)
+WRITE_BUFFER_LOW = config.get('performance', {}).get('write_buffer_low', 256 * 1024)
+# Mensajes en cola por stream antes de frenar al productor
+MAX_PENDING_PER_STREAM = config.get('performance', {}).get('max_pending_per_stream', 4)
+# DoGets atendidos a la vez por cada worker
+MAX_CONCURRENT_STREAMS = config.get('performance', {}).get('max_concurrent_streams', 8)
+
+# Metrics configuration (Observability Plane)
+METRICS_ENABLED = config.get('metrics', {}).get('enabled', True)
+METRICS_API_URL = config.get('metrics', {}).get('api_url', 'http://localhost:8000')
+METRICS_HOST = config.get('metrics', {}).get('api_host', None)  # Host header for Traefik
+METRICS_INTERVAL = config.get('metrics', {}).get('interval_seconds', 30)
+METRICS_SPOOL = config.get('metrics', {}).get('spool', {}) or {}
+METRICS_DELTA_ENCODING = config.get('metrics', {}).get('delta_encoding', False)
+METRICS_FULL_SNAPSHOT_EVERY = config.get('metrics', {}).get('full_snapshot_every', 10)
+# Local scrape endpoint (Prometheus/OpenMetrics)
+LOCAL_METRICS = config.get('metrics', {}).get('local_endpoint', {}) or {}
+LOCAL_METRICS_ENABLED = LOCAL_METRICS.get('enabled', False)
+LOCAL_METRICS_HOST = LOCAL_METRICS.get('host', '127.0.0.1')
+LOCAL_METRICS_PORT = LOCAL_METRICS.get('port', 9464)
+
+
+class SendScheduler:
+    """
+    Planificador de envíos de un worker WebSocket.
+    
+    Cada stream tiene su propia cola acotada y una única tarea escribe en el
+    socket tomando un mensaje por stream en round-robin. Así los requests
+    concurrentes se intercalan de forma justa y, cuando el Gateway lee lento,
+    los productores se frenan en lugar de acumular memoria.
+    """
+    
+    def __init__(self, worker_id: int, max_pending: int = MAX_PENDING_PER_STREAM,
+                 metrics: MetricsReporter = None, pacer: BandwidthPacer = None):
+        self.worker_id = worker_id
+        self.max_pending = max_pending
+        self.metrics = metrics
+        self.pacer = pacer
+        self.websocket = None
+        self.pending_bytes = 0  # Bytes encolados aún no entregados al transporte
+        self.closed = True
+        self._queues: dict[str, asyncio.Queue] = {}
+        self._ready: deque[str] = deque()  # Streams con mensajes pendientes, en orden de turno
+        self._wakeup = asyncio.Event()
+        self._sending: str | None = None
+        # Streams con mensajes descartados sin llegar al socket (stop o error de envío)
+        self._dropped: set[str] = set()
+        self._task: asyncio.Task | None = None
+    
+    def start(self, websocket):
+        """Comienza a escribir en un socket recién conectado"""
+        self.websocket = websocket
+        self.closed = False
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Detiene el envío y libera a los productores que esperaban turno"""
+        self.closed = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, ConnectionClosed):
+                pass
+            self._task = None
+        for stream_id, queue in self._queues.items():
+            if not queue.empty():
+                self._dropped.add(stream_id)
+            while not queue.empty():
+                queue.get_nowait()
+                queue.task_done()
+        self._queues.clear()
+        self._ready.clear()
+        self.pending_bytes = 0
+    
+    async def send(self, stream_id: str, message):
+        """Encola un mensaje del stream; bloquea si el stream ya tiene max_pending en cola"""
+        if self.closed:
+            raise ConnectionError(f"Worker {self.worker_id} is not connected")
+        queue = self._queues.get(stream_id)
+        if queue is None:
+            queue = self._queues[stream_id] = asyncio.Queue(maxsize=self.max_pending)
+        await queue.put(message)
+        if self.closed:
+            raise ConnectionError(f"Worker {self.worker_id} disconnected")
+        self.pending_bytes += len(message)
+        if stream_id not in self._ready:
+            self._ready.append(stream_id)
+        self._wakeup.set()
+    
+    async def flush(self, stream_id: str):
+        """
+        Espera a que todos los mensajes encolados del stream estén escritos en el
+        socket. Lanza ConnectionError si alguno se descartó sin enviarse.
+        """
+        queue = self._queues.get(stream_id)
+        if queue is not None:
+            await queue.join()
+        if stream_id in self._dropped:
+            raise ConnectionError(f"Worker {self.worker_id} dropped messages of stream {stream_id}")
+    
+    @property
+    def pending_messages(self) -> int:
+        """Mensajes encolados en todos los streams"""
+        return sum(queue.qsize() for queue in self._queues.values())
+    
+    def close_stream(self, stream_id: str):
+        """Libera la cola de un stream terminado (debe estar vacía)"""
+        self._dropped.discard(stream_id)
+        queue = self._queues.get(stream_id)
+        if queue is not None and queue.empty() and self._sending != stream_id:
+            del self._queues[stream_id]
+    
+    @property
+    def write_buffer_size(self) -> int:
+        """Ocupación total: bytes encolados más bytes en el buffer del transporte"""
+        transport = getattr(self.websocket, 'transport', None)
+        transport_bytes = transport.get_write_buffer_size() if transport else 0
+        return self.pending_bytes + transport_bytes
+    
+    async def _run(self):
+        """Loop de escritura: un mensaje por stream y por turno"""
+        while True:
+            if not self._ready:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            
+            stream_id = self._ready.popleft()
+            queue = self._queues.get(stream_id)
+            if queue is None or queue.empty():
+                continue
+            message = queue.get_nowait()
+            if not queue.empty():
+                self._ready.append(stream_id)  # Vuelve al final de la ronda
+            
+            # websockets espera el drain cuando el buffer supera WRITE_BUFFER_HIGH,
+            # así que el tiempo dentro de send() es tiempo bloqueado por backpressure
+            self._sending = stream_id
+            started = time.perf_counter()
+            try:
+                await self.websocket.send(message)
+            except BaseException:
+                # No llegó al socket: el flush del stream debe reportarlo
+                self._dropped.add(stream_id)
+                raise
+            finally:
+                self._sending = None
+                self.pending_bytes -= len(message)
+                queue.task_done()
+            
+            elapsed = time.perf_counter() - started
+            if self.pacer:
+                self.pacer.on_send_complete(len(message), elapsed)
+            if self.metrics:
+                self.metrics.record_send_blocked(elapsed)
+                self.metrics.set_write_buffer(f"ws-{self.worker_id}", self.write_buffer_size)
+
+
+class StripeCoordinator:
+    """
+    Coordina los workers de un ArrowConnector para que un solo request
+    reparta sus chunks entre todos los sockets vivos.
+    
+    El Gateway enruta cada chunk binario por el prefijo de request_id, así que
+    los chunks de un request pueden llegar por cualquier conexión del tenant.
+    Como el orden entre sockets no está garantizado, el stream_end indica
+    cuántos chunks debe esperar el Gateway (total_chunks).
+    """
+    
+    def __init__(self):
+        self.workers: list["ArrowConnectorWorker"] = []
+        self._cursor = 0  # Round-robin para desempatar sockets igual de libres
+    
+    def register(self, worker: "ArrowConnectorWorker"):
+        """Agrega un worker al pool de sockets disponibles"""
+        self.workers.append(worker)
+    
+    def live_workers(self) -> list["ArrowConnectorWorker"]:
+        """Workers con el socket abierto y registrado"""
+        return [w for w in self.workers if w.is_connected]
+    
+    def pick_worker(self, preferred: "ArrowConnectorWorker") -> "ArrowConnectorWorker":
+        """
+        Elige el socket con menos bytes pendientes en su buffer de escritura.
+        Los empates se resuelven en round-robin para repartir aunque el enlace
+        drene instantáneamente.
+        """
+        candidates = self.live_workers()
+        if not candidates:
+            return preferred
+        self._cursor = (self._cursor + 1) % len(candidates)
+        rotated = candidates[self._cursor:] + candidates[:self._cursor]
+        return min(rotated, key=lambda w: w.write_buffer_size)
+
 
 class ArrowConnectorWorker:
     """Un worker que maneja una conexión WebSocket"""
     
-    def __init__(self, worker_id: int, gateway_uri: str, tenant_id: str):
+    def __init__(self, worker_id: int, gateway_uri: str, tenant_id: str,
+                 coordinator: StripeCoordinator = None, metrics: MetricsReporter = None,
+                 pacer: BandwidthPacer = None, tracer: Tracer = None, profiler: Profiler = None,
+                 warmup: DatasetWarmup = None, query_engine: QueryEngine = None):
         self.worker_id = worker_id
         self.gateway_uri = gateway_uri
         self.tenant_id = tenant_id
+        self.coordinator = coordinator
+        self.metrics = metrics
+        self.pacer = pacer
+        self.tracer = tracer
+        self.profiler = profiler
+        self.warmup = warmup or DatasetWarmup(enabled=False)
+        self.query_engine = query_engine or QueryEngine(enabled=False)
         self.running = False
+        self.registered = False
         self.websocket = None
+        self.scheduler = SendScheduler(worker_id, metrics=metrics, pacer=pacer)
+        self._tasks: set[asyncio.Task] = set()
+        self._stream_slots = asyncio.Semaphore(MAX_CONCURRENT_STREAMS)
+        self.waiting_streams = 0  # DoGets esperando un slot
+        self.active_streams = 0   # DoGets enviando
+    
+    @property
+    def is_connected(self) -> bool:
+        """True si el socket está abierto y el registro fue aceptado"""
+        return (self.registered and self.websocket is not None
+                and self.websocket.state is State.OPEN)
+    
+    @property
+    def write_buffer_size(self) -> int:
+        """Bytes pendientes de escribir (cola del scheduler + buffer del transporte)"""
+        return self.scheduler.write_buffer_size
         
     async def connect_and_run(self):
         """Loop principal de conexión y manejo de mensajes"""
@@ -62,18 +303,27 @@ class ArrowConnectorWorker:
                     max_size=None,
                     ping_interval=None,  # Disable client pings (server manages keepalive)
                     ping_timeout=None,   # Disable ping timeout completely
-                    close_timeout=60     # Allow 60s for graceful close
+                    close_timeout=60,    # Allow 60s for graceful close
+                    write_limit=(WRITE_BUFFER_HIGH, WRITE_BUFFER_LOW)  # Watermarks de backpressure
                 ) as websocket:
                     self.websocket = websocket
                     logger.info(f"[Worker {self.worker_id}] Connected!")
                     
                     if await self._register():
+                        self.registered = True
+                        self.scheduler.start(websocket)
                         await self._message_loop()
                     
             except (ConnectionClosed, OSError) as e:
                 logger.warning(f"[Worker {self.worker_id}] Connection lost: {e}. Retrying in {RECONNECT_DELAY}s...")
             except Exception as e:
                 logger.error(f"[Worker {self.worker_id}] Unexpected error: {e}")
+            finally:
+                self.registered = False
+                await self._cancel_tasks()
+                await self.scheduler.stop()
+                if self.metrics:
+                    self.metrics.set_write_buffer(f"ws-{self.worker_id}", 0)
                 
             if self.running:
                 await asyncio.sleep(RECONNECT_DELAY)
@@ -104,27 +354,69 @@ class ArrowConnectorWorker:
         while True:
             try:
                 msg_text = await self.websocket.recv()
+                received_at = time.perf_counter()
                 msg = json.loads(msg_text)
                 
                 # CLAVE: Procesar en PARALELO para máximo throughput
-                # Cada request se maneja independientemente sin bloquear el loop de lectura
-                asyncio.create_task(self._handle_message(msg))
+                # Cada request se maneja independientemente sin bloquear el loop de lectura.
+                # Las tareas se registran para cancelarlas si se cae la conexión.
+                task = asyncio.create_task(self._handle_message(msg, received_at))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
                 
             except ConnectionClosed:
                 raise
+    
+    async def _cancel_tasks(self):
+        """Cancela los requests en curso de esta conexión"""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
 
-    async def _handle_message(self, msg: dict):
+    def _start_trace(self, name: str, request_id: str, received_at: float):
+        """Inicia la traza del request (si sale sorteada) con su span de recepción"""
+        if self.tracer is None:
+            return NOOP_TRACE
+        trace = self.tracer.start_trace(name, start=received_at, request_id=request_id,
+                                        transport="websocket", worker=self.worker_id)
+        trace.span("receive", received_at, time.perf_counter())
+        return trace
+
+    async def _handle_message(self, msg: dict, received_at: float = None):
         """Despacha la acción correspondiente"""
         action = msg.get("action")
         req_id = msg.get("request_id")
+        received_at = received_at or time.perf_counter()
         
         logger.debug(f"Received action: {action} [{req_id}]")
         
         if action == "get_flight_info":
-            await self._handle_get_flight_info(req_id, msg.get("descriptor"))
+            trace = self._start_trace("GetFlightInfo", req_id, received_at)
+            await self._handle_get_flight_info(req_id, msg.get("descriptor"), trace)
             
         elif action == "do_get":
-            await self._handle_do_get(req_id, msg.get("ticket"))
+            trace = self._start_trace("DoGet", req_id, received_at)
+            # Limitar streams simultáneos: el resto espera turno sin ocupar memoria
+            queued_at = time.perf_counter()
+            self.waiting_streams += 1
+            try:
+                await self._stream_slots.acquire()
+            finally:
+                self.waiting_streams -= 1
+            self.active_streams += 1
+            try:
+                dequeued_at = time.perf_counter()
+                trace.span("queue", queued_at, dequeued_at)
+                if self.metrics:
+                    self.metrics.record_stage("queue_wait", (dequeued_at - received_at) * 1000,
+                                              data_loader.current_dataset, "websocket")
+                await self._handle_do_get(req_id, msg.get("ticket"), received_at, trace)
+            finally:
+                self.active_streams -= 1
+                self._stream_slots.release()
             
         elif action == "heartbeat":
             await self.websocket.send(json.dumps({
@@ -132,8 +424,45 @@ class ArrowConnectorWorker:
                 "tenant_id": self.tenant_id,
                 "timestamp": msg.get("timestamp")
             }))
+            if self.pacer and self.pacer.enabled:
+                await self._probe_rtt()
+        
+        elif action == "profile":
+            await self._handle_profile(req_id, msg)
+    
+    async def _handle_profile(self, request_id: str, msg: dict):
+        """
+        Captura un perfil bajo demanda (kind: 'cpu' o 'memory') y lo retorna
+        al Gateway; también queda escrito en el directorio de perfiles.
+        """
+        if self.profiler is None:
+            result = None
+            error = "Profiling not available"
+        else:
+            try:
+                result = await self.profiler.capture(msg.get("kind", "cpu"), msg.get("duration", 10),
+                                                     top=msg.get("top", 25))
+                error = None
+            except (ValueError, PermissionError, ProfilerBusy) as e:
+                result = None
+                error = str(e)
+        
+        if error:
+            response = {"request_id": request_id, "status": "error", "type": "profile", "error": error}
+        else:
+            response = {"request_id": request_id, "status": "ok", "type": "profile", "data": result}
+        await self.websocket.send(json.dumps(response))
+    
+    async def _probe_rtt(self):
+        """Mide el RTT con un ping WebSocket y lo entrega al pacer como señal de congestión"""
+        try:
+            pong_waiter = await self.websocket.ping()
+            rtt = await asyncio.wait_for(pong_waiter, timeout=10)
+            self.pacer.on_delay_sample(rtt * 1000)
+        except (asyncio.TimeoutError, ConnectionClosed):
+            pass
 
-    async def _handle_get_flight_info(self, request_id: str, descriptor: dict):
+    async def _handle_get_flight_info(self, request_id: str, descriptor: dict, trace=NOOP_TRACE):
         """Retorna metadata del dataset incluyendo número de particiones recomendadas"""
         # Extraer parámetros del descriptor
         dataset_name = None
@@ -146,10 +475,27 @@ class ArrowConnectorWorker:
         
         # rows viene como parámetro adicional
         rows = descriptor.get("rows")
+        # Consulta SQL (DuckDB) sobre los datasets en lugar de un dataset
+        query = descriptor.get("query")
+        load_started = time.perf_counter()
+        
+        # Si el dataset se está precargando, esperar esa carga en vez de repetirla
+        if not query:
+            await self.warmup.wait(dataset_name, rows)
         
         # Decidir: si dataset_name parece un archivo conocido, cargarlo
         # De lo contrario, generar sintéticamente
-        if dataset_name and dataset_name != "sales":
+        if query:
+            # El resultado (cacheado si nada cambió) pasa a ser el dataset activo
+            try:
+                await asyncio.to_thread(self.query_engine.activate, query)
+            except ValueError as e:
+                logger.warning(f"FlightInfo query rejected: {e}")
+                await self.websocket.send(json.dumps({"request_id": request_id, "status": "error",
+                                                      "error": str(e)}))
+                trace.end(error=str(e))
+                return
+        elif dataset_name and dataset_name != "sales":
             # Intentar cargar desde archivo
             success = data_loader.load_from_file(dataset_name)
             if not success:
@@ -168,24 +514,45 @@ class ArrowConnectorWorker:
             if data_loader.total_records == 0:
                 data_loader.load_or_generate_dataset()
         
-        schema_bytes = data_loader.get_schema_bytes()
-        schema_b64 = base64.b64encode(schema_bytes).decode('ascii')
+        loaded_at = time.perf_counter()
+        trace.span("dataset.load", load_started, loaded_at, dataset=data_loader.current_dataset,
+                   rows=data_loader.total_records, bytes=data_loader.total_bytes)
+        if self.metrics:
+            self.metrics.record_stage("dataset_load", (loaded_at - load_started) * 1000,
+                                      data_loader.current_dataset, "websocket")
         
         # Calcular número óptimo de particiones basado en tamaño
         # Solo si parallel_partitions está habilitado en config
         total_bytes = data_loader.total_bytes
         if PARALLEL_PARTITIONS:
-            if total_bytes < 10 * 1024 * 1024:        # < 10MB
-                partitions = 1
-            elif total_bytes < 50 * 1024 * 1024:      # 10-50MB
-                partitions = 2
-            elif total_bytes < 100 * 1024 * 1024:     # 50-100MB
-                partitions = 4
-            else:                                      # > 100MB
-                partitions = 8
+            partitions = data_loader.recommended_partitions()
         else:
             partitions = 1  # Forzar 1 partición para pruebas
         
+        version = data_loader.dataset_version
+        known_version = descriptor.get("known_version")
+        if known_version and known_version == version:
+            # El Gateway ya tiene esta versión: responder sin schema
+            response = {
+                "request_id": request_id,
+                "status": "ok",
+                "data": {
+                    "total_records": data_loader.total_records,
+                    "total_bytes": data_loader.total_bytes,
+                    "dataset": data_loader.current_dataset,
+                    "partitions": partitions,
+                    "version": version,
+                    "not_modified": True
+                }
+            }
+            logger.info(f"FlightInfo: {data_loader.current_dataset} not modified (version {version})")
+            await self.websocket.send(json.dumps(response))
+            trace.end(dataset=data_loader.current_dataset, not_modified=True)
+            return
+        
+        schema_bytes = data_loader.get_schema_bytes()
+        schema_b64 = base64.b64encode(schema_bytes).decode('ascii')
+        
         response = {
             "request_id": request_id,
             "status": "ok",
@@ -194,14 +561,23 @@ class ArrowConnectorWorker:
                 "total_records": data_loader.total_records,
                 "total_bytes": data_loader.total_bytes,
                 "dataset": data_loader.current_dataset,
-                "partitions": partitions  # Número de particiones para paralelismo
+                "partitions": partitions,  # Número de particiones para paralelismo
+                "version": version  # Versión del contenido (known_version en el próximo request)
             }
         }
         logger.info(f"FlightInfo: {data_loader.current_dataset}, {data_loader.total_records:,} rows, {total_bytes/1024/1024:.2f} MB, {partitions} partitions")
         await self.websocket.send(json.dumps(response))
+        trace.end(dataset=data_loader.current_dataset, partitions=partitions)
 
-    async def _handle_do_get(self, request_id: str, ticket: str):
-        """Retorna stream de datos usando protocolo binario, soportando particiones"""
+    async def _handle_do_get(self, request_id: str, ticket: str, received_at: float = None,
+                             trace=NOOP_TRACE):
+        """
+        Retorna stream de datos usando protocolo binario, soportando particiones.
+        received_at (perf_counter) marca la llegada del request, antes de esperar turno.
+        """
+        received_at = received_at or time.perf_counter()
+        resolve_started = time.perf_counter()
+        dataset = data_loader.current_dataset
         
         # Decodificar ticket para obtener info de partición
         # El ticket puede ser:
@@ -209,20 +585,78 @@ class ArrowConnectorWorker:
         # 2. Un string plano (nombre del dataset)
         partition = 0
         total_partitions = 1
+        # Sync incremental: {'column', 'value'} = sólo filas con column > value
+        watermark = None
+        # Versión que el Gateway ya tiene cacheada (si sigue vigente no se envían datos)
+        known_version = None
+        # Consulta SQL cuyo resultado se envía en lugar del dataset activo
+        query = None
         
         if ticket:
             try:
-                import base64
                 # Intentar decodificar como base64 + JSON
                 ticket_bytes = base64.b64decode(ticket)
                 ticket_data = json.loads(ticket_bytes.decode('utf-8'))
                 partition = ticket_data.get("partition", 0)
                 total_partitions = ticket_data.get("total_partitions", 1)
+                watermark = ticket_data.get("watermark")
+                known_version = ticket_data.get("known_version")
+                query = ticket_data.get("query")
                 logger.info(f"Starting data transfer for {request_id} - Partition {partition}/{total_partitions}")
             except Exception:
                 # El ticket es probablemente solo el nombre del dataset - esto es normal
                 logger.debug(f"Ticket is plain dataset name: {ticket[:50] if ticket else 'empty'}...")
         
+        if query:
+            # Ejecuta la consulta o toma el resultado cacheado (FlightInfo ya la suele haber corrido)
+            try:
+                await asyncio.to_thread(self.query_engine.activate, query)
+            except ValueError as e:
+                logger.warning(f"DoGet {request_id} query rejected: {e}")
+                stream_id = f"{request_id}:{partition}"
+                try:
+                    await self.scheduler.send(stream_id, json.dumps({"request_id": request_id, "status": "error",
+                                                                     "error": str(e)}))
+                    await self.scheduler.flush(stream_id)
+                except (ConnectionClosed, ConnectionError):
+                    pass
+                finally:
+                    self.scheduler.close_stream(stream_id)
+                trace.end(error=str(e), partition=partition)
+                return
+            dataset = data_loader.current_dataset
+        
+        version = data_loader.dataset_version
+        if known_version and known_version == version:
+            # Sin cambios desde la última descarga: sólo stream_end, sin datos
+            stream_id = f"{request_id}:{partition}"
+            end_msg = {
+                "request_id": request_id,
+                "status": "ok",
+                "type": "stream_end",
+                "partition": partition,
+                "total_bytes": 0,
+                "total_chunks": 0,
+                "version": version,
+                "not_modified": True
+            }
+            try:
+                await self.scheduler.send(stream_id, json.dumps(end_msg))
+                await self.scheduler.flush(stream_id)
+            except (ConnectionClosed, ConnectionError) as e:
+                logger.warning(f"[Worker {self.worker_id}] Stream {stream_id} aborted: {e}")
+                trace.end(error=f"aborted: {e}", partition=partition)
+                return
+            finally:
+                self.scheduler.close_stream(stream_id)
+            logger.info(f"DoGet {request_id} partition {partition}: not modified (version {version})")
+            trace.end(dataset=dataset, partition=partition, not_modified=True)
+            return
+        
+        # Striping: repartir los chunks entre todos los sockets vivos del tenant
+        striped = (STRIPE_REQUESTS and self.coordinator is not None
+                   and len(self.coordinator.live_workers()) > 1)
+        
         # 1. Enviar metadata de inicio (JSON) - incluyendo tipo de compresión
         compression = TRANSFER_COMPRESSION if TRANSFER_COMPRESSION else 'none'
         start_msg = {
@@ -232,54 +666,141 @@ class ArrowConnectorWorker:
             "schema": base64.b64encode(data_loader.get_schema_bytes()).decode('ascii'),
             "partition": partition,
             "total_partitions": total_partitions,
-            "compression": compression  # Indica al cliente cómo descomprimir
+            "compression": compression,  # Indica al cliente cómo descomprimir
+            "striped": striped,  # Los chunks pueden llegar por cualquier conexión del tenant
+            # Con striping cada chunk lleva su número de secuencia para reordenarlo
+            "chunk_seq": striped,
+            "version": version
         }
-        await self.websocket.send(json.dumps(start_msg))
+        # Cada partición es un stream independiente dentro del scheduler
+        stream_id = f"{request_id}:{partition}"
+        used_workers = {self}
+        trace.span("dataset.resolve", resolve_started, time.perf_counter(), dataset=dataset,
+                   partition=partition, total_partitions=total_partitions, striped=striped)
+        await self.scheduler.send(stream_id, json.dumps(start_msg))
         
-        # 2. Obtener batches con compresión de transferencia
+        # 2. Obtener batches con compresión de transferencia (bajo demanda)
         total_bytes = 0
+        total_chunks = 0
+        total_rows = 0
+        total_arrow_bytes = 0
+        stats = {}
         
         try:
-            all_batches = data_loader.get_record_batches(transfer_compression=TRANSFER_COMPRESSION)
-            total_batches = len(all_batches)
-
-            
-            # Calcular qué batches enviar para esta partición
-            if total_partitions > 1 and total_batches > 1:
-                batch_start = (total_batches * partition) // total_partitions
-                batch_end = (total_batches * (partition + 1)) // total_partitions
-                batches_to_send = all_batches[batch_start:batch_end]
-                logger.debug(f"Partition {partition}: sending batches {batch_start} to {batch_end} of {total_batches}")
-            else:
-                # Si solo hay 1 partición o 1 batch, enviar todo
-                batches_to_send = all_batches
-            
             # 3. Enviar los batches de esta partición
-            # Prefixar cada chunk con request_id (36 bytes UTF-8) para routing en el Gateway
+            # Prefixar cada chunk con request_id (36 bytes UTF-8) para routing en el Gateway;
+            # con striping le sigue la secuencia del chunk (uint32 big-endian, desde 0)
             request_id_bytes = request_id.encode('utf-8').ljust(36)[:36]  # Exactamente 36 bytes
             
-            for batch_bytes in batches_to_send:
-                # Enviar: [request_id 36 bytes] + [Arrow IPC bytes]
-                prefixed_chunk = request_id_bytes + batch_bytes
-                await self.websocket.send(prefixed_chunk)
+            for batch_bytes in data_loader.iter_record_batches(
+                    partition, total_partitions, transfer_compression=TRANSFER_COMPRESSION, stats=stats,
+                    watermark=watermark):
+                batch = stats['last_batch']  # Filas, bytes Arrow y tiempos del batch recién codificado
+                if trace:
+                    trace.span("encode", batch['started'], batch['encoded'], partition=partition,
+                               batch=total_chunks, rows=batch['rows'], bytes=batch['arrow_bytes'])
+                    if compression != 'none':
+                        trace.span("compress", batch['encoded'], batch['compressed'], partition=partition,
+                                   batch=total_chunks, codec=compression, bytes=len(batch_bytes))
+                send_started = time.perf_counter()
+                # Enviar: [request_id 36 bytes] (+ [secuencia 4 bytes]) + [Arrow IPC bytes]
+                if striped:
+                    prefixed_chunk = request_id_bytes + struct.pack('>I', total_chunks) + batch_bytes
+                else:
+                    prefixed_chunk = request_id_bytes + batch_bytes
+                if self.pacer:
+                    await self.pacer.acquire(len(prefixed_chunk))
+                target = self
+                if striped:
+                    target = await self._send_striped(stream_id, prefixed_chunk)
+                    used_workers.add(target)
+                else:
+                    await self.scheduler.send(stream_id, prefixed_chunk)
+                trace.span("send", send_started, time.perf_counter(), partition=partition,
+                           batch=total_chunks, bytes=len(prefixed_chunk), worker=target.worker_id)
+                if total_chunks == 0 and self.metrics:
+                    self.metrics.record_stage("first_byte", (time.perf_counter() - received_at) * 1000,
+                                              dataset, "websocket")
                 total_bytes += len(batch_bytes)
+                total_chunks += 1
+                total_rows += batch['rows']
+                total_arrow_bytes += batch['arrow_bytes']
+                if self.metrics:
+                    self.metrics.record_batch_sent(batch['rows'], batch['arrow_bytes'], len(prefixed_chunk),
+                                                   dataset, "websocket")
                 await asyncio.sleep(0)  # Yield para no bloquear
 
+            # Los chunks enviados por otros sockets deben estar escritos antes del stream_end
+            drain_started = time.perf_counter()
+            for worker in used_workers - {self}:
+                try:
+                    await worker.scheduler.flush(stream_id)
+                except ConnectionError as e:
+                    # total_chunks ya no coincide con lo entregado: error en vez de stream_end
+                    raise RuntimeError(f"Striped chunks lost: {e}") from e
+
             # 4. Enviar Fin de Stream (JSON)
+            # total_chunks permite al Gateway esperar chunks que llegan por otros sockets
             end_msg = {
                 "request_id": request_id,
                 "status": "ok",
                 "type": "stream_end",
                 "partition": partition,
-                "total_bytes": total_bytes
+                "total_bytes": total_bytes,
+                "total_chunks": total_chunks,
+                "version": version
             }
-            await self.websocket.send(json.dumps(end_msg))
-            logger.info(f"Partition {partition} complete. {len(batches_to_send)} batches, {total_bytes/1024/1024:.2f} MB")
+            if watermark:
+                # Valor para el watermark del próximo ticket
+                end_msg["high_watermark"] = stats.get('high_watermark')
+            await self.scheduler.send(stream_id, json.dumps(end_msg))
+            await self.scheduler.flush(stream_id)
+            trace.span("drain", drain_started, time.perf_counter(), partition=partition,
+                       workers=len(used_workers))
+            trace.end(dataset=dataset, partition=partition, codec=compression, chunks=total_chunks,
+                      rows=total_rows, bytes=total_bytes)
+            if self.metrics:
+                duration_ms = (time.perf_counter() - received_at) * 1000
+                self.metrics.record_stage("encode", stats.get('encode_ms', 0.0), dataset, "websocket")
+                self.metrics.record_stage("compress", stats.get('compress_ms', 0.0), dataset, "websocket")
+                self.metrics.record_stage("total_transfer", duration_ms, dataset, "websocket")
+                self.metrics.record_query_processed(duration_ms)
+            logger.info(f"Partition {partition} complete. {total_chunks} batches, {total_rows:,} rows, "
+                        f"{total_arrow_bytes/1024/1024:.2f} MB Arrow -> {total_bytes/1024/1024:.2f} MB sent")
 
+        except (ConnectionClosed, ConnectionError) as e:
+            # El socket propio se cayó: el Gateway descarta el request
+            logger.warning(f"[Worker {self.worker_id}] Stream {stream_id} aborted: {e}")
+            trace.end(error=f"aborted: {e}", partition=partition, chunks=total_chunks)
         except Exception as e:
             logger.error(f"Error streaming data: {e}")
+            trace.end(error=str(e), partition=partition, chunks=total_chunks)
+            if self.metrics:
+                self.metrics.record_error()
             err_msg = {"request_id": request_id, "status": "error", "error": str(e)}
-            await self.websocket.send(json.dumps(err_msg))
+            await self.scheduler.send(stream_id, json.dumps(err_msg))
+            await self.scheduler.flush(stream_id)
+        finally:
+            for worker in used_workers:
+                worker.scheduler.close_stream(stream_id)
+
+    async def _send_striped(self, stream_id: str, chunk: bytes) -> "ArrowConnectorWorker":
+        """
+        Envía un chunk por el socket menos cargado; si ese socket cae, usa el propio.
+        Retorna el worker que finalmente aceptó el chunk.
+        """
+        target = self.coordinator.pick_worker(self)
+        if target is self:
+            await self.scheduler.send(stream_id, chunk)
+            return self
+        try:
+            await target.scheduler.send(stream_id, chunk)
+            return target
+        except (ConnectionClosed, ConnectionError):
+            logger.warning(f"[Worker {target.worker_id}] Closed during striped send, "
+                           f"falling back to worker {self.worker_id}")
+            await self.scheduler.send(stream_id, chunk)
+            return self
 
     def stop(self):
         self.running = False
@@ -293,25 +814,106 @@ class ArrowConnector:
         self.tenant_id = tenant_id or TENANT_ID
         self.parallel_connections = parallel_connections or PARALLEL_CONNECTIONS
         self.workers = []
+        self.coordinator = StripeCoordinator()
+        # Pacer compartido: limita la tasa total de todas las conexiones
+        self.pacer = pacer_from_config(config)
+        # Trazas por request (JSONL local, muestreadas)
+        self.tracer = tracer_from_config(config)
+        # Perfiles CPU/memoria bajo demanda (acción "profile" o /debug/profile)
+        self.profiler = profiler_from_config(config)
+        # Watchdog del event loop (mide lag y captura stacks de bloqueos)
+        self.watchdog = watchdog_from_config(config)
+        # Caché, lectura de archivos y batches de DataLoader según config.yml
+        configure_loader(config)
+        # Precarga de datasets en segundo plano (no demora el registro en el Gateway)
+        self.warmup = warmup_from_config(config)
+        # Appends y cambios en los archivos de los datasets cacheados
+        self.dataset_watcher = watcher_from_config(config)
+        # Consultas SQL (DuckDB) sobre los datasets, con resultados cacheados
+        self.query_engine = query_engine_from_config(config)
+        
+        # Initialize metrics reporter (Observability Plane)
+        # The local endpoint needs the reporter even if remote reporting is off
+        self.metrics: MetricsReporter | None = None
+        if METRICS_ENABLED or LOCAL_METRICS_ENABLED:
+            self.metrics = MetricsReporter(
+                api_url=METRICS_API_URL,
+                tenant_id=self.tenant_id,
+                host_header=METRICS_HOST,
+                spool_dir=(Path(__file__).parent / METRICS_SPOOL.get('dir', 'spool/metrics')
+                           if METRICS_SPOOL.get('enabled', True) else None),
+                spool_max_bytes=int(METRICS_SPOOL.get('max_mb', 10) * 1024 * 1024),
+                batch_size=METRICS_SPOOL.get('batch_size', 50),
+                delta_encoding=METRICS_DELTA_ENCODING,
+                full_snapshot_every=METRICS_FULL_SNAPSHOT_EVERY
+            )
+            self.metrics.pacer = self.pacer
+            self.metrics.watchdog = self.watchdog
         
-        # Cargar datos al inicio (compartido entre workers)
-        data_loader.load_or_generate_dataset()
+        self.metrics_server: MetricsServer | None = None
+        if LOCAL_METRICS_ENABLED:
+            self.metrics_server = MetricsServer(self.metrics, LOCAL_METRICS_HOST, LOCAL_METRICS_PORT,
+                                                watchdog=self.watchdog, profiler=self.profiler)
+            self._register_gauges()
         
         logger.info(f"ArrowConnector initialized:")
         logger.info(f"  Gateway URI: {self.gateway_uri}")
         logger.info(f"  Tenant ID: {self.tenant_id}")
         logger.info(f"  Parallel Connections: {self.parallel_connections}")
+        logger.info(f"  Stripe Requests: {STRIPE_REQUESTS}")
+        logger.info(f"  Write Buffer: high={WRITE_BUFFER_HIGH} low={WRITE_BUFFER_LOW} bytes")
+        logger.info(f"  Pacing Enabled: {self.pacer.enabled}")
+        logger.info(f"  Tracing Enabled: {self.tracer.enabled} (sample rate: {self.tracer.sample_rate})")
+        logger.info(f"  Metrics Enabled: {METRICS_ENABLED} (local endpoint: {LOCAL_METRICS_ENABLED})")
+    
+    def _register_gauges(self):
+        """Live gauges for the local scrape endpoint (sumados sobre todos los workers)"""
+        server = self.metrics_server
+        server.add_gauge("outgoing_queue_depth", "Messages queued in the WebSocket send schedulers",
+                         lambda: sum(w.scheduler.pending_messages for w in self.workers))
+        server.add_gauge("request_queue_length", "DoGet requests waiting for a stream slot",
+                         lambda: sum(w.waiting_streams for w in self.workers))
+        server.add_gauge("inflight_streams", "DoGet streams being sent",
+                         lambda: sum(w.active_streams for w in self.workers))
+        server.add_gauge("live_connections", "Registered WebSocket connections",
+                         lambda: len(self.coordinator.live_workers()))
+        server.add_gauge("dataset_bytes", "In-memory size of the loaded dataset", lambda: data_loader.total_bytes)
+        server.add_gauge("dataset_cache_hit_ratio", "Dataset loads served from memory",
+                         lambda: round(data_loader.cache_hit_ratio, 4))
+        server.add_gauge("datasets_cached", "Datasets held in memory", lambda: len(data_loader.cached_datasets))
     
     async def run(self):
         """Inicia N workers en paralelo"""
+        # Detector de bloqueos del event loop (stack del callback que lo bloquea)
+        self.watchdog.start()
+        
+        # Start metrics reporter loop (Observability Plane)
+        if METRICS_ENABLED:
+            asyncio.create_task(self.metrics.start(interval=METRICS_INTERVAL))
+        if self.metrics_server:
+            await self.metrics_server.start()
+        
         self.workers = [
             ArrowConnectorWorker(
                 worker_id=i,
                 gateway_uri=self.gateway_uri,
-                tenant_id=self.tenant_id
+                tenant_id=self.tenant_id,
+                coordinator=self.coordinator,
+                metrics=self.metrics,
+                pacer=self.pacer,
+                tracer=self.tracer,
+                profiler=self.profiler,
+                warmup=self.warmup,
+                query_engine=self.query_engine
             )
             for i in range(self.parallel_connections)
         ]
+        for w in self.workers:
+            self.coordinator.register(w)
+        
+        # Los workers se conectan mientras los datasets se cargan en un hilo
+        self.warmup.start()
+        self.dataset_watcher.start()
         
         # Ejecutar todos los workers concurrentemente
         await asyncio.gather(*[w.connect_and_run() for w in self.workers])
@@ -320,3 +922,9 @@ class ArrowConnector:
         """Detiene todos los workers"""
         for w in self.workers:
             w.stop()
+        self.warmup.stop()
+        self.dataset_watcher.stop()
+        self.watchdog.stop()
+        self.tracer.close()
+        if self.metrics:
+            self.metrics.stop()
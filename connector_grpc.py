@@ -4,8 +4,10 @@ Usa protobuf nativo generado por protoc para máximo rendimiento
 """
 import asyncio
 import logging
+import os
 import base64
 import platform
+import time
 from pathlib import Path
 
 import grpc
@@ -15,13 +17,22 @@ import yaml
 from proto import connector_pb2
 from proto import connector_pb2_grpc
 
-from data_loader import data_loader
+from data_loader import configure_loader, data_loader
+from dataset_watch import watcher_from_config
 from metrics_reporter import MetricsReporter
+from loop_watchdog import watchdog_from_config
+from metrics_server import MetricsServer
+from pacing import pacer_from_config
+from profiler import profiler_from_config
+from query_engine import query_engine_from_config
+from tracing import NOOP_TRACE, tracer_from_config
+from warmup import warmup_from_config
 
 logger = logging.getLogger("ConnectorGRPC")
 
 # Cargar configuración
-CONFIG_PATH = Path(__file__).parent / "config.yml"
+# CONNECTOR_CONFIG permite usar otro archivo (p. ej. el que genera bench/)
+CONFIG_PATH = Path(os.environ.get("CONNECTOR_CONFIG") or Path(__file__).parent / "config.yml")
 
 def load_config():
     """Carga configuración desde YAML"""
@@ -46,12 +57,22 @@ if TRANSFER_COMPRESSION and TRANSFER_COMPRESSION.lower() == 'none':
 # Queue configuration
 QUEUE_ENABLED = config.get('queue', {}).get('enabled', True)
 MAX_QUEUE_SIZE = config.get('queue', {}).get('max_size', 100)
+# DoGets procesados en paralelo desde la cola (1 = secuencial)
+QUEUE_WORKERS = config.get('queue', {}).get('workers', 1)
 
 # Metrics configuration (Observability Plane)
 METRICS_ENABLED = config.get('metrics', {}).get('enabled', True)
 METRICS_API_URL = config.get('metrics', {}).get('api_url', 'http://localhost:8000')
 METRICS_HOST = config.get('metrics', {}).get('api_host', None)  # Host header for Traefik
 METRICS_INTERVAL = config.get('metrics', {}).get('interval_seconds', 30)
+METRICS_SPOOL = config.get('metrics', {}).get('spool', {}) or {}
+METRICS_DELTA_ENCODING = config.get('metrics', {}).get('delta_encoding', False)
+METRICS_FULL_SNAPSHOT_EVERY = config.get('metrics', {}).get('full_snapshot_every', 10)
+# Local scrape endpoint (Prometheus/OpenMetrics)
+LOCAL_METRICS = config.get('metrics', {}).get('local_endpoint', {}) or {}
+LOCAL_METRICS_ENABLED = LOCAL_METRICS.get('enabled', False)
+LOCAL_METRICS_HOST = LOCAL_METRICS.get('host', '127.0.0.1')
+LOCAL_METRICS_PORT = LOCAL_METRICS.get('port', 9464)
 
 
 class GRPCConnector:
@@ -71,24 +92,59 @@ class GRPCConnector:
             (self.certs_path / "client.key").exists()
         )
         
-        # Cargar datos al inicio
-        data_loader.load_or_generate_dataset()
+        # Caché, lectura de archivos y batches de DataLoader según config.yml
+        configure_loader(config)
+        # Precarga de datasets en segundo plano (no demora el registro en el Gateway)
+        self.warmup = warmup_from_config(config)
+        # Appends y cambios en los archivos de los datasets cacheados
+        self.dataset_watcher = watcher_from_config(config)
+        # Consultas SQL (DuckDB) sobre los datasets, con resultados cacheados
+        self.query_engine = query_engine_from_config(config)
+        
+        # Pacer de ancho de banda compartido por todas las transferencias
+        self.pacer = pacer_from_config(config)
+        # Trazas por request (JSONL local, muestreadas)
+        self.tracer = tracer_from_config(config)
+        # Perfiles CPU/memoria bajo demanda (vía /debug/profile del endpoint local)
+        self.profiler = profiler_from_config(config)
+        # Watchdog del event loop (mide lag y captura stacks de bloqueos)
+        self.watchdog = watchdog_from_config(config)
         
         # Initialize metrics reporter (Observability Plane)
+        # The local endpoint needs the reporter even if remote reporting is off
         self.metrics: MetricsReporter | None = None
-        if METRICS_ENABLED:
+        if METRICS_ENABLED or LOCAL_METRICS_ENABLED:
             self.metrics = MetricsReporter(
                 api_url=METRICS_API_URL,
                 tenant_id=self.tenant_id,
-                host_header=METRICS_HOST
+                host_header=METRICS_HOST,
+                spool_dir=(Path(__file__).parent / METRICS_SPOOL.get('dir', 'spool/metrics')
+                           if METRICS_SPOOL.get('enabled', True) else None),
+                spool_max_bytes=int(METRICS_SPOOL.get('max_mb', 10) * 1024 * 1024),
+                batch_size=METRICS_SPOOL.get('batch_size', 50),
+                delta_encoding=METRICS_DELTA_ENCODING,
+                full_snapshot_every=METRICS_FULL_SNAPSHOT_EVERY
             )
+            self.metrics.pacer = self.pacer
+            self.metrics.watchdog = self.watchdog
+        
+        # Live state exposed through the local metrics endpoint
+        self.outgoing: asyncio.Queue | None = None
+        self.active_streams = 0
+        self.metrics_server: MetricsServer | None = None
+        if LOCAL_METRICS_ENABLED:
+            self.metrics_server = MetricsServer(self.metrics, LOCAL_METRICS_HOST, LOCAL_METRICS_PORT,
+                                                watchdog=self.watchdog, profiler=self.profiler)
+            self._register_gauges()
         
         logger.info(f"GRPCConnector initialized (native protobuf):")
         logger.info(f"  Gateway URI: {self.grpc_uri}")
         logger.info(f"  Tenant ID: {self.tenant_id}")
         logger.info(f"  mTLS Enabled: {self.mtls_enabled}")
-        logger.info(f"  Metrics Enabled: {METRICS_ENABLED}")
-        logger.info(f"  Queue Enabled: {QUEUE_ENABLED} (max: {MAX_QUEUE_SIZE})")
+        logger.info(f"  Metrics Enabled: {METRICS_ENABLED} (local endpoint: {LOCAL_METRICS_ENABLED})")
+        logger.info(f"  Queue Enabled: {QUEUE_ENABLED} (max: {MAX_QUEUE_SIZE}, workers: {QUEUE_WORKERS})")
+        logger.info(f"  Pacing Enabled: {self.pacer.enabled}")
+        logger.info(f"  Tracing Enabled: {self.tracer.enabled} (sample rate: {self.tracer.sample_rate})")
         
         # Request queue for sequential processing
         self.request_queue: asyncio.Queue = asyncio.Queue()
@@ -96,6 +152,19 @@ class GRPCConnector:
         self.max_queue_size = MAX_QUEUE_SIZE
 
     
+    def _register_gauges(self):
+        """Live gauges for the local scrape endpoint"""
+        server = self.metrics_server
+        server.add_gauge("outgoing_queue_depth", "Messages waiting in the outgoing gRPC stream",
+                         lambda: self.outgoing.qsize() if self.outgoing else 0)
+        server.add_gauge("request_queue_length", "DoGet requests waiting in the request queue",
+                         lambda: self.request_queue.qsize())
+        server.add_gauge("inflight_streams", "DoGet streams being sent", lambda: self.active_streams)
+        server.add_gauge("dataset_bytes", "In-memory size of the loaded dataset", lambda: data_loader.total_bytes)
+        server.add_gauge("dataset_cache_hit_ratio", "Dataset loads served from memory",
+                         lambda: round(data_loader.cache_hit_ratio, 4))
+        server.add_gauge("datasets_cached", "Datasets held in memory", lambda: len(data_loader.cached_datasets))
+    
     def _load_tls_credentials(self):
         """Load TLS credentials for mTLS"""
         with open(self.certs_path / "ca.crt", "rb") as f:
@@ -115,9 +184,18 @@ class GRPCConnector:
         """Loop principal de conexión"""
         self.running = True
         
+        # Detector de bloqueos del event loop (stack del callback que lo bloquea)
+        self.watchdog.start()
+        
         # Start metrics reporter loop (Observability Plane)
-        if self.metrics:
+        if METRICS_ENABLED:
             asyncio.create_task(self.metrics.start(interval=METRICS_INTERVAL))
+        if self.metrics_server:
+            await self.metrics_server.start()
+        
+        # La conexión se establece mientras los datasets se cargan en un hilo
+        self.warmup.start()
+        self.dataset_watcher.start()
         
         while self.running:
             try:
@@ -148,6 +226,7 @@ class GRPCConnector:
         
         # Cola para mensajes salientes (protobuf messages)
         outgoing = asyncio.Queue()
+        self.outgoing = outgoing
         
         # Enviar mensaje de registro usando tipo nativo
         register_msg = connector_pb2.ConnectorMessage(
@@ -160,10 +239,11 @@ class GRPCConnector:
         )
         await outgoing.put(register_msg)
         
-        # Start queue worker for sequential request processing
-        worker_task = None
+        # Start queue workers (1 = sequential request processing)
+        worker_tasks = []
         if self.queue_enabled:
-            worker_task = asyncio.create_task(self._queue_worker(outgoing))
+            worker_tasks = [asyncio.create_task(self._queue_worker(outgoing, i))
+                            for i in range(QUEUE_WORKERS)]
         
         async def message_generator():
             """Genera mensajes para el stream saliente"""
@@ -171,7 +251,12 @@ class GRPCConnector:
                 msg = await outgoing.get()
                 if msg is None:
                     break
+                # gRPC pide el siguiente mensaje cuando aceptó el anterior (control de flujo):
+                # el tiempo hasta volver aquí mide la tasa de completado del envío
+                started = time.perf_counter()
                 yield msg
+                if msg.HasField('arrow_chunk'):
+                    self.pacer.on_send_complete(len(msg.arrow_chunk.data), time.perf_counter() - started)
         
         # Crear stub del servicio generado
         stub = connector_pb2_grpc.ConnectorServiceStub(self.channel)
@@ -184,17 +269,22 @@ class GRPCConnector:
             async for command in call:
                 await self._handle_command(command, outgoing)
         finally:
-            if worker_task:
+            for worker_task in worker_tasks:
                 worker_task.cancel()
-                try:
-                    await worker_task
-                except asyncio.CancelledError:
-                    pass
+            if worker_tasks:
+                await asyncio.gather(*worker_tasks, return_exceptions=True)
 
     
+    def _start_trace(self, name: str, request_id: str, received_at: float):
+        """Inicia la traza del request (si sale sorteada) con su span de recepción"""
+        trace = self.tracer.start_trace(name, start=received_at, request_id=request_id, transport="grpc")
+        trace.span("receive", received_at, time.perf_counter())
+        return trace
+    
     async def _handle_command(self, command: connector_pb2.GatewayCommand, outgoing: asyncio.Queue):
         """Procesa comandos del Gateway (tipos nativos)"""
         req_id = command.request_id
+        received_at = time.perf_counter()
         
         # Detectar qué comando es usando HasField con oneof
         if command.HasField('register_response'):
@@ -205,9 +295,11 @@ class GRPCConnector:
                 logger.error(f"Registration failed: {resp.error}")
         
         elif command.HasField('get_flight_info'):
-            await self._handle_get_flight_info(req_id, command.get_flight_info, outgoing)
+            trace = self._start_trace("GetFlightInfo", req_id, received_at)
+            await self._handle_get_flight_info(req_id, command.get_flight_info, outgoing, trace)
         
         elif command.HasField('do_get'):
+            trace = self._start_trace("DoGet", req_id, received_at)
             if self.queue_enabled:
                 # Enqueue request for sequential processing
                 queue_size = self.request_queue.qsize()
@@ -222,16 +314,23 @@ class GRPCConnector:
                         )
                     )
                     await outgoing.put(error_msg)
+                    trace.end(error="queue full", queue_size=queue_size)
                 else:
                     # Enqueue for sequential processing
-                    await self.request_queue.put((req_id, command.do_get, outgoing))
+                    await self.request_queue.put((req_id, command.do_get, outgoing, received_at, trace))
                     logger.info(f"[{req_id}] Enqueued DoGet. Queue position: {queue_size + 1}")
             else:
                 # Queue disabled, process immediately
-                await self._handle_do_get(req_id, command.do_get, outgoing)
+                self.active_streams += 1
+                try:
+                    await self._handle_do_get(req_id, command.do_get, outgoing, received_at, trace)
+                finally:
+                    self.active_streams -= 1
 
         
         elif command.HasField('heartbeat'):
+            # El retardo del heartbeat por encima del mínimo indica cola en el enlace
+            self.pacer.on_heartbeat(command.heartbeat.timestamp)
             response = connector_pb2.ConnectorMessage(
                 request_id=req_id,
                 heartbeat=connector_pb2.HeartbeatResponse(
@@ -241,26 +340,37 @@ class GRPCConnector:
             )
             await outgoing.put(response)
     
-    async def _queue_worker(self, outgoing: asyncio.Queue):
+    async def _queue_worker(self, outgoing: asyncio.Queue, worker_id: int = 0):
         """
-        Worker that processes DoGet requests sequentially.
-        This prevents bandwidth saturation by processing one request at a time.
+        Worker that processes DoGet requests from the queue one at a time.
+        With a single worker requests run sequentially; with pacing enabled
+        several workers can share the uplink without saturating it.
         """
-        logger.info("Queue worker started - processing requests sequentially")
+        logger.info(f"Queue worker {worker_id} started")
         
         while self.running:
             try:
                 # Wait for a request in the queue (with timeout to check self.running)
-                req_id, do_get, out_queue = await asyncio.wait_for(
+                req_id, do_get, out_queue, enqueued_at, trace = await asyncio.wait_for(
                     self.request_queue.get(), 
                     timeout=1.0
                 )
                 
                 queue_remaining = self.request_queue.qsize()
                 logger.info(f"[{req_id}] Dequeued. Processing... (queue remaining: {queue_remaining})")
+                dequeued_at = time.perf_counter()
+                trace.span("queue", enqueued_at, dequeued_at, queue_worker=worker_id,
+                           queue_remaining=queue_remaining)
+                if self.metrics:
+                    self.metrics.record_stage("queue_wait", (dequeued_at - enqueued_at) * 1000,
+                                              data_loader.current_dataset, "grpc")
                 
                 # Process the request (this blocks until complete)
-                await self._handle_do_get(req_id, do_get, out_queue)
+                self.active_streams += 1
+                try:
+                    await self._handle_do_get(req_id, do_get, out_queue, received_at=enqueued_at, trace=trace)
+                finally:
+                    self.active_streams -= 1
                 
                 logger.info(f"[{req_id}] Transfer complete. Queue size: {self.request_queue.qsize()}")
                 
@@ -273,9 +383,10 @@ class GRPCConnector:
             except Exception as e:
                 logger.error(f"Queue worker error: {e}")
         
-        logger.info("Queue worker stopped")
+        logger.info(f"Queue worker {worker_id} stopped")
     
-    async def _handle_get_flight_info(self, request_id: str, get_info: connector_pb2.GetFlightInfoRequest, outgoing: asyncio.Queue):
+    async def _handle_get_flight_info(self, request_id: str, get_info: connector_pb2.GetFlightInfoRequest,
+                                      outgoing: asyncio.Queue, trace=NOOP_TRACE):
 
         """Maneja solicitud de FlightInfo con tipos nativos"""
         path = list(get_info.path)
@@ -284,7 +395,23 @@ class GRPCConnector:
         dataset_name = path[0] if path else None
         
         # Cargar dataset
-        if dataset_name and dataset_name != "sales":
+        load_started = time.perf_counter()
+        # Si el dataset se está precargando, esperar esa carga en vez de repetirla
+        if not get_info.query:
+            await self.warmup.wait(dataset_name, rows or None)
+        if get_info.query:
+            # Consulta SQL: el resultado (cacheado si nada cambió) pasa a ser el dataset activo
+            try:
+                await asyncio.to_thread(self.query_engine.activate, get_info.query)
+            except ValueError as e:
+                logger.warning(f"FlightInfo query rejected: {e}")
+                await outgoing.put(connector_pb2.ConnectorMessage(
+                    request_id=request_id,
+                    flight_info=connector_pb2.FlightInfoResponse(status="error", error=str(e))
+                ))
+                trace.end(error=str(e))
+                return
+        elif dataset_name and dataset_name != "sales":
             success = data_loader.load_from_file(dataset_name)
             if not success:
                 data_loader.load_or_generate_dataset(rows=rows or 1_000_000)
@@ -294,20 +421,40 @@ class GRPCConnector:
             if data_loader.total_records == 0:
                 data_loader.load_or_generate_dataset()
         
+        loaded_at = time.perf_counter()
+        trace.span("dataset.load", load_started, loaded_at, dataset=data_loader.current_dataset,
+                   rows=data_loader.total_records, bytes=data_loader.total_bytes)
+        if self.metrics:
+            self.metrics.record_stage("dataset_load", (loaded_at - load_started) * 1000,
+                                      data_loader.current_dataset, "grpc")
+        
         # Calcular particiones
         total_bytes = data_loader.total_bytes
         if PARALLEL_PARTITIONS:
-            if total_bytes < 10 * 1024 * 1024:
-                partitions = 1
-            elif total_bytes < 50 * 1024 * 1024:
-                partitions = 2
-            elif total_bytes < 100 * 1024 * 1024:
-                partitions = 4
-            else:
-                partitions = 8
+            partitions = data_loader.recommended_partitions()
         else:
             partitions = 1
         
+        version = data_loader.dataset_version
+        if get_info.known_version and get_info.known_version == version:
+            # El Gateway ya tiene esta versión: responder sin schema
+            response = connector_pb2.ConnectorMessage(
+                request_id=request_id,
+                flight_info=connector_pb2.FlightInfoResponse(
+                    status="ok",
+                    total_records=data_loader.total_records,
+                    total_bytes=total_bytes,
+                    dataset=data_loader.current_dataset,
+                    partitions=partitions,
+                    version=version,
+                    not_modified=True
+                )
+            )
+            logger.info(f"FlightInfo: {data_loader.current_dataset} not modified (version {version})")
+            await outgoing.put(response)
+            trace.end(dataset=data_loader.current_dataset, not_modified=True)
+            return
+        
         # Respuesta con tipo nativo (schema como bytes, no base64)
         response = connector_pb2.ConnectorMessage(
             request_id=request_id,
@@ -317,22 +464,38 @@ class GRPCConnector:
                 total_records=data_loader.total_records,
                 total_bytes=total_bytes,
                 dataset=data_loader.current_dataset,
-                partitions=partitions
+                partitions=partitions,
+                version=version
             )
         )
         
         logger.info(f"FlightInfo: {data_loader.current_dataset}, {data_loader.total_records:,} rows, {total_bytes/1024/1024:.2f} MB, {partitions} partitions")
         await outgoing.put(response)
+        trace.end(dataset=data_loader.current_dataset, partitions=partitions)
     
-    async def _handle_do_get(self, request_id: str, do_get: connector_pb2.DoGetRequest, outgoing: asyncio.Queue):
-        """Maneja solicitud DoGet con streaming de Arrow IPC nativo"""
+    async def _handle_do_get(self, request_id: str, do_get: connector_pb2.DoGetRequest, outgoing: asyncio.Queue,
+                             received_at: float = None, trace=NOOP_TRACE):
+        """
+        Maneja solicitud DoGet con streaming de Arrow IPC nativo.
+        received_at (perf_counter) marca la llegada del request, antes de la cola.
+        """
         import json
         
+        received_at = received_at or time.perf_counter()
+        resolve_started = time.perf_counter()
+        dataset = data_loader.current_dataset
+        
         ticket = do_get.ticket
         
         # Decodificar ticket para info de partición
         partition = 0
         total_partitions = 1
+        # Sync incremental: {'column', 'value'} = sólo filas con column > value
+        watermark = None
+        # Versión que el Gateway ya tiene cacheada (si sigue vigente no se envían datos)
+        known_version = None
+        # Consulta SQL cuyo resultado se envía en lugar del dataset activo
+        query = None
         
         if ticket:
             try:
@@ -340,10 +503,43 @@ class GRPCConnector:
                 ticket_data = json.loads(ticket_bytes.decode('utf-8'))
                 partition = ticket_data.get("partition", 0)
                 total_partitions = ticket_data.get("total_partitions", 1)
+                watermark = ticket_data.get("watermark")
+                known_version = ticket_data.get("known_version")
+                query = ticket_data.get("query")
                 logger.info(f"Starting data transfer for {request_id} - Partition {partition}/{total_partitions}")
             except Exception:
                 logger.debug(f"Ticket is plain dataset name")
         
+        if query:
+            # Ejecuta la consulta o toma el resultado cacheado (FlightInfo ya la suele haber corrido)
+            try:
+                await asyncio.to_thread(self.query_engine.activate, query)
+            except ValueError as e:
+                logger.warning(f"DoGet {request_id} query rejected: {e}")
+                await outgoing.put(connector_pb2.ConnectorMessage(
+                    request_id=request_id,
+                    stream_status=connector_pb2.StreamStatus(type="stream_end", error=str(e))
+                ))
+                trace.end(error=str(e), partition=partition)
+                return
+            dataset = data_loader.current_dataset
+        
+        version = data_loader.dataset_version
+        if known_version and known_version == version:
+            # Sin cambios desde la última descarga: sólo stream_end, sin datos
+            await outgoing.put(connector_pb2.ConnectorMessage(
+                request_id=request_id,
+                stream_status=connector_pb2.StreamStatus(
+                    type="stream_end",
+                    partition=partition,
+                    version=version,
+                    not_modified=True
+                )
+            ))
+            logger.info(f"DoGet {request_id} partition {partition}: not modified (version {version})")
+            trace.end(dataset=dataset, partition=partition, not_modified=True)
+            return
+        
         # Enviar stream_start con tipo nativo - incluyendo tipo de compresión
         compression = TRANSFER_COMPRESSION if TRANSFER_COMPRESSION else 'none'
         start_msg = connector_pb2.ConnectorMessage(
@@ -353,25 +549,34 @@ class GRPCConnector:
                 schema=data_loader.get_schema_bytes(),  # Bytes directos
                 partition=partition,
                 total_partitions=total_partitions,
-                compression=compression  # Indica al cliente cómo descomprimir
+                compression=compression,  # Indica al cliente cómo descomprimir
+                version=version
             )
         )
+        trace.span("dataset.resolve", resolve_started, time.perf_counter(), dataset=dataset,
+                   partition=partition, total_partitions=total_partitions)
         await outgoing.put(start_msg)
         
-        # Enviar chunks de Arrow IPC con compresión de transferencia
+        # Enviar chunks de Arrow IPC con compresión de transferencia (codificados bajo demanda)
         total_bytes = 0
+        total_chunks = 0
+        total_rows = 0
+        total_arrow_bytes = 0
+        stats = {}
         try:
-            all_batches = data_loader.get_record_batches(transfer_compression=TRANSFER_COMPRESSION)
-            total_batches = len(all_batches)
-            
-            if total_partitions > 1 and total_batches > 1:
-                batch_start = (total_batches * partition) // total_partitions
-                batch_end = (total_batches * (partition + 1)) // total_partitions
-                batches_to_send = all_batches[batch_start:batch_end]
-            else:
-                batches_to_send = all_batches
-            
-            for batch_bytes in batches_to_send:
+            for batch_bytes in data_loader.iter_record_batches(
+                    partition, total_partitions, transfer_compression=TRANSFER_COMPRESSION, stats=stats,
+                    watermark=watermark):
+                batch = stats['last_batch']  # Filas, bytes Arrow y tiempos del batch recién codificado
+                if trace:
+                    trace.span("encode", batch['started'], batch['encoded'], partition=partition,
+                               batch=total_chunks, rows=batch['rows'], bytes=batch['arrow_bytes'])
+                    if compression != 'none':
+                        trace.span("compress", batch['encoded'], batch['compressed'], partition=partition,
+                                   batch=total_chunks, codec=compression, bytes=len(batch_bytes))
+                send_started = time.perf_counter()
+                # Respetar la tasa de envío estimada para el uplink
+                await self.pacer.acquire(len(batch_bytes))
                 # Enviar como ArrowChunk con bytes directos (sin base64!)
                 chunk_msg = connector_pb2.ConnectorMessage(
                     request_id=request_id,
@@ -381,11 +586,20 @@ class GRPCConnector:
                     )
                 )
                 await outgoing.put(chunk_msg)
+                trace.span("send", send_started, time.perf_counter(), partition=partition,
+                           batch=total_chunks, bytes=len(batch_bytes))
+                if total_chunks == 0 and self.metrics:
+                    self.metrics.record_stage("first_byte", (time.perf_counter() - received_at) * 1000,
+                                              dataset, "grpc")
                 total_bytes += len(batch_bytes)
+                total_chunks += 1
+                total_rows += batch['rows']
+                total_arrow_bytes += batch['arrow_bytes']
                 
-                # Record metrics (Observability Plane)
+                # Record metrics (Observability Plane) - filas y bytes reales de este batch
                 if self.metrics:
-                    self.metrics.record_bytes_sent(len(batch_bytes))
+                    self.metrics.record_batch_sent(batch['rows'], batch['arrow_bytes'], len(batch_bytes),
+                                                   dataset, "grpc")
                 
                 await asyncio.sleep(0)
             
@@ -395,20 +609,30 @@ class GRPCConnector:
                 stream_status=connector_pb2.StreamStatus(
                     type="stream_end",
                     partition=partition,
-                    total_bytes=total_bytes
+                    total_bytes=total_bytes,
+                    # Valor para el watermark del próximo ticket (vacío si no se pidió)
+                    high_watermark='' if stats.get('high_watermark') is None else str(stats['high_watermark']),
+                    version=version
                 )
             )
             await outgoing.put(end_msg)
+            trace.end(dataset=dataset, partition=partition, codec=compression, chunks=total_chunks,
+                      rows=total_rows, bytes=total_bytes)
             
             # Record query completion (Observability Plane)
             if self.metrics:
-                self.metrics.record_query_processed()
-                self.metrics.record_records_sent(data_loader.total_records)
+                duration_ms = (time.perf_counter() - received_at) * 1000
+                self.metrics.record_stage("encode", stats.get('encode_ms', 0.0), dataset, "grpc")
+                self.metrics.record_stage("compress", stats.get('compress_ms', 0.0), dataset, "grpc")
+                self.metrics.record_stage("total_transfer", duration_ms, dataset, "grpc")
+                self.metrics.record_query_processed(duration_ms)
             
-            logger.info(f"Partition {partition} complete. {len(batches_to_send)} batches, {total_bytes/1024/1024:.2f} MB")
+            logger.info(f"Partition {partition} complete. {total_chunks} batches, {total_rows:,} rows, "
+                        f"{total_arrow_bytes/1024/1024:.2f} MB Arrow -> {total_bytes/1024/1024:.2f} MB sent")
         
         except Exception as e:
             logger.error(f"Error streaming data: {e}")
+            trace.end(error=str(e), partition=partition, chunks=total_chunks)
             error_msg = connector_pb2.ConnectorMessage(
                 request_id=request_id,
                 stream_status=connector_pb2.StreamStatus(
@@ -420,6 +644,10 @@ class GRPCConnector:
     
     def stop(self):
         self.running = False
+        self.warmup.stop()
+        self.dataset_watcher.stop()
+        self.watchdog.stop()
+        self.tracer.close()
         if self.channel:
             asyncio.create_task(self.channel.close())
 
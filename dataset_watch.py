@@ -0,0 +1,102 @@
+"""
+Vigilancia de los archivos de los datasets cacheados.
+
+Cuando cambia un archivo de datasets/ que está en la caché de DataLoader, lo
+actualiza en segundo plano con DataLoader.refresh_files: si sólo se agregaron
+filas al final (CSV/NDJSON) se parsean únicamente los bytes nuevos y se
+agregan como batches; si el archivo se reescribió, se recarga completo.
+
+Usa watchfiles (inotify / FSEvents / ReadDirectoryChangesW) si está instalado;
+si no, revisa tamaño y fecha de modificación de los archivos cacheados cada
+poll_interval segundos.
+"""
+import asyncio
+import logging
+from pathlib import Path
+
+from data_loader import DATASETS_DIR, DataLoader, data_loader
+
+try:
+    import watchfiles
+    WATCHFILES_AVAILABLE = True
+except ImportError:
+    WATCHFILES_AVAILABLE = False
+
+logger = logging.getLogger("DatasetWatch")
+
+
+class DatasetWatcher:
+    """Actualiza los datasets cacheados cuando cambian sus archivos"""
+
+    def __init__(self, loader: DataLoader = None, directory: Path = None, enabled: bool = True,
+                 poll_interval: float = 1.0, force_polling: bool = False):
+        self.loader = loader or data_loader
+        self.directory = Path(directory or DATASETS_DIR)
+        self.enabled = enabled
+        self.poll_interval = poll_interval
+        self.use_watchfiles = WATCHFILES_AVAILABLE and not force_polling
+        self._task: asyncio.Task | None = None
+        self._stop_event: asyncio.Event | None = None
+
+    def start(self):
+        """Programa la vigilancia en el event loop actual (no bloquea)"""
+        if not self.enabled or self._task is not None:
+            return
+        if not self.directory.exists():
+            logger.info(f"Dataset watch disabled: {self.directory} does not exist")
+            return
+        self._stop_event = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        mode = "watchfiles" if self.use_watchfiles else f"polling every {self.poll_interval}s"
+        logger.info(f"Watching {self.directory} for dataset changes ({mode})")
+
+    def stop(self):
+        if self._stop_event is not None:
+            self._stop_event.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        try:
+            if self.use_watchfiles:
+                await self._run_watchfiles()
+            else:
+                await self._run_polling()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Dataset watch stopped: {e}")
+
+    async def _run_watchfiles(self):
+        async for changes in watchfiles.awatch(self.directory, stop_event=self._stop_event, recursive=False):
+            changed = {Path(path).resolve() for _, path in changes}
+            keys = [key for key, path in self.loader.watched_files.items() if path.resolve() in changed]
+            if keys:
+                await self._refresh(keys)
+
+    async def _run_polling(self):
+        while not self._stop_event.is_set():
+            await asyncio.sleep(self.poll_interval)
+            # Sin lista: refresh_files revisa (con un stat) todos los archivos cacheados
+            if self.loader.watched_files:
+                await self._refresh(None)
+
+    async def _refresh(self, keys: list[str] | None):
+        try:
+            updated = await asyncio.to_thread(self.loader.refresh_files, keys)
+        except Exception as e:
+            logger.error(f"Dataset refresh failed: {e}")
+            return
+        for key in updated:
+            logger.info(f"Dataset '{key}' refreshed after a file change")
+
+
+def watcher_from_config(config: dict) -> DatasetWatcher:
+    """Crea la vigilancia a partir de la sección 'datasets' de config.yml"""
+    cfg = config.get('datasets', {}) or {}
+    return DatasetWatcher(
+        enabled=cfg.get('watch_enabled', True),
+        poll_interval=cfg.get('watch_poll_interval', 1.0),
+        force_polling=cfg.get('watch_force_polling', False),
+    )
@@ -1,16 +1,23 @@
-import pandas as pd
 import sys
 from pathlib import Path
 
+import pyarrow.csv as pcsv
+import pyarrow.parquet as pq
+
+# Uso: python convertidor.py dataset_100mb.csv [row_group_size]
 csv_file = sys.argv[1]
+row_group_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1_048_576
 parquet_file = Path(csv_file).with_suffix(".parquet")
 
-df = pd.read_csv(csv_file)
+# Lectura en streaming por bloques: memoria acotada aunque el CSV pese varios GB
+reader = pcsv.open_csv(csv_file, read_options=pcsv.ReadOptions(block_size=64 * 1024 * 1024))
 
-df.to_parquet(
+with pq.ParquetWriter(
     parquet_file,
-    engine="pyarrow",
+    reader.schema,
     compression="snappy"  # rápido y estándar
-)
+) as writer:
+    for batch in reader:
+        writer.write_batch(batch, row_group_size=row_group_size)
 
 print(f"✅ Convertido: {csv_file} → {parquet_file}")
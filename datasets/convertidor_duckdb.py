@@ -1,17 +1,20 @@
-import duckdb
+import sys
 
-parquet_files = [
-    "dataset_100mb.parquet",
-    "dataset_100mb.parquet",
-    "dataset_100mb.parquet",
-    "dataset_100mb.parquet",
-    "dataset_100mb.parquet",
-]
+import duckdb
 
-duckdb_file = "dataset_500mb.duckdb"
+# Uso: python convertidor_duckdb.py salida.duckdb entrada1.parquet [entrada2.parquet ...]
+# Sin argumentos: 5 copias de dataset_100mb.parquet en dataset_500mb.duckdb
+if len(sys.argv) > 2:
+    duckdb_file = sys.argv[1]
+    parquet_files = sys.argv[2:]
+else:
+    duckdb_file = "dataset_500mb.duckdb"
+    parquet_files = ["dataset_100mb.parquet"] * 5
 
 con = duckdb.connect(duckdb_file)
 
+# DuckDB lee los Parquet en paralelo y en streaming (sin pasar por pandas)
+con.execute("DROP TABLE IF EXISTS data")
 con.execute("""
     CREATE TABLE data AS
     SELECT * FROM read_parquet(?)
@@ -19,4 +22,4 @@ con.execute("""
 
 con.close()
 
-print("✅ 5 Parquet importados en un solo DuckDB")
+print(f"✅ {len(parquet_files)} Parquet importados en {duckdb_file}")
@@ -1,43 +1,311 @@
-import csv
-import random
-import sys
-from datetime import datetime, timedelta
+"""
+Generador vectorizado de datasets de prueba.
 
-TARGET_MB = int(sys.argv[1]) if len(sys.argv) > 1 else 10
-TARGET_BYTES = TARGET_MB * 1024 * 1024
+Genera por batches de Arrow (numpy + pyarrow, sin filas de Python) las columnas
+id, name, value, category y timestamp, y escribe cada batch a la vez en todos
+los formatos pedidos: csv, parquet, feather, json y duckdb (tabla 'data').
 
-filename = f"dataset_{TARGET_MB}mb.csv"
+El tamaño objetivo se mide sobre el primer formato pedido: se escribe un batch
+de muestra para estimar los bytes por fila y se generan las filas necesarias.
 
-header = ["id", "name", "value", "category", "timestamp"]
-categories = [f"C{n}" for n in range(500)]
+Uso:
+  python generate_dataset.py 10                        # dataset_10mb.csv (como antes)
+  python generate_dataset.py 1000 --formats csv parquet feather json duckdb
+  python generate_dataset.py --rows 50000000 --formats parquet --row-group-size 1048576
+  python generate_dataset.py 500 --formats parquet duckdb --sort timestamp --cardinality 50
+"""
+import argparse
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
-def random_timestamp():
-    start = datetime(2000, 1, 1)
-    delta = timedelta(seconds=random.randint(0, 20 * 365 * 24 * 3600))
-    return (start + delta).isoformat() + "Z"
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pcsv
+import pyarrow.parquet as pq
 
-row_id = 1
-current_size = 0
+FORMATS = ("csv", "parquet", "feather", "json", "duckdb")
+START = np.datetime64("2000-01-01T00:00:00", "s")
+SPAN_SECONDS = 20 * 365 * 24 * 3600
 
-with open(filename, "w", newline="", encoding="utf-8") as f:
-    writer = csv.writer(f)
-    writer.writerow(header)
+SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("name", pa.string()),
+    ("value", pa.float64()),
+    ("category", pa.dictionary(pa.int32(), pa.string())),
+    ("timestamp", pa.timestamp("s", tz="UTC")),
+])
 
-with open(filename, "a", newline="", encoding="utf-8") as f:
-    writer = csv.writer(f)
 
-    while current_size < TARGET_BYTES:
-        writer.writerow([
-            row_id,
-            f"Item-{row_id}-{random.randint(1, 1_000_000)}",
-            random.random() * random.randint(1, 10_000_000),
-            random.choice(categories),
-            random_timestamp()
-        ])
-        row_id += 1
+class BatchGenerator:
+    """Genera el batch [start, start + rows) de un dataset de total_rows filas"""
 
-        if row_id % 1000 == 0:
-            current_size = f.tell()
+    def __init__(self, total_rows: int, cardinality: int, sort: str, seed: int):
+        self.total_rows = max(total_rows, 1)
+        self.cardinality = cardinality
+        self.sort = sort
+        self.seed = seed
+        # Mismo diccionario en todos los batches (IPC file no admite reemplazarlo)
+        self.categories = pa.array([f"C{n}" for n in range(cardinality)], pa.string())
 
-print(f"✅ Archivo creado: {filename}")
-print(f"📦 Tamaño aproximado: {current_size / (1024 * 1024):.2f} MB")
+    def batch(self, start: int, rows: int) -> pa.RecordBatch:
+        # Una semilla por batch: el resultado no depende del orden ni de los hilos
+        rng = np.random.default_rng([self.seed, start])
+        ids = np.arange(start + 1, start + rows + 1, dtype=np.int64)
+        id_array = pa.array(ids)
+
+        suffix = pa.array(rng.integers(1, 1_000_001, size=rows, dtype=np.int64))
+        name = pc.binary_join_element_wise("Item", pc.cast(id_array, pa.string()),
+                                           pc.cast(suffix, pa.string()), "-")
+        value = rng.random(rows) * rng.integers(1, 10_000_001, size=rows)
+
+        position = ids - 1
+        if self.sort == "category":
+            codes = (position * self.cardinality // self.total_rows).astype(np.int32)
+        else:
+            codes = rng.integers(0, self.cardinality, size=rows, dtype=np.int32)
+        category = pa.DictionaryArray.from_arrays(pa.array(codes), self.categories)
+
+        if self.sort == "timestamp":
+            offsets = position * SPAN_SECONDS // self.total_rows
+        else:
+            offsets = rng.integers(0, SPAN_SECONDS, size=rows, dtype=np.int64)
+        timestamp = pa.array(START + offsets.astype("timedelta64[s]"), pa.timestamp("s", tz="UTC"))
+
+        return pa.RecordBatch.from_arrays([id_array, name, pa.array(value), category, timestamp], schema=SCHEMA)
+
+
+# =============================================================================
+# Escritores incrementales (uno por formato)
+# =============================================================================
+
+class CsvWriter:
+    def __init__(self, path: Path, row_group_size: int):
+        self.path = path
+        self.sink = pa.OSFile(str(path), "wb")
+        self.writer = pcsv.CSVWriter(self.sink, SCHEMA)
+
+    def write(self, batch: pa.RecordBatch):
+        self.writer.write_batch(batch)
+
+    def size(self) -> int:
+        return self.sink.tell()
+
+    def close(self):
+        self.writer.close()
+        self.sink.close()
+
+
+class ParquetWriter:
+    def __init__(self, path: Path, row_group_size: int):
+        self.path = path
+        self.sink = pa.OSFile(str(path), "wb")
+        self.writer = pq.ParquetWriter(self.sink, SCHEMA, compression="snappy")
+        self.row_group_size = row_group_size
+
+    def write(self, batch: pa.RecordBatch):
+        self.writer.write_batch(batch, row_group_size=self.row_group_size)
+
+    def size(self) -> int:
+        return self.sink.tell()
+
+    def close(self):
+        self.writer.close()
+        self.sink.close()
+
+
+class FeatherWriter:
+    """Feather v2 = Arrow IPC file (lz4 como el default de feather.write_feather)"""
+
+    def __init__(self, path: Path, row_group_size: int):
+        self.path = path
+        self.sink = pa.OSFile(str(path), "wb")
+        compression = "lz4" if pa.Codec.is_available("lz4") else None
+        self.writer = pa.ipc.new_file(self.sink, SCHEMA, options=pa.ipc.IpcWriteOptions(compression=compression))
+
+    def write(self, batch: pa.RecordBatch):
+        self.writer.write_batch(batch)
+
+    def size(self) -> int:
+        return self.sink.tell()
+
+    def close(self):
+        self.writer.close()
+        self.sink.close()
+
+
+def json_records(batch: pa.RecordBatch) -> bytes:
+    """
+    Registros JSON del batch, cada uno precedido por ',' (vectorizado con
+    pyarrow.compute; los valores generados no necesitan escape)
+    """
+    records = pc.binary_join_element_wise(
+        ',{"id":', pc.cast(batch.column("id"), pa.string()),
+        ',"name":"', batch.column("name"),
+        '","value":', pc.cast(batch.column("value"), pa.string()),
+        ',"category":"', batch.column("category").cast(pa.string()),
+        '","timestamp":"', pc.strftime(batch.column("timestamp"), format="%Y-%m-%dT%H:%M:%SZ"),
+        '"}', "")
+    if len(records) == 0:
+        return b""
+    _, offsets, data = records.buffers()
+    offsets = np.frombuffer(offsets, dtype=np.int32)[records.offset:records.offset + len(records) + 1]
+    return data.to_pybytes()[offsets[0]:offsets[-1]]
+
+
+class JsonWriter:
+    """Array JSON de registros (lo que DataLoader lee con pandas.read_json)"""
+
+    def __init__(self, path: Path, row_group_size: int):
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(b"[")
+        self.first = True
+
+    def write(self, batch: pa.RecordBatch):
+        data = json_records(batch)
+        if data:
+            # El primer registro no lleva la coma separadora
+            self.file.write(data[1:] if self.first else data)
+            self.first = False
+
+    def size(self) -> int:
+        return self.file.tell()
+
+    def close(self):
+        self.file.write(b"]")
+        self.file.close()
+
+
+class DuckDBWriter:
+    """Tabla 'data' (la que lee DataLoader); se inserta batch a batch desde Arrow"""
+
+    def __init__(self, path: Path, row_group_size: int):
+        import duckdb
+        self.path = path
+        path.unlink(missing_ok=True)
+        self.con = duckdb.connect(str(path))
+        self.created = False
+
+    def write(self, batch: pa.RecordBatch):
+        # Las categorías se guardan como VARCHAR
+        table = pa.Table.from_batches([batch]).cast(SCHEMA.set(3, pa.field("category", pa.string())))
+        self.con.register("batch", table)
+        if self.created:
+            self.con.execute("INSERT INTO data SELECT * FROM batch")
+        else:
+            self.con.execute("CREATE TABLE data AS SELECT * FROM batch")
+            self.created = True
+        self.con.unregister("batch")
+
+    def size(self) -> int:
+        return self.path.stat().st_size if self.path.exists() else 0
+
+    def close(self):
+        self.con.close()
+
+
+WRITERS = {"csv": CsvWriter, "parquet": ParquetWriter, "feather": FeatherWriter,
+           "json": JsonWriter, "duckdb": DuckDBWriter}
+
+
+def bytes_per_row(fmt: str, sample: pa.RecordBatch) -> float:
+    """Bytes por fila del formato, estimados escribiendo un batch de muestra"""
+    if fmt == "csv":
+        sink = io.BytesIO()
+        pcsv.write_csv(pa.Table.from_batches([sample]), sink)
+        size = sink.tell()
+    elif fmt == "parquet":
+        sink = pa.BufferOutputStream()
+        pq.write_table(pa.Table.from_batches([sample]), sink, compression="snappy")
+        size = sink.tell()
+    elif fmt == "feather":
+        sink = pa.BufferOutputStream()
+        compression = "lz4" if pa.Codec.is_available("lz4") else None
+        with pa.ipc.new_file(sink, SCHEMA, options=pa.ipc.IpcWriteOptions(compression=compression)) as writer:
+            writer.write_batch(sample)
+        size = sink.tell()
+    elif fmt == "json":
+        size = len(json_records(sample))
+    else:
+        # DuckDB comprime por columnas; el tamaño en Arrow es una cota superior razonable
+        size = sample.nbytes
+    return size / sample.num_rows
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Vectorized test dataset generator")
+    parser.add_argument("size_mb", nargs="?", type=float,
+                        help="Target size in MB of the first format (default 10 unless --rows)")
+    parser.add_argument("--rows", type=int, help="Exact number of rows (instead of a target size)")
+    parser.add_argument("--formats", nargs="+", default=["csv"], choices=FORMATS)
+    parser.add_argument("--name", help="Base file name (default dataset_<size>mb or dataset_<rows>rows)")
+    parser.add_argument("--output-dir", type=Path, default=Path(__file__).resolve().parent)
+    parser.add_argument("--row-group-size", type=int, default=1_048_576,
+                        help="Rows per generated batch / Parquet row group")
+    parser.add_argument("--cardinality", type=int, default=500, help="Distinct categories")
+    parser.add_argument("--sort", default="none", choices=["none", "timestamp", "category"],
+                        help="Column the dataset is sorted by (id is always ascending)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+    if args.rows is None and args.size_mb is None:
+        args.size_mb = 10
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    batch_rows = args.row_group_size
+
+    if args.rows is not None:
+        total_rows = args.rows
+        name = args.name or f"dataset_{total_rows}rows"
+    else:
+        sample = BatchGenerator(batch_rows, args.cardinality, args.sort, args.seed).batch(0, min(batch_rows, 100_000))
+        per_row = bytes_per_row(args.formats[0], sample)
+        total_rows = max(1, int(args.size_mb * 1024 * 1024 / per_row))
+        name = args.name or f"dataset_{args.size_mb:g}mb"
+
+    generator = BatchGenerator(total_rows, args.cardinality, args.sort, args.seed)
+    writers = [WRITERS[fmt](args.output_dir / f"{name}.{fmt}", args.row_group_size) for fmt in args.formats]
+    starts = range(0, total_rows, batch_rows)
+    print(f"⚙️  Generando {total_rows:,} filas en {', '.join(args.formats)} ({len(starts)} batches)")
+
+    started = time.perf_counter()
+    written = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.threads)) as pool:
+        # Generación adelantada (hasta 'threads' batches) mientras se escribe el anterior
+        pending = []
+        starts_iter = iter(starts)
+        for start in starts_iter:
+            pending.append(pool.submit(generator.batch, start, min(batch_rows, total_rows - start)))
+            if len(pending) >= max(1, args.threads):
+                break
+        while pending:
+            batch = pending.pop(0).result()
+            next_start = next(starts_iter, None)
+            if next_start is not None:
+                pending.append(pool.submit(generator.batch, next_start, min(batch_rows, total_rows - next_start)))
+            # Los escritores de pyarrow liberan el GIL: todos los formatos a la vez
+            list(pool.map(lambda w: w.write(batch), writers))
+            written += batch.num_rows
+            print(f"\r  {written:,}/{total_rows:,} filas", end="", flush=True)
+    for writer in writers:
+        writer.close()
+    elapsed = time.perf_counter() - started
+
+    print()
+    for writer in writers:
+        size = writer.path.stat().st_size
+        print(f"✅ Archivo creado: {writer.path.name}")
+        print(f"📦 Tamaño: {size / (1024 * 1024):.2f} MB")
+    print(f"⏱️  {elapsed:.1f}s ({total_rows / elapsed:,.0f} filas/s)")
+
+
+if __name__ == "__main__":
+    main()
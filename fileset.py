@@ -0,0 +1,144 @@
+"""
+Datasets de varios archivos: un directorio (con o sin particiones estilo Hive,
+p.ej. region=eu/year=2024/part-0.parquet) o un patrón glob dentro de datasets/.
+
+Se leen con pyarrow.dataset sin materializar la unión: cada partición del
+DoGet recibe un rango contiguo de fragmentos (archivos) y los escanea en
+streaming con el lector multihilo de Arrow. Las columnas de partición Hive se
+agregan a cada batch como diccionario.
+"""
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+# Extensión -> formato de pyarrow.dataset
+FILESET_FORMATS = {
+    '.parquet': 'parquet', '.pq': 'parquet',
+    '.feather': 'ipc', '.arrow': 'ipc',
+    '.csv': 'csv',
+    '.jsonl': 'json', '.ndjson': 'json', '.json': 'json',
+}
+
+# Particiones máximas por request (cada una escanea sus propios archivos)
+MAX_FILESET_PARTITIONS = 8
+
+GLOB_CHARS = set('*?[')
+
+
+def is_glob(name: str) -> bool:
+    return any(c in GLOB_CHARS for c in name)
+
+
+class FileSetDataset:
+    """Dataset formado por los archivos de un directorio o glob, escaneado por fragmentos"""
+
+    def __init__(self, name: str, files: list[Path], base_dir: Path | None):
+        import pyarrow.dataset as ds
+
+        self.name = name
+        self.files = files
+        self.base_dir = base_dir
+        self.format = FILESET_FORMATS[files[0].suffix.lower()]
+        # Huella de todos los archivos: cambia si se agrega, quita o modifica alguno
+        self.fingerprint = self.files_fingerprint(files)
+        partitioning = ds.HivePartitioning.discover(infer_dictionary=True) if base_dir else None
+        self.dataset = ds.dataset([str(f) for f in files], format=self.format, partitioning=partitioning,
+                                  partition_base_dir=str(base_dir) if base_dir else None)
+        self.fragments = list(self.dataset.get_fragments())
+        self.nbytes = sum(f.stat().st_size for f in files)
+        self._num_rows: int | None = None
+        self._high_watermarks: dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def files_fingerprint(files: list[Path]) -> str:
+        digest = hashlib.sha1()
+        for f in files:
+            stat = f.stat()
+            digest.update(f"{f}:{stat.st_size}:{stat.st_mtime_ns}\n".encode('utf-8'))
+        return digest.hexdigest()[:16]
+
+    @property
+    def schema(self) -> pa.Schema:
+        return self.dataset.schema
+
+    @property
+    def num_rows(self) -> int:
+        """Filas totales (Parquet/IPC: de los metadatos; CSV/JSON: requiere un escaneo, se cachea)"""
+        with self._lock:
+            if self._num_rows is None:
+                self._num_rows = self.dataset.count_rows()
+            return self._num_rows
+
+    def recommended_partitions(self) -> int:
+        """Una partición por archivo, hasta MAX_FILESET_PARTITIONS"""
+        return max(1, min(len(self.fragments), MAX_FILESET_PARTITIONS))
+
+    def partition_fragments(self, partition: int, total_partitions: int) -> list:
+        """Rango contiguo de fragmentos de la partición (cada archivo en una sola partición)"""
+        if total_partitions <= 1:
+            return self.fragments
+        count = len(self.fragments)
+        start = (count * partition) // total_partitions
+        end = (count * (partition + 1)) // total_partitions
+        return self.fragments[start:end]
+
+    def iter_batches(self, partition: int = 0, total_partitions: int = 1,
+                     max_chunksize: int = 65536, filter=None):
+        """Genera los batches de los archivos de la partición, leyendo de a uno"""
+        import pyarrow.dataset as ds
+
+        for fragment in self.partition_fragments(partition, total_partitions):
+            scanner = ds.Scanner.from_fragment(fragment, schema=self.schema, filter=filter,
+                                               batch_size=max_chunksize, use_threads=True)
+            for batch in scanner.to_batches():
+                if batch.num_rows:
+                    yield batch
+
+    def high_watermark(self, column: str):
+        """Máximo de una columna en todos los archivos (sólo lee esa columna)"""
+        import pyarrow.compute as pc
+
+        with self._lock:
+            if column not in self._high_watermarks:
+                if column not in self.schema.names:
+                    raise ValueError(f"Unknown watermark column '{column}'")
+                values = self.dataset.to_table(columns=[column]).column(column)
+                self._high_watermarks[column] = pc.max(values).as_py() if len(values) else None
+            value = self._high_watermarks[column]
+        return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def find_fileset_files(datasets_dir: Path, name: str) -> tuple[list[Path], Path | None] | None:
+    """
+    Resuelve 'name' como directorio (recursivo, particiones Hive) o glob dentro
+    de datasets_dir. Retorna (archivos, directorio base) o None si no aplica.
+    Sólo se toman los archivos del formato más común (ignora _SUCCESS, .crc...).
+    Nombres absolutos o que salen de datasets_dir ('..', enlaces) no se resuelven.
+    """
+    root = datasets_dir.resolve()
+    if Path(name).is_absolute() or '..' in Path(name).parts:
+        return None
+    if is_glob(name):
+        candidates = [p for p in datasets_dir.glob(name) if p.is_file()]
+        base_dir = None
+    else:
+        directory = datasets_dir / name
+        if not directory.is_dir() or not directory.resolve().is_relative_to(root):
+            return None
+        candidates = [p for p in directory.rglob('*') if p.is_file() and not p.name.startswith(('.', '_'))]
+        base_dir = directory
+    candidates = [p for p in candidates if p.resolve().is_relative_to(root)]
+    by_format: dict[str, list[Path]] = {}
+    for path in candidates:
+        if path.suffix.lower() in FILESET_FORMATS:
+            by_format.setdefault(FILESET_FORMATS[path.suffix.lower()], []).append(path)
+    if not by_format:
+        return None
+    files = max(by_format.values(), key=len)
+    return sorted(files), base_dir
@@ -0,0 +1,216 @@
+"""
+Servidor Arrow Flight nativo sobre DataLoader.
+
+Para consumidores on-premise que alcanzan al conector directamente: expone los
+datasets con el protocolo Flight estándar (cualquier cliente pyarrow.flight,
+ADBC, etc.) sin pasar por el túnel inverso del Gateway.
+
+Uso:
+  python flight_server.py --port 50051
+  python flight_server.py --host 0.0.0.0 --port 50051
+
+Descriptores aceptados por get_flight_info:
+  - path:    ["<dataset>"]  (o ["sales"] para datos sintéticos)
+  - command: JSON {"dataset": "<dataset>", "rows": 1000000}
+
+Cada partición es un endpoint con su propio ticket JSON
+{"dataset", "rows", "partition", "total_partitions"}, así los clientes
+pueden descargar las particiones en paralelo.
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import weakref
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.flight as flight
+import yaml
+
+from data_loader import DataLoader, configure_loader, data_loader
+
+logger = logging.getLogger("FlightServer")
+
+# Cargar configuración
+# CONNECTOR_CONFIG permite usar otro archivo (p. ej. el que genera bench/)
+CONFIG_PATH = Path(os.environ.get("CONNECTOR_CONFIG") or Path(__file__).parent / "config.yml")
+
+def load_config():
+    """Carga configuración desde YAML"""
+    if CONFIG_PATH.exists():
+        with open(CONFIG_PATH, 'r') as f:
+            return yaml.safe_load(f)
+    return {}
+
+config = load_config()
+
+PARALLEL_PARTITIONS = config.get('performance', {}).get('parallel_partitions', True)
+MAX_CHUNK_SIZE = config.get('performance', {}).get('max_chunk_size', 65536)
+
+# Nombre reservado para el dataset sintético (igual que en los conectores)
+SYNTHETIC_DATASET = "sales"
+
+# Filas máximas del dataset sintético que puede pedir un cliente
+MAX_SYNTHETIC_ROWS = 50_000_000
+
+
+class DataLoaderFlightServer(flight.FlightServerBase):
+    """Servidor Flight que sirve los datasets de DataLoader particionados"""
+
+    def __init__(self, location: str, loader: DataLoader = None, **kwargs):
+        super().__init__(location, **kwargs)
+        # Caché compartida y acotada (cache_max_bytes) como en los conectores;
+        # cada request usa una vista con su propio dataset activo
+        self.loader = loader or data_loader
+        # Un lock de carga por dataset mientras alguien lo usa (se liberan solos)
+        self._load_locks: weakref.WeakValueDictionary[str, threading.Lock] = weakref.WeakValueDictionary()
+        self._load_locks_lock = threading.Lock()
+
+    # =========================================================================
+    # Resolución de datasets
+    # =========================================================================
+
+    @staticmethod
+    def _parse_rows(rows) -> int | None:
+        """Valida las filas pedidas para el dataset sintético"""
+        if rows is None:
+            return None
+        try:
+            rows = int(rows)
+        except (TypeError, ValueError):
+            raise flight.FlightServerError(f"Invalid rows: {rows!r}")
+        if not 0 < rows <= MAX_SYNTHETIC_ROWS:
+            raise flight.FlightServerError(f"rows must be between 1 and {MAX_SYNTHETIC_ROWS:,}")
+        return rows
+
+    def _get_loader(self, dataset: str, rows: int | None = None) -> DataLoader:
+        """
+        Vista de la caché con el dataset activo. La caché verifica la huella
+        de los archivos en cada request: se ven los cambios, filas agregadas
+        y archivos nuevos de un directorio o glob.
+        """
+        synthetic = dataset == SYNTHETIC_DATASET
+        key = DataLoader.dataset_key(None if synthetic else dataset, rows)
+        with self._load_locks_lock:
+            load_lock = self._load_locks.get(key)
+            if load_lock is None:
+                load_lock = self._load_locks[key] = threading.Lock()
+
+        # Un request por dataset carga; el resto espera y lo toma de la caché
+        loader = self.loader.view()
+        with load_lock:
+            if synthetic:
+                loader.load_or_generate_dataset(rows=rows or 1_000_000)
+            elif not loader.load_from_file(dataset):
+                raise flight.FlightServerError(f"Dataset '{dataset}' not found")
+        return loader
+
+    @staticmethod
+    def _parse_descriptor(descriptor: flight.FlightDescriptor) -> tuple[str, int | None]:
+        """Extrae (dataset, rows) de un descriptor path o command"""
+        if descriptor.descriptor_type == flight.DescriptorType.PATH:
+            if not descriptor.path:
+                raise flight.FlightServerError("Empty descriptor path")
+            dataset = descriptor.path[0]
+            if isinstance(dataset, bytes):
+                dataset = dataset.decode('utf-8')
+            return dataset, None
+
+        try:
+            command = json.loads(descriptor.command.decode('utf-8'))
+        except (ValueError, UnicodeDecodeError):
+            raise flight.FlightServerError("Command descriptor must be JSON")
+        return command.get("dataset", SYNTHETIC_DATASET), DataLoaderFlightServer._parse_rows(command.get("rows"))
+
+    def _make_flight_info(self, dataset: str, rows: int | None,
+                          descriptor: flight.FlightDescriptor) -> flight.FlightInfo:
+        """Construye el FlightInfo con un endpoint por partición"""
+        loader = self._get_loader(dataset, rows)
+        partitions = loader.recommended_partitions() if PARALLEL_PARTITIONS else 1
+
+        endpoints = []
+        for partition in range(partitions):
+            ticket = json.dumps({
+                "dataset": dataset,
+                "rows": rows,
+                "partition": partition,
+                "total_partitions": partitions
+            }).encode('utf-8')
+            # Sin locations: el cliente reutiliza la conexión a este mismo servidor
+            endpoints.append(flight.FlightEndpoint(ticket, []))
+
+        logger.info(f"FlightInfo: {dataset}, {loader.total_records:,} rows, "
+                    f"{loader.total_bytes/1024/1024:.2f} MB, {partitions} partitions")
+        return flight.FlightInfo(loader.get_schema(), descriptor, endpoints,
+                                 loader.total_records, loader.total_bytes)
+
+    # =========================================================================
+    # RPCs Flight
+    # =========================================================================
+
+    def list_flights(self, context, criteria):
+        """
+        Lista los datasets disponibles. Los ya cargados incluyen esquema y
+        tamaños; el resto se anuncia sin cargar (total_records = -1) y se
+        resuelve al pedir su FlightInfo.
+        """
+        names = self.loader.list_available_datasets()
+        for name in sorted(set(names)):
+            descriptor = flight.FlightDescriptor.for_path(name)
+            if self.loader.is_cached(name):
+                yield self._make_flight_info(name, None, descriptor)
+            else:
+                yield flight.FlightInfo(pa.schema([]), descriptor, [], -1, -1)
+
+    def get_flight_info(self, context, descriptor):
+        dataset, rows = self._parse_descriptor(descriptor)
+        return self._make_flight_info(dataset, rows, descriptor)
+
+    def get_schema(self, context, descriptor):
+        dataset, rows = self._parse_descriptor(descriptor)
+        return flight.SchemaResult(self._get_loader(dataset, rows).get_schema())
+
+    def do_get(self, context, ticket):
+        """Stream de la partición pedida directo desde la tabla en memoria (sin copias)"""
+        try:
+            ticket_data = json.loads(ticket.ticket.decode('utf-8'))
+        except (ValueError, UnicodeDecodeError):
+            # Ticket plano: nombre del dataset completo
+            ticket_data = {"dataset": ticket.ticket.decode('utf-8', errors='replace')}
+
+        dataset = ticket_data.get("dataset", SYNTHETIC_DATASET)
+        rows = ticket_data.get("rows")
+        partition = ticket_data.get("partition", 0)
+        total_partitions = ticket_data.get("total_partitions", 1)
+        # Sync incremental: {'column', 'value'} = sólo filas con column > value
+        watermark = ticket_data.get("watermark")
+
+        loader = self._get_loader(dataset, self._parse_rows(rows))
+        # Lista de slices, o generador que lee los archivos de un dataset de varios archivos
+        batches = loader.get_partition_batches(partition, total_partitions, MAX_CHUNK_SIZE, watermark=watermark)
+        reader = pa.RecordBatchReader.from_batches(loader.get_schema(), batches)
+
+        logger.info(f"DoGet: {dataset} partition {partition}/{total_partitions}")
+        return flight.RecordBatchStream(reader)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arrow Flight server for Data Connector datasets")
+    parser.add_argument("--host", default="localhost", help="Interface to bind (default: localhost)")
+    parser.add_argument("--port", type=int, default=50051, help="Port to listen on (default: 50051)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    # Límite de la caché, semilla del sintético y lectura de archivos de config.yml
+    configure_loader(config)
+    location = f"grpc://{args.host}:{args.port}"
+    server = DataLoaderFlightServer(location)
+    logger.info(f"Arrow Flight server listening on {location}")
+    server.serve()
+
+
+if __name__ == "__main__":
+    main()
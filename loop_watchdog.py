@@ -0,0 +1,152 @@
+"""
+Event-loop stall detector for the Data Connector.
+
+A coroutine on the loop records a heartbeat every `interval` seconds, and a
+watchdog thread checks that heartbeat. If the loop misses it by more than
+`threshold`, a callback is blocking the loop. The thread then captures the
+loop thread's current stack, which is the code doing the blocking. When the
+loop recovers, the full stall duration is recorded with that stack in a
+bounded ring buffer and logged.
+
+Usage:
+    from loop_watchdog import LoopWatchdog
+
+    watchdog = LoopWatchdog(threshold=0.1)
+    watchdog.start()          # inside the running event loop
+    ...
+    watchdog.recent_stalls()  # [{"timestamp", "duration_ms", "stack"}, ...]
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+logger = logging.getLogger("LoopWatchdog")
+
+
+class LoopWatchdog:
+    """Measures event-loop lag continuously and captures stacks of long stalls."""
+
+    def __init__(self, interval: float = 0.05, threshold: float = 0.1,
+                 max_records: int = 50, capture_stacks: bool = True):
+        """
+        Args:
+            interval: Seconds between loop heartbeats
+            threshold: Lag (seconds) above which a stall is recorded
+            max_records: Size of the stall ring buffer
+            capture_stacks: If False, only lag is measured (no watchdog thread)
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.capture_stacks = capture_stacks
+
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.stalls_total = 0
+        self.records: deque[dict] = deque(maxlen=max_records)
+
+        self._last_beat = time.perf_counter()
+        self._loop_thread_id: int | None = None
+        self._pending: dict | None = None  # Stall in progress, set by the watchdog thread
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._task: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        """Start monitoring the running event loop (call from inside the loop)."""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._beat())
+        if self.capture_stacks:
+            self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._thread.start()
+        logger.info(f"Loop watchdog started (threshold: {self.threshold * 1000:.0f} ms)")
+
+    def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    @staticmethod
+    def location(record: dict) -> str:
+        """Innermost frame of a stall record ("file", line N, in func)."""
+        if not record["stack"]:
+            return "unknown"
+        return record["stack"][-1].strip().splitlines()[0]
+
+    def recent_stalls(self, since: float = 0.0) -> list[dict]:
+        """Stall records (newest last), optionally only those after `since` (epoch seconds)."""
+        with self._lock:
+            return [r for r in self.records if r["timestamp"] > since]
+
+    # =========================================================================
+    # Loop side
+    # =========================================================================
+
+    async def _beat(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            lag = max(0.0, now - expected)
+            self._last_beat = now
+            self.last_lag = lag
+            if lag > self.max_lag:
+                self.max_lag = lag
+            if lag > self.threshold:
+                self._finish_stall(lag)
+
+    def _finish_stall(self, lag: float):
+        """Record a stall once the loop is responsive again."""
+        with self._lock:
+            pending, self._pending = self._pending, None
+            stack = pending["stack"] if pending else []
+            record = {
+                "timestamp": time.time(),
+                "duration_ms": round(lag * 1000, 1),
+                "stack": stack,
+            }
+            self.records.append(record)
+            self.stalls_total += 1
+
+        logger.warning(f"Event loop blocked for {lag * 1000:.0f} ms at {self.location(record)}")
+        if stack:
+            logger.debug("Blocking stack:\n" + "".join(stack))
+
+    # =========================================================================
+    # Watchdog thread
+    # =========================================================================
+
+    def _watch(self):
+        poll = min(self.interval, self.threshold) / 2
+        while not self._stop.wait(poll):
+            overdue = time.perf_counter() - self._last_beat - self.interval
+            if overdue <= self.threshold:
+                continue
+            with self._lock:
+                if self._pending is not None:
+                    continue  # Already captured this stall
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is None:
+                    continue
+                self._pending = {"stack": traceback.format_stack(frame)}
+                del frame
+
+
+def watchdog_from_config(config: dict) -> LoopWatchdog:
+    """Create the watchdog from the 'metrics.loop_watchdog' section of config.yml."""
+    cfg = config.get('metrics', {}).get('loop_watchdog', {}) or {}
+    return LoopWatchdog(
+        interval=cfg.get('interval_ms', 50) / 1000,
+        threshold=cfg.get('threshold_ms', 100) / 1000,
+        max_records=cfg.get('max_records', 50),
+        capture_stacks=cfg.get('enabled', True),
+    )
@@ -4,34 +4,247 @@ Metrics Reporter for Data Connector.
 Sends metrics to luzzi-core-im via HTTP POST on a separate observability plane,
 keeping the gRPC data plane clean for Arrow IPC streaming.
 
+One keep-alive HTTP session is reused across reports. Snapshots that cannot be
+delivered are spooled to a bounded directory on disk, and sent in batches once
+the API is reachable again, so outages leave no gaps. With delta encoding, a
+report only carries the gauges that changed since the last delivered snapshot
+and the per-interval summaries (always, when non-empty), plus a full snapshot
+every few reports.
+
 Usage:
     from metrics_reporter import MetricsReporter
     
     reporter = MetricsReporter(api_url="https://api.luzzi.com", tenant_id="...")
     asyncio.create_task(reporter.start(interval=30))
     
-    # During data streaming
-    reporter.record_bytes_sent(len(chunk))
-    reporter.record_records_sent(batch.num_rows)
+    # During data streaming (once per batch)
+    reporter.record_batch_sent(rows=batch.num_rows, arrow_bytes=len(ipc), wire_bytes=len(chunk),
+                               dataset="sales", transport="grpc")
     reporter.record_query_processed()
+    reporter.record_stage("encode", 12.5, dataset="sales", transport="grpc")
 """
 import aiohttp
 import asyncio
+import json
+import math
+import os
 import time
 import logging
 import platform
 import sys
 import socket
+from collections import deque
 from pathlib import Path
 from datetime import datetime, timedelta
 
 logger = logging.getLogger("MetricsReporter")
 
+# Request stages tracked with latency histograms
+STAGES = ("queue_wait", "dataset_load", "encode", "compress", "first_byte", "total_transfer")
+
+# Sliding windows (seconds) for throughput rates
+THROUGHPUT_WINDOWS = (10, 60, 300)
+
+# Fields sent with every report, even when delta encoding leaves them unchanged
+ALWAYS_SENT = ("agent_type", "timestamp", "snapshot", "uptime_seconds", "connected")
+
+# Distinct dataset labels kept in the per-dataset metrics; later ones go to "other"
+MAX_DATASET_LABELS = 50
+
+# SQL query results (query:<hash>) are all reported under one "query" label
+QUERY_DATASET_PREFIX = "query:"
+
+# Fields that describe only the last interval: never delta-compared, sent whenever non-empty
+PER_INTERVAL = ("stage_latencies", "loop_stalls")
+
+
+class MetricsSpool:
+    """
+    Bounded on-disk buffer of snapshots that could not be delivered.
+    
+    Snapshots are appended as JSON lines to segment files of up to batch_size
+    lines; each segment is later sent as one batch. When the directory grows
+    past max_bytes, the oldest segments are dropped.
+    """
+    
+    def __init__(self, directory: Path, max_bytes: int = 10 * 1024 * 1024, batch_size: int = 50):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._current: Path | None = None
+        self._current_lines = 0
+    
+    def _segments(self) -> list[Path]:
+        # Names start with a nanosecond timestamp, so lexical order is age order
+        return sorted(self.directory.glob("*.jsonl"))
+    
+    def __len__(self) -> int:
+        return len(self._segments())
+    
+    def append(self, snapshot: dict):
+        """Spool one snapshot."""
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            if self._current is None or self._current_lines >= self.batch_size or not self._current.exists():
+                # pid in the name: supervisor workers can share the directory
+                self._current = self.directory / f"{time.time_ns()}-{os.getpid()}.jsonl"
+                self._current_lines = 0
+            with open(self._current, "a", encoding="utf-8") as f:
+                f.write(json.dumps(snapshot, separators=(",", ":")) + "\n")
+            self._current_lines += 1
+            self._enforce_limit()
+        except OSError as e:
+            self.dropped += 1
+            logger.debug(f"Could not spool metrics snapshot: {e}")
+    
+    def _enforce_limit(self):
+        segments = self._segments()
+        total = sum(p.stat().st_size for p in segments)
+        while segments and total > self.max_bytes:
+            oldest = segments.pop(0)
+            total -= oldest.stat().st_size
+            self.dropped += sum(1 for _ in open(oldest, encoding="utf-8"))
+            oldest.unlink()
+            if oldest == self._current:
+                self._current = None
+    
+    def claim_oldest(self) -> tuple[Path, list[dict]] | None:
+        """
+        Take the oldest segment for sending. It is renamed first, so another
+        process flushing the same directory cannot send it twice.
+        """
+        for segment in self._segments():
+            if segment == self._current:
+                self._current = None
+            claimed = segment.with_suffix(".sending")
+            try:
+                os.replace(segment, claimed)
+            except OSError:
+                continue  # Claimed by another process
+            with open(claimed, encoding="utf-8") as f:
+                snapshots = [json.loads(line) for line in f if line.strip()]
+            return claimed, snapshots
+        return None
+    
+    def release(self, claimed: Path, undelivered: list[dict]):
+        """
+        Delete a fully delivered segment, or put back the snapshots that were
+        not delivered (in the same segment, so they keep their place in line).
+        """
+        if not undelivered:
+            claimed.unlink(missing_ok=True)
+            return
+        with open(claimed, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(s, separators=(",", ":")) + "\n" for s in undelivered)
+        os.replace(claimed, claimed.with_suffix(".jsonl"))
+
+
+class ThroughputWindow:
+    """
+    Rows and bytes sent, kept in one-second buckets covering the longest
+    window. Rates over any shorter window are sums of the newest buckets.
+    """
+    
+    def __init__(self, span: int = max(THROUGHPUT_WINDOWS)):
+        self.span = span
+        self.start = time.monotonic()
+        self._buckets: deque[list] = deque()  # [second, rows, arrow_bytes, wire_bytes]
+    
+    def add(self, rows: int, arrow_bytes: int, wire_bytes: int):
+        second = int(time.monotonic())
+        if self._buckets and self._buckets[-1][0] == second:
+            bucket = self._buckets[-1]
+            bucket[1] += rows
+            bucket[2] += arrow_bytes
+            bucket[3] += wire_bytes
+        else:
+            self._buckets.append([second, rows, arrow_bytes, wire_bytes])
+            while self._buckets[0][0] <= second - self.span:
+                self._buckets.popleft()
+    
+    def rates(self, window: int) -> dict:
+        """Rows/s and bytes/s over the last `window` seconds (or since start if shorter)."""
+        now = time.monotonic()
+        cutoff = int(now) - window
+        rows = arrow_bytes = wire_bytes = 0
+        for second, r, a, w in reversed(self._buckets):
+            if second <= cutoff:
+                break
+            rows += r
+            arrow_bytes += a
+            wire_bytes += w
+        elapsed = max(1.0, min(window, now - self.start))
+        return {
+            "rows_per_sec": rows / elapsed,
+            "arrow_bytes_per_sec": arrow_bytes / elapsed,
+            "wire_bytes_per_sec": wire_bytes / elapsed,
+        }
+
+
+class LatencyHistogram:
+    """
+    Fixed-memory streaming histogram with log-spaced buckets.
+    
+    Bucket boundaries grow by GROWTH and quantiles report the geometric
+    midpoint of their bucket, so the relative error is at most ~2.5%
+    (sqrt(GROWTH) - 1) regardless of how many samples are recorded.
+    Covers MIN_MS up to roughly one hour; larger values land in the last bucket.
+    """
+    
+    MIN_MS = 0.01
+    GROWTH = 1.05
+    BUCKETS = 420  # 0.01 ms * 1.05**420 ≈ 8e6 ms
+    
+    def __init__(self):
+        self._counts = [0] * self.BUCKETS
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+    
+    def record(self, value_ms: float):
+        """Add one sample (milliseconds)."""
+        if value_ms <= self.MIN_MS:
+            index = 0
+        else:
+            index = min(int(math.log(value_ms / self.MIN_MS, self.GROWTH)) + 1, self.BUCKETS - 1)
+        self._counts[index] += 1
+        self.count += 1
+        self.sum += value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+    
+    def quantile(self, q: float) -> float | None:
+        """Approximate value at quantile q (0..1), geometric midpoint of its bucket."""
+        if not self.count:
+            return None
+        target = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index, bucket_count in enumerate(self._counts):
+            seen += bucket_count
+            if seen >= target:
+                # Bucket 0 holds everything up to MIN_MS; bucket i is (MIN_MS*G^(i-1), MIN_MS*G^i]
+                midpoint = self.MIN_MS * self.GROWTH ** (index - 0.5) if index else self.MIN_MS
+                return min(midpoint, self.max)
+        return self.max
+    
+    def summary(self) -> dict:
+        """p50/p90/p99/max snapshot, rounded to microseconds."""
+        return {
+            "count": self.count,
+            "p50_ms": round(self.quantile(0.50), 3),
+            "p90_ms": round(self.quantile(0.90), 3),
+            "p99_ms": round(self.quantile(0.99), 3),
+            "max_ms": round(self.max, 3),
+        }
+
 
 class MetricsReporter:
     """Async metrics reporter that sends data to the observability plane."""
     
-    def __init__(self, api_url: str, tenant_id: str, version: str = "1.0.0", host_header: str = None):
+    def __init__(self, api_url: str, tenant_id: str, version: str = "1.0.0", host_header: str = None,
+                 spool_dir: str | Path = None, spool_max_bytes: int = 10 * 1024 * 1024,
+                 batch_size: int = 50, delta_encoding: bool = False, full_snapshot_every: int = 10):
         """
         Initialize the metrics reporter.
         
@@ -40,21 +253,52 @@ class MetricsReporter:
             tenant_id: Unique identifier for this tenant/connector
             version: Connector version for reporting
             host_header: Optional Host header for reverse proxy routing (e.g., "api.localhost")
+            spool_dir: Directory for undelivered snapshots (None = drop them)
+            spool_max_bytes: Disk budget for the spool; oldest snapshots are dropped beyond it
+            batch_size: Spooled snapshots sent per request when flushing
+            delta_encoding: Only send fields that changed since the last delivered snapshot
+            full_snapshot_every: With delta encoding, send a full snapshot every N reports
         """
         self.api_url = f"{api_url}/api/metrics/agent/{tenant_id}"
+        self.batch_url = f"{self.api_url}/batch"
         self.tenant_id = tenant_id
         self.version = version
         self.host_header = host_header
         self.start_time = time.time()
         
         # Counters (monotonically increasing)
-        self.bytes_sent = 0
+        self.bytes_sent = 0        # Wire bytes (after transfer compression and framing)
+        self.arrow_bytes_sent = 0  # Uncompressed Arrow IPC bytes
         self.records_sent = 0
         self.queries_processed = 0
         self.errors = 0
         
+        # Transport backpressure (WebSocket send scheduler)
+        self.send_blocked_seconds = 0.0
+        self.send_blocked_count = 0
+        self.write_buffer_peak_bytes = 0
+        self._write_buffers: dict[str, int] = {}  # connection -> pending bytes
+        
+        # Per-batch accounting: sliding-window rates and per-dataset totals
+        self.throughput = ThroughputWindow()
+        # dataset label (see _dataset_label) -> rows/arrow_bytes/wire_bytes/batches
+        self.dataset_totals: dict[str, dict[str, int]] = {}
+        
+        # Bandwidth pacer (optional, attached by the connector)
+        self.pacer = None
+        
+        # Event-loop watchdog (optional, attached by the connector)
+        self.watchdog = None
+        self._last_stall_report = 0.0
+        
         # Query timing
         self._query_durations: list[float] = []  # Last N query durations in ms
+        # Per-stage latency histograms for the current interval: (stage, dataset, transport) -> histogram
+        self._stage_histograms: dict[tuple[str, str, str], LatencyHistogram] = {}
+        # Same histograms since startup (never reset), for the local scrape endpoint
+        self.stage_totals: dict[tuple[str, str, str], LatencyHistogram] = {}
+        # Dataset labels seen so far (bounded by MAX_DATASET_LABELS)
+        self._dataset_labels: set[str] = set()
         self._last_query_timestamp: float | None = None
         
         # State
@@ -62,6 +306,16 @@ class MetricsReporter:
         self._running = False
         self._last_send_success = True
         
+        # Delivery: one keep-alive session, offline spool, delta encoding
+        self._session: aiohttp.ClientSession | None = None
+        self._keepalive = 60  # Seconds an idle connection is kept (raised to cover the interval)
+        self.spool = MetricsSpool(Path(spool_dir), spool_max_bytes, batch_size) if spool_dir else None
+        self._batch_supported = True  # Cleared if the API has no batch endpoint
+        self.delta_encoding = delta_encoding
+        self.full_snapshot_every = max(1, full_snapshot_every)
+        self._last_delivered: dict | None = None  # Base for delta encoding
+        self._reports_since_full = 0
+        
         # System info (collected once at startup)
         self._hostname = socket.gethostname()
         self._os_info = f"{platform.system()} {platform.release()}"
@@ -109,6 +363,33 @@ class MetricsReporter:
         """Record number of records/rows sent."""
         self.records_sent += count
     
+    def record_batch_sent(self, rows: int, arrow_bytes: int, wire_bytes: int,
+                          dataset: str = None, transport: str = None):
+        """
+        Record one batch handed to the transport.
+        
+        Args:
+            rows: Rows in the batch
+            arrow_bytes: Uncompressed Arrow IPC size
+            wire_bytes: Bytes actually sent (compressed, including framing)
+            dataset: Dataset the batch belongs to (query results are aggregated under "query")
+            transport: "grpc" or "websocket" (kept for symmetry with record_stage)
+        """
+        self.records_sent += rows
+        self.arrow_bytes_sent += arrow_bytes
+        self.bytes_sent += wire_bytes
+        self.throughput.add(rows, arrow_bytes, wire_bytes)
+        
+        label = self._dataset_label(dataset)
+        totals = self.dataset_totals.get(label)
+        if totals is None:
+            totals = self.dataset_totals[label] = {
+                "rows": 0, "arrow_bytes": 0, "wire_bytes": 0, "batches": 0}
+        totals["rows"] += rows
+        totals["arrow_bytes"] += arrow_bytes
+        totals["wire_bytes"] += wire_bytes
+        totals["batches"] += 1
+    
     def record_query_processed(self, duration_ms: float = None):
         """Record that a query was processed."""
         self.queries_processed += 1
@@ -119,10 +400,102 @@ class MetricsReporter:
             if len(self._query_durations) > 100:
                 self._query_durations = self._query_durations[-100:]
     
+    def record_send_blocked(self, seconds: float):
+        """Record time a send spent waiting for the socket buffer to drain."""
+        # websockets returns immediately below the high watermark; anything
+        # above a millisecond means the send actually waited for a drain
+        if seconds > 0.001:
+            self.send_blocked_seconds += seconds
+            self.send_blocked_count += 1
+    
+    def set_write_buffer(self, connection: str, size: int):
+        """Update the pending write-buffer occupancy of one connection."""
+        self._write_buffers[connection] = size
+        self.write_buffer_peak_bytes = max(self.write_buffer_peak_bytes, size)
+    
+    def record_stage(self, stage: str, duration_ms: float, dataset: str = None, transport: str = None):
+        """
+        Record the latency of one request stage.
+        
+        Args:
+            stage: One of STAGES (queue_wait, dataset_load, encode, compress,
+                   first_byte, total_transfer)
+            duration_ms: Stage duration in milliseconds
+            dataset: Dataset name the request targeted
+            transport: "grpc" or "websocket"
+        """
+        key = (stage, self._dataset_label(dataset), transport or "unknown")
+        for histograms in (self._stage_histograms, self.stage_totals):
+            histogram = histograms.get(key)
+            if histogram is None:
+                histogram = histograms[key] = LatencyHistogram()
+            histogram.record(duration_ms)
+    
+    def _dataset_label(self, dataset: str | None) -> str:
+        """
+        Label under which a dataset is accounted. Query results share one
+        label and only the first MAX_DATASET_LABELS names get their own, so
+        histograms and label cardinality stay bounded however many datasets,
+        globs or queries are requested.
+        """
+        if not dataset:
+            return "unknown"
+        if dataset.startswith(QUERY_DATASET_PREFIX):
+            return "query"
+        if dataset not in self._dataset_labels:
+            if len(self._dataset_labels) >= MAX_DATASET_LABELS:
+                return "other"
+            self._dataset_labels.add(dataset)
+        return dataset
+    
+    def _collect_stage_latencies(self) -> list[dict]:
+        """Summarize and reset the per-stage histograms of the last interval."""
+        histograms, self._stage_histograms = self._stage_histograms, {}
+        return [
+            {"stage": stage, "dataset": dataset, "transport": transport, **histogram.summary()}
+            for (stage, dataset, transport), histogram in sorted(histograms.items())
+        ]
+    
     def record_error(self):
         """Record an error occurrence."""
         self.errors += 1
     
+    @property
+    def compression_ratio(self) -> float | None:
+        """Arrow bytes per wire byte since startup (None before the first batch)."""
+        if not self.bytes_sent:
+            return None
+        return round(self.arrow_bytes_sent / self.bytes_sent, 3)
+    
+    def _collect_throughput(self) -> dict:
+        """MB/s and rows/s for each sliding window."""
+        summary = {}
+        for window in THROUGHPUT_WINDOWS:
+            rates = self.throughput.rates(window)
+            summary[f"{window}s"] = {
+                "rows_per_sec": round(rates["rows_per_sec"], 1),
+                "arrow_mb_per_sec": round(rates["arrow_bytes_per_sec"] / 1024 / 1024, 3),
+                "wire_mb_per_sec": round(rates["wire_bytes_per_sec"] / 1024 / 1024, 3),
+            }
+        return summary
+    
+    def _collect_dataset_totals(self) -> list[dict]:
+        """Cumulative per-dataset accounting."""
+        return [
+            {"dataset": dataset, **totals,
+             "compression_ratio": round(totals["arrow_bytes"] / totals["wire_bytes"], 3) if totals["wire_bytes"] else None}
+            for dataset, totals in sorted(self.dataset_totals.items())
+        ]
+    
+    @property
+    def write_buffer_bytes(self) -> int:
+        """Pending write-buffer bytes across all connections."""
+        return sum(self._write_buffers.values())
+    
+    @property
+    def uptime_seconds(self) -> int:
+        return int(time.time() - self.start_time)
+    
     def set_connected(self, status: bool):
         """Update connection status."""
         self.connected = status
@@ -139,20 +512,45 @@ class MetricsReporter:
             interval: Seconds between metric reports (default: 30)
         """
         self._running = True
+        self._keepalive = max(60, interval * 3)  # Keep the connection across report intervals
         logger.info(f"Starting metrics reporter (interval: {interval}s)")
         
-        while self._running:
-            await self._send_metrics()
-            await asyncio.sleep(interval)
+        try:
+            while self._running:
+                await self._send_metrics()
+                await asyncio.sleep(interval)
+        finally:
+            await self.close()
+    
+    async def close(self):
+        """Close the HTTP session."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Persistent session: reports reuse one TCP/TLS connection."""
+        if self._session is None or self._session.closed:
+            headers = {}
+            if self.host_header:
+                headers["Host"] = self.host_header
+            connector = aiohttp.TCPConnector(limit=2, keepalive_timeout=self._keepalive)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=10),
+                headers=headers,
+                json_serialize=lambda obj: json.dumps(obj, separators=(",", ":")),
+            )
+        return self._session
     
     def stop(self):
         """Stop the metrics reporting loop."""
         self._running = False
         logger.info("Metrics reporter stopped")
     
-    async def _send_metrics(self):
-        """Send current metrics to the observability plane."""
-        uptime = int(time.time() - self.start_time)
+    def _build_snapshot(self) -> dict:
+        """Collect a full metrics snapshot (resets the per-interval histograms)."""
+        uptime = self.uptime_seconds
         
         # Calculate average query duration
         avg_query_duration = None
@@ -161,11 +559,13 @@ class MetricsReporter:
         
         metrics = {
             "agent_type": "connector",
+            "timestamp": round(time.time(), 3),
             "version": self.version,
             "uptime_seconds": uptime,
             "connected": self.connected,
             "errors_total": self.errors,
             "bytes_sent_total": self.bytes_sent,
+            "arrow_bytes_sent_total": self.arrow_bytes_sent,
             "records_sent_total": self.records_sent,
             "queries_processed": self.queries_processed,
             # System info
@@ -175,38 +575,136 @@ class MetricsReporter:
             # Query timing
             "last_query_timestamp": self._last_query_timestamp,
             "avg_query_duration_ms": avg_query_duration,
+            # Per-stage latency distribution since the previous report
+            "stage_latencies": self._collect_stage_latencies(),
+            # Throughput and compression
+            "compression_ratio": self.compression_ratio,
+            "throughput": self._collect_throughput(),
+            "datasets": self._collect_dataset_totals(),
+            # Transport backpressure
+            "write_buffer_bytes": self.write_buffer_bytes,
+            "write_buffer_peak_bytes": self.write_buffer_peak_bytes,
+            "send_blocked_seconds_total": round(self.send_blocked_seconds, 3),
+            "send_blocked_total": self.send_blocked_count,
         }
         
+        # Add bandwidth pacing state if enabled
+        if self.pacer is not None and self.pacer.enabled:
+            metrics["pacing_rate_bps"] = int(self.pacer.rate)
+            metrics["uplink_estimate_bps"] = int(self.pacer.estimate)
+            metrics["queuing_delay_ms"] = round(self.pacer.queuing_delay * 1000, 1)
+        
+        # Add event-loop responsiveness (stalls since the previous report)
+        if self.watchdog is not None:
+            stalls = self.watchdog.recent_stalls(since=self._last_stall_report)
+            if stalls:
+                self._last_stall_report = stalls[-1]["timestamp"]
+            metrics["event_loop_lag_max_ms"] = round(self.watchdog.max_lag * 1000, 1)
+            metrics["loop_stalls_total"] = self.watchdog.stalls_total
+            metrics["loop_stalls"] = [
+                {"timestamp": s["timestamp"], "duration_ms": s["duration_ms"],
+                 "location": self.watchdog.location(s)}
+                for s in stalls
+            ]
+        
         # Add certificate expiry if available
         if self._cert_expiry_days is not None:
             metrics["certificate_expiry_days"] = self._cert_expiry_days
         
+        return metrics
+    
+    def _encode(self, snapshot: dict) -> dict:
+        """
+        Full snapshot, or the point-in-time fields that changed since the last
+        delivered one plus every non-empty per-interval field. Two intervals
+        with identical summaries are still two intervals, so PER_INTERVAL
+        fields are never compared against the previous report.
+        """
+        if (not self.delta_encoding or self._last_delivered is None
+                or self._reports_since_full + 1 >= self.full_snapshot_every):
+            return {**snapshot, "snapshot": "full"}
+        base = self._last_delivered
+        delta = {k: v for k, v in snapshot.items()
+                 if k in ALWAYS_SENT or (k not in PER_INTERVAL and base.get(k) != v)}
+        for key in PER_INTERVAL:
+            if snapshot.get(key):
+                delta[key] = snapshot[key]
+        delta["snapshot"] = "delta"
+        return delta
+    
+    async def _send_metrics(self):
+        """Send current metrics to the observability plane."""
+        snapshot = self._build_snapshot()
+        payload = self._encode(snapshot)
+        
+        if await self._post(self.api_url, payload):
+            if not self._last_send_success:
+                logger.info("Metrics reporting resumed")
+            self._last_send_success = True
+            self._last_delivered = snapshot
+            self._reports_since_full = 0 if payload["snapshot"] == "full" else self._reports_since_full + 1
+            if self.spool is not None:
+                await self._flush_spool()
+        else:
+            self._last_send_success = False
+            # Spooled snapshots are full: they must stand on their own when replayed
+            if self.spool is not None:
+                self.spool.append({**snapshot, "snapshot": "full"})
+    
+    async def _post(self, url: str, payload) -> bool:
+        """POST one payload. Returns True if the API accepted it."""
         try:
-            timeout = aiohttp.ClientTimeout(total=10)
-            headers = {}
-            if self.host_header:
-                headers["Host"] = self.host_header
-            
-            async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
-                async with session.post(self.api_url, json=metrics) as resp:
-                    if resp.status == 200:
-                        if not self._last_send_success:
-                            logger.info("Metrics reporting resumed")
-                        self._last_send_success = True
-                    else:
-                        body = await resp.text()
-                        logger.warning(f"Metrics send failed: {resp.status} - {body}")
-                        self._last_send_success = False
+            async with self._get_session().post(url, json=payload) as resp:
+                if resp.status == 200:
+                    return True
+                body = await resp.text()
+                logger.warning(f"Metrics send failed: {resp.status} - {body[:200]}")
+                return False
         except asyncio.TimeoutError:
             logger.warning("Metrics send timeout")
-            self._last_send_success = False
         except aiohttp.ClientError as e:
             if self._last_send_success:  # Only log first failure
                 logger.warning(f"Metrics send error: {e}")
-            self._last_send_success = False
         except Exception as e:
             logger.error(f"Unexpected metrics error: {e}")
-            self._last_send_success = False
+        return False
+    
+    async def _flush_spool(self):
+        """Send spooled snapshots, oldest first, one segment per request."""
+        flushed = 0
+        while (segment := self.spool.claim_oldest()) is not None:
+            claimed, snapshots = segment
+            delivered = await self._post_batch(snapshots)
+            self.spool.release(claimed, snapshots[delivered:])
+            flushed += delivered
+            if delivered < len(snapshots):
+                break
+        if flushed:
+            logger.info(f"Flushed {flushed} spooled metric snapshots")
+    
+    async def _post_batch(self, snapshots: list[dict]) -> int:
+        """
+        Batch endpoint if the API has one; otherwise one POST per snapshot.
+        Returns how many snapshots (from the start of the list) were delivered.
+        """
+        if not snapshots:
+            return 0
+        if self._batch_supported:
+            try:
+                async with self._get_session().post(self.batch_url, json={"snapshots": snapshots}) as resp:
+                    if resp.status == 200:
+                        return len(snapshots)
+                    if resp.status not in (404, 405):
+                        return 0
+                    logger.info("Metrics API has no batch endpoint; replaying spool one snapshot at a time")
+                    self._batch_supported = False
+            except (asyncio.TimeoutError, aiohttp.ClientError):
+                return 0
+        for i, snapshot in enumerate(snapshots):
+            # Stop at the first failure: the rest stays in the segment for the next attempt
+            if not await self._post(self.api_url, snapshot):
+                return i
+        return len(snapshots)
 
 
 # =============================================================================
@@ -234,6 +732,7 @@ if __name__ == "__main__":
         
         # Send once and exit
         await reporter._send_metrics()
+        await reporter.close()
         print("Test complete!")
     
     asyncio.run(test())
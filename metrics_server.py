@@ -0,0 +1,214 @@
+"""
+Local OpenMetrics scrape endpoint for the Data Connector.
+
+Serves everything MetricsReporter tracks, plus live gauges registered by the
+connector, in Prometheus text format. It works even when luzzi-core-im is
+unreachable, so the on-prem operator always has a local view.
+
+Usage:
+    from metrics_server import MetricsServer
+
+    server = MetricsServer(reporter, host="127.0.0.1", port=9464)
+    server.add_gauge("outgoing_queue_depth", "Messages waiting to be sent", lambda: queue.qsize())
+    await server.start()
+
+    # curl http://127.0.0.1:9464/metrics
+    # curl http://127.0.0.1:9464/debug/stalls   (recent event-loop stalls with stacks)
+    # curl "http://127.0.0.1:9464/debug/profile?kind=cpu&duration=10" > connector.collapsed
+"""
+import logging
+from typing import Callable
+
+from aiohttp import web
+
+from loop_watchdog import LoopWatchdog
+from metrics_reporter import THROUGHPUT_WINDOWS, MetricsReporter
+from profiler import Profiler, ProfilerBusy
+
+logger = logging.getLogger("MetricsServer")
+
+PREFIX = "connector_"
+QUANTILES = (0.5, 0.9, 0.99)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the text exposition format."""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+class MetricsServer:
+    """Embedded aiohttp server exposing connector metrics at /metrics."""
+
+    def __init__(self, reporter: MetricsReporter, host: str = "127.0.0.1", port: int = 9464,
+                 watchdog: LoopWatchdog | None = None, profiler: Profiler | None = None):
+        """
+        Args:
+            reporter: MetricsReporter whose counters and histograms are exposed
+            host: Interface to bind (keep on localhost unless the port is firewalled)
+            port: TCP port for the scrape endpoint
+            watchdog: Connector's loop watchdog; if None, only loop lag is measured here
+            profiler: If given, on-demand captures are served at /debug/profile
+        """
+        self.reporter = reporter
+        self.host = host
+        self.port = port
+        self.profiler = profiler
+        self._owns_watchdog = watchdog is None
+        self.watchdog = watchdog or LoopWatchdog(interval=0.25, capture_stacks=False)
+        self._gauges: list[tuple[str, str, Callable[[], float]]] = []
+        self._runner: web.AppRunner | None = None
+
+        self.app = web.Application()
+        self.app.router.add_get("/metrics", self._handle_metrics)
+        self.app.router.add_get("/debug/stalls", self._handle_stalls)
+        if profiler is not None:
+            self.app.router.add_get("/debug/profile", self._handle_profile)
+
+    def add_gauge(self, name: str, help_text: str, getter: Callable[[], float]):
+        """Register a live gauge evaluated on every scrape."""
+        self._gauges.append((name, help_text, getter))
+
+    async def start(self):
+        """Start serving (non-blocking)."""
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self.watchdog.start()
+        logger.info(f"Local metrics endpoint on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._owns_watchdog:
+            self.watchdog.stop()
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle_metrics(self, request: web.Request) -> web.Response:
+        openmetrics = "application/openmetrics-text" in request.headers.get("Accept", "")
+        body = self.render(openmetrics)
+        content_type = OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE
+        return web.Response(body=body.encode("utf-8"), headers={"Content-Type": content_type})
+
+    async def _handle_stalls(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "threshold_ms": round(self.watchdog.threshold * 1000, 1),
+            "stalls_total": self.watchdog.stalls_total,
+            "stalls": self.watchdog.recent_stalls(),
+        })
+
+    async def _handle_profile(self, request: web.Request) -> web.Response:
+        """
+        Run a capture and return it: collapsed stacks as text for kind=cpu,
+        top allocation sites as JSON for kind=memory.
+        """
+        kind = request.query.get("kind", "cpu")
+        try:
+            duration = float(request.query.get("duration", 10))
+            result = await self.profiler.capture(kind, duration, top=int(request.query.get("top", 25)))
+        except ValueError as e:
+            raise web.HTTPBadRequest(text=str(e))
+        except PermissionError as e:
+            raise web.HTTPForbidden(text=str(e))
+        except ProfilerBusy as e:
+            raise web.HTTPConflict(text=str(e))
+        if kind == "cpu":
+            return web.Response(text=result["collapsed"] + "\n")
+        return web.json_response(result)
+
+    # =========================================================================
+    # Rendering
+    # =========================================================================
+
+    def render(self, openmetrics: bool = False) -> str:
+        """Render all metrics in Prometheus (or OpenMetrics) text format."""
+        r = self.reporter
+        lines: list[str] = []
+
+        def metric(name: str, kind: str, help_text: str, samples: list[tuple[str, float]]):
+            full = PREFIX + name
+            # OpenMetrics names the counter family without the _total suffix
+            family = full[:-len("_total")] if openmetrics and kind == "counter" and full.endswith("_total") else full
+            lines.append(f"# HELP {family} {help_text}")
+            lines.append(f"# TYPE {family} {kind}")
+            for suffix_labels, value in samples:
+                lines.append(f"{full}{suffix_labels} {value}")
+
+        # Counters
+        metric("bytes_sent_total", "counter", "Wire bytes sent through the data plane", [("", r.bytes_sent)])
+        metric("arrow_bytes_sent_total", "counter", "Uncompressed Arrow IPC bytes sent",
+               [("", r.arrow_bytes_sent)])
+        metric("records_sent_total", "counter", "Rows sent through the data plane", [("", r.records_sent)])
+        metric("queries_processed_total", "counter", "DoGet streams completed", [("", r.queries_processed)])
+        metric("errors_total", "counter", "Errors while serving requests", [("", r.errors)])
+        metric("send_blocked_seconds_total", "counter", "Time sends spent waiting for socket drain",
+               [("", round(r.send_blocked_seconds, 6))])
+        metric("event_loop_stalls_total", "counter", "Callbacks that blocked the event loop past the threshold",
+               [("", self.watchdog.stalls_total)])
+
+        # Reporter gauges
+        metric("uptime_seconds", "gauge", "Seconds since the connector started", [("", r.uptime_seconds)])
+        metric("connected", "gauge", "1 if connected to the gateway", [("", int(r.connected))])
+        metric("write_buffer_bytes", "gauge", "Pending socket write-buffer bytes", [("", r.write_buffer_bytes)])
+        metric("write_buffer_peak_bytes", "gauge", "Peak socket write-buffer bytes",
+               [("", r.write_buffer_peak_bytes)])
+        if r.compression_ratio is not None:
+            metric("compression_ratio", "gauge", "Arrow bytes per wire byte since start",
+                   [("", r.compression_ratio)])
+        rates = {w: r.throughput.rates(w) for w in THROUGHPUT_WINDOWS}
+        metric("throughput_rows_per_second", "gauge", "Rows sent per second over a sliding window",
+               [(_labels(window=f"{w}s"), round(rate["rows_per_sec"], 1)) for w, rate in rates.items()])
+        metric("throughput_bytes_per_second", "gauge", "Bytes sent per second over a sliding window",
+               [(_labels(window=f"{w}s", kind=kind), round(rate[f"{kind}_bytes_per_sec"]))
+                for w, rate in rates.items() for kind in ("arrow", "wire")])
+        if r.pacer is not None and r.pacer.enabled:
+            metric("pacing_rate_bytes", "gauge", "Allowed send rate (bytes/s)", [("", int(r.pacer.rate))])
+            metric("uplink_estimate_bytes", "gauge", "Estimated uplink (bytes/s)", [("", int(r.pacer.estimate))])
+        metric("event_loop_lag_seconds", "gauge", "Last measured event-loop lag",
+               [("", round(self.watchdog.last_lag, 6))])
+        metric("event_loop_lag_max_seconds", "gauge", "Max event-loop lag since start",
+               [("", round(self.watchdog.max_lag, 6))])
+
+        # Per-dataset accounting
+        if r.dataset_totals:
+            datasets = sorted(r.dataset_totals.items())
+            metric("dataset_rows_sent_total", "counter", "Rows sent per dataset",
+                   [(_labels(dataset=d), t["rows"]) for d, t in datasets])
+            metric("dataset_arrow_bytes_sent_total", "counter", "Uncompressed Arrow IPC bytes sent per dataset",
+                   [(_labels(dataset=d), t["arrow_bytes"]) for d, t in datasets])
+            metric("dataset_wire_bytes_sent_total", "counter", "Wire bytes sent per dataset",
+                   [(_labels(dataset=d), t["wire_bytes"]) for d, t in datasets])
+        
+        # Live gauges registered by the connector
+        for name, help_text, getter in self._gauges:
+            try:
+                value = getter()
+            except Exception as e:
+                logger.debug(f"Gauge {name} failed: {e}")
+                continue
+            metric(name, "gauge", help_text, [("", value)])
+
+        # Stage latencies as summaries (cumulative since start)
+        if r.stage_totals:
+            full = PREFIX + "stage_latency_seconds"
+            lines.append(f"# HELP {full} Request stage latency")
+            lines.append(f"# TYPE {full} summary")
+            for (stage, dataset, transport), histogram in sorted(r.stage_totals.items()):
+                base = {"stage": stage, "dataset": dataset, "transport": transport}
+                for q in QUANTILES:
+                    value = histogram.quantile(q) / 1000
+                    lines.append(f"{full}{_labels(**base, quantile=q)} {value:.6f}")
+                lines.append(f"{full}_sum{_labels(**base)} {histogram.sum / 1000:.6f}")
+                lines.append(f"{full}_count{_labels(**base)} {histogram.count}")
+
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,183 @@
+"""
+Pacing de ancho de banda para el camino de envío de ambos transportes.
+
+Un token bucket compartido por todos los streams del conector limita la tasa
+total de envío a una fracción configurable del uplink estimado. La estimación
+se ajusta con dos señales:
+
+  - Tasa de completado de envíos: cuando el transporte hace esperar al
+    emisor (buffer lleno / control de flujo gRPC), lo entregado por segundo
+    es la capacidad real del enlace.
+  - Retardo de los heartbeats: el retardo por encima del mínimo observado es
+    cola acumulada en algún buffer del camino (estilo LEDBAT). El desfase de
+    relojes entre Gateway y conector se cancela al restar el mínimo. Los
+    timestamps en segundos no tienen resolución suficiente y se ignoran.
+
+Así varias transferencias pueden correr en paralelo sobre un uplink de
+oficina compartido sin saturarlo, en lugar de serializarlas con la cola.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger("Pacing")
+
+MBPS = 1_000_000 / 8  # bytes/s por Mbit/s
+
+
+class BandwidthPacer:
+    """Token bucket con tasa adaptativa según el uplink estimado"""
+
+    # Cada cuánto se recalcula la estimación (segundos)
+    UPDATE_INTERVAL = 1.0
+    # Ventana del mínimo de retardo (segundos); se renueva por si cambia la ruta
+    BASE_DELAY_WINDOW = 300.0
+    # Un envío más lento que esto esperó al transporte (no al pacer)
+    BLOCKED_THRESHOLD = 0.001
+
+    def __init__(self, enabled: bool = True, target_fraction: float = 0.8,
+                 initial_mbps: float = 20, min_mbps: float = 1, max_mbps: float = 0,
+                 queuing_delay_target_ms: float = 50, burst_seconds: float = 0.1):
+        """
+        Args:
+            enabled: Si False, acquire() retorna inmediatamente
+            target_fraction: Fracción del uplink estimado que se permite usar
+            initial_mbps: Estimación inicial del uplink
+            min_mbps: Tasa mínima (nunca se frena por debajo)
+            max_mbps: Tasa máxima (0 = sin límite)
+            queuing_delay_target_ms: Retardo de cola tolerado antes de reducir la tasa
+            burst_seconds: Capacidad del bucket expresada en segundos de tasa
+        """
+        self.enabled = enabled
+        self.target_fraction = target_fraction
+        self.min_rate = min_mbps * MBPS
+        self.max_rate = max_mbps * MBPS if max_mbps else None
+        self.queuing_delay_target = queuing_delay_target_ms / 1000
+        self.burst_seconds = burst_seconds
+
+        self.estimate = initial_mbps * MBPS  # Uplink estimado (bytes/s)
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+
+        # Muestras del intervalo actual
+        self._interval_start = time.monotonic()
+        self._interval_bytes = 0
+        self._interval_blocked = False   # El transporte hizo esperar al emisor
+        self._interval_throttled = False  # El pacer hizo esperar al emisor
+        self._interval_congested = False  # Retardo de cola por encima del objetivo
+
+        # (timestamp, retardo) para el mínimo móvil
+        self._delays: deque[tuple[float, float]] = deque()
+        self.queuing_delay = 0.0
+
+    @property
+    def rate(self) -> float:
+        """Tasa de envío permitida en bytes/s"""
+        rate = max(self.estimate * self.target_fraction, self.min_rate)
+        if self.max_rate:
+            rate = min(rate, self.max_rate)
+        return rate
+
+    @property
+    def capacity(self) -> float:
+        """Tamaño del bucket en bytes"""
+        return self.rate * self.burst_seconds
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    async def acquire(self, nbytes: int):
+        """
+        Espera hasta que haya tokens para enviar nbytes.
+        Un chunk mayor que el bucket pasa con el bucket lleno y deja deuda.
+        """
+        if not self.enabled:
+            return
+        while True:
+            self._refill()
+            needed = min(nbytes, self.capacity)
+            if self._tokens >= needed:
+                self._tokens -= nbytes
+                return
+            self._interval_throttled = True
+            await asyncio.sleep((needed - self._tokens) / self.rate)
+
+    def on_send_complete(self, nbytes: int, seconds: float):
+        """Registra un envío terminado y cuánto tardó el transporte en aceptarlo"""
+        self._interval_bytes += nbytes
+        if seconds > self.BLOCKED_THRESHOLD:
+            self._interval_blocked = True
+        self._maybe_update()
+
+    def on_delay_sample(self, delay_ms: float):
+        """
+        Registra un retardo medido con heartbeats (one-way con reloj del Gateway,
+        o RTT de ping). Sólo importa su diferencia con el mínimo reciente.
+        """
+        now = time.monotonic()
+        delay = delay_ms / 1000
+        self._delays.append((now, delay))
+        while self._delays and now - self._delays[0][0] > self.BASE_DELAY_WINDOW:
+            self._delays.popleft()
+        base = min(d for _, d in self._delays)
+        self.queuing_delay = delay - base
+        if self.queuing_delay > self.queuing_delay_target:
+            self._interval_congested = True
+        self._maybe_update()
+
+    def on_heartbeat(self, timestamp: int):
+        """
+        Retardo one-way a partir del timestamp de un heartbeat del Gateway.
+        Sólo con milisegundos epoch: con segundos el retardo oscilaría entre
+        0 y 1000 ms y marcaría congestión casi siempre (queda el RTT del ping).
+        """
+        if not timestamp or timestamp < 1e11:
+            return
+        self.on_delay_sample(time.time() * 1000 - timestamp)
+
+    def _maybe_update(self):
+        """Recalcula la estimación del uplink una vez por intervalo"""
+        now = time.monotonic()
+        elapsed = now - self._interval_start
+        if elapsed < self.UPDATE_INTERVAL:
+            return
+
+        delivered = self._interval_bytes / elapsed
+        previous = self.estimate
+        if self._interval_congested:
+            # Cola creciendo en el camino: retroceder
+            self.estimate = max(self.estimate * 0.85, self.min_rate)
+        elif self._interval_blocked and delivered > 0:
+            # El enlace fue el cuello de botella: lo entregado es la capacidad
+            self.estimate = 0.5 * self.estimate + 0.5 * delivered
+        elif self._interval_throttled:
+            # Frenados por el pacer sin señales de congestión: sondear hacia arriba
+            self.estimate *= 1.1
+        if self.max_rate:
+            self.estimate = min(self.estimate, self.max_rate / self.target_fraction)
+
+        if abs(self.estimate - previous) / previous > 0.1:
+            logger.debug(f"Uplink estimate {previous / MBPS:.1f} -> {self.estimate / MBPS:.1f} Mbps "
+                         f"(delivered {delivered / MBPS:.1f} Mbps, queuing {self.queuing_delay * 1000:.0f} ms)")
+
+        self._interval_start = now
+        self._interval_bytes = 0
+        self._interval_blocked = False
+        self._interval_throttled = False
+        self._interval_congested = False
+
+
+def pacer_from_config(config: dict) -> BandwidthPacer:
+    """Crea el pacer a partir de la sección 'pacing' de config.yml"""
+    cfg = config.get('pacing', {}) or {}
+    return BandwidthPacer(
+        enabled=cfg.get('enabled', False),
+        target_fraction=cfg.get('target_fraction', 0.8),
+        initial_mbps=cfg.get('initial_mbps', 20),
+        min_mbps=cfg.get('min_mbps', 1),
+        max_mbps=cfg.get('max_mbps', 0),
+        queuing_delay_target_ms=cfg.get('queuing_delay_target_ms', 50),
+    )
@@ -0,0 +1,230 @@
+"""
+On-demand profiling for the Data Connector.
+
+Nothing runs until a capture is requested, so there is no overhead while idle.
+Two kinds of capture are available, and both are time-bounded:
+
+  - cpu:    a sampling profiler thread reads the stacks of every thread (the
+            event loop and the executor threads) at a fixed interval. It
+            returns collapsed stacks ("thread;frame;frame count"), which go
+            straight into flamegraph.pl or speedscope.
+  - memory: tracemalloc snapshots at the start and end of the window, diffed
+            to find the top allocation sites. tracemalloc is only active
+            during the capture.
+
+Captures are triggered by the WebSocket "profile" action or by the local
+metrics endpoint (GET /debug/profile?kind=cpu&duration=10). Results are
+returned to the caller and also written to the output directory.
+
+Usage:
+    from profiler import profiler_from_config
+
+    profiler = profiler_from_config(config)
+    result = await profiler.capture("cpu", duration=10)
+    print(result["collapsed"])
+"""
+import asyncio
+import logging
+import math
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+logger = logging.getLogger("Profiler")
+
+KINDS = ("cpu", "memory")
+
+
+class ProfilerBusy(RuntimeError):
+    """Another capture is already running."""
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})"
+
+
+def sample_stacks(duration: float, interval: float) -> tuple[Counter, int]:
+    """
+    Sample every thread's stack for `duration` seconds (blocking; run it in a
+    thread). Returns (collapsed stack -> samples, number of sampling rounds).
+    """
+    own_id = threading.get_ident()
+    stacks: Counter = Counter()
+    rounds = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(thread_id, f"thread-{thread_id}"))
+            stacks[";".join(reversed(labels))] += 1
+        rounds += 1
+        time.sleep(interval)
+    return stacks, rounds
+
+
+class Profiler:
+    """Runs one time-bounded CPU or memory capture at a time."""
+
+    def __init__(self, enabled: bool = True, output_dir: str | Path | None = None,
+                 sample_interval: float = 0.005, max_duration: float = 60.0,
+                 traceback_frames: int = 10):
+        """
+        Args:
+            enabled: If False, capture() raises PermissionError
+            output_dir: Where results are written (None = only returned)
+            sample_interval: Seconds between CPU stack samples
+            max_duration: Upper bound for any capture (seconds)
+            traceback_frames: Frames kept per allocation site in memory captures
+        """
+        self.enabled = enabled
+        self.output_dir = Path(output_dir) if output_dir else None
+        self.sample_interval = sample_interval
+        self.max_duration = max_duration
+        self.traceback_frames = traceback_frames
+        self._lock = asyncio.Lock()
+
+    async def capture(self, kind: str = "cpu", duration: float = 10.0, top: int = 25) -> dict:
+        """
+        Run a capture and return its result.
+
+        Args:
+            kind: "cpu" (collapsed stacks) or "memory" (tracemalloc diff)
+            duration: Capture window in seconds (clamped to max_duration)
+            top: Allocation sites returned by memory captures
+
+        Arguments usually come straight from a request, so they are all
+        validated before the capture starts; anything invalid raises ValueError.
+        """
+        if not self.enabled:
+            raise PermissionError("Profiling is disabled in config.yml")
+        if not isinstance(kind, str) or kind not in KINDS:
+            raise ValueError(f"Unknown profile kind '{kind}' (expected one of {', '.join(KINDS)})")
+        try:
+            duration = float(duration)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid profile duration: {duration!r}") from None
+        if not math.isfinite(duration):
+            raise ValueError(f"Invalid profile duration: {duration!r}")
+        try:
+            top = int(top)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid profile top: {top!r}") from None
+        if top < 1:
+            raise ValueError(f"Profile top must be at least 1, got {top}")
+        if self._lock.locked():
+            raise ProfilerBusy("A profile capture is already running")
+        duration = max(0.1, min(duration, self.max_duration))
+
+        async with self._lock:
+            logger.info(f"Starting {kind} profile for {duration:.1f}s")
+            if kind == "cpu":
+                result = await self._capture_cpu(duration)
+            else:
+                result = await self._capture_memory(duration, top)
+            result["path"] = self._write(kind, result)
+            logger.info(f"{kind} profile complete" + (f": {result['path']}" if result["path"] else ""))
+            return result
+
+    async def _capture_cpu(self, duration: float) -> dict:
+        # The sampler runs on its own thread so it sees the loop while the loop keeps working
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+        thread_result: dict = {}
+
+        def run():
+            try:
+                thread_result["stacks"], thread_result["rounds"] = sample_stacks(duration, self.sample_interval)
+            finally:
+                loop.call_soon_threadsafe(done.set_result, None)
+
+        threading.Thread(target=run, name="profiler-sampler", daemon=True).start()
+        await done
+
+        stacks: Counter = thread_result.get("stacks", Counter())
+        return {
+            "kind": "cpu",
+            "duration_seconds": duration,
+            "sample_interval_ms": self.sample_interval * 1000,
+            "rounds": thread_result.get("rounds", 0),
+            "collapsed": "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()),
+        }
+
+    async def _capture_memory(self, duration: float, top: int) -> dict:
+        started_here = not tracemalloc.is_tracing()
+        if started_here:
+            tracemalloc.start(self.traceback_frames)
+        try:
+            before = tracemalloc.take_snapshot()
+            await asyncio.sleep(duration)
+            after = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            if started_here:
+                tracemalloc.stop()
+
+        # Ignore allocations made by tracemalloc itself
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        diff = after.filter_traces(filters).compare_to(before.filter_traces(filters), "traceback")
+        sites = [{
+            "size_diff_bytes": stat.size_diff,
+            "count_diff": stat.count_diff,
+            "size_bytes": stat.size,
+            "count": stat.count,
+            # Most recent frame first: the allocation site itself
+            "traceback": [f"{frame.filename}:{frame.lineno}" for frame in reversed(stat.traceback)],
+        } for stat in diff[:top]]
+        return {
+            "kind": "memory",
+            "duration_seconds": duration,
+            "traced_current_bytes": current,
+            "traced_peak_bytes": peak,
+            "top_allocations": sites,
+        }
+
+    def _write(self, kind: str, result: dict) -> str | None:
+        if self.output_dir is None:
+            return None
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            if kind == "cpu":
+                path = self.output_dir / f"cpu-{stamp}.collapsed"
+                path.write_text(result["collapsed"] + "\n", encoding="utf-8")
+            else:
+                path = self.output_dir / f"memory-{stamp}.txt"
+                lines = [f"traced: {result['traced_current_bytes']} bytes (peak {result['traced_peak_bytes']})"]
+                for site in result["top_allocations"]:
+                    lines.append(f"{site['size_diff_bytes']:+d} B ({site['count_diff']:+d} blocks), "
+                                 f"total {site['size_bytes']} B")
+                    lines.extend(f"    {frame}" for frame in site["traceback"])
+                path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+            return str(path)
+        except OSError as e:
+            logger.warning(f"Could not write profile: {e}")
+            return None
+
+
+def profiler_from_config(config: dict, base_dir: Path | None = None) -> Profiler:
+    """Create the profiler from the 'profiling' section of config.yml."""
+    cfg = config.get('profiling', {}) or {}
+    output_dir = cfg.get('output_dir', 'profiles')
+    if output_dir:
+        output_dir = Path(output_dir)
+        if not output_dir.is_absolute():
+            output_dir = (base_dir or Path(__file__).parent) / output_dir
+    return Profiler(
+        enabled=cfg.get('enabled', True),
+        output_dir=output_dir or None,
+        sample_interval=cfg.get('sample_interval_ms', 5) / 1000,
+        max_duration=cfg.get('max_duration_seconds', 60),
+    )
@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0f\x63onnector.proto\x12\tconnector\"\xaa\x02\n\x10\x43onnectorMessage\x12\x12\n\nrequest_id\x18\x01 \x01(\t\x12.\n\x08register\x18\x02 \x01(\x0b\x32\x1a.connector.RegisterRequestH\x00\x12\x34\n\x0b\x66light_info\x18\x03 \x01(\x0b\x32\x1d.connector.FlightInfoResponseH\x00\x12,\n\x0b\x61rrow_chunk\x18\x04 \x01(\x0b\x32\x15.connector.ArrowChunkH\x00\x12\x30\n\rstream_status\x18\x05 \x01(\x0b\x32\x17.connector.StreamStatusH\x00\x12\x31\n\theartbeat\x18\x06 \x01(\x0b\x32\x1c.connector.HeartbeatResponseH\x00\x42\t\n\x07payload\"\xfb\x01\n\x0eGatewayCommand\x12\x12\n\nrequest_id\x18\x01 \x01(\t\x12\x38\n\x11register_response\x18\x02 \x01(\x0b\x32\x1b.connector.RegisterResponseH\x00\x12:\n\x0fget_flight_info\x18\x03 \x01(\x0b\x32\x1f.connector.GetFlightInfoRequestH\x00\x12)\n\x06\x64o_get\x18\x04 \x01(\x0b\x32\x17.connector.DoGetRequestH\x00\x12)\n\theartbeat\x18\x05 \x01(\x0b\x32\x14.connector.HeartbeatH\x00\x42\t\n\x07\x63ommand\"G\n\x0fRegisterRequest\x12\x11\n\ttenant_id\x18\x01 \x01(\t\x12\x0f\n\x07version\x18\x02 \x01(\t\x12\x10\n\x08\x64\x61tasets\x18\x03 \x03(\t\"E\n\x10RegisterResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x12\n\nsession_id\x18\x02 \x01(\t\x12\r\n\x05\x65rror\x18\x03 \x01(\t\"2\n\x14GetFlightInfoRequest\x12\x0c\n\x04path\x18\x01 \x03(\t\x12\x0c\n\x04rows\x18\x02 \x01(\x03\"\x94\x01\n\x12\x46lightInfoResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x0e\n\x06schema\x18\x02 \x01(\x0c\x12\x15\n\rtotal_records\x18\x03 \x01(\x03\x12\x13\n\x0btotal_bytes\x18\x04 \x01(\x03\x12\x0f\n\x07\x64\x61taset\x18\x05 \x01(\t\x12\x12\n\npartitions\x18\x06 \x01(\x05\x12\r\n\x05\x65rror\x18\x07 \x01(\t\"\x1e\n\x0c\x44oGetRequest\x12\x0e\n\x06ticket\x18\x01 \x01(\t\"-\n\nArrowChunk\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c\x12\x11\n\tpartition\x18\x02 \x01(\x05\"\x92\x01\n\x0cStreamStatus\x12\x0c\n\x04type\x18\x01 \x01(\t\x12\x0e\n\x06schema\x18\x02 \x01(\x0c\x12\x11\n\tpartition\x18\x03 \x01(\x05\x12\x18\n\x10total_partitions\x18\x04 \x01(\x05\x12\x13\n\x0btotal_bytes\x18\x05 \x01(\x03\x12\r\n\x05\x65rror\x18\x06 \x01(\t\x12\x13\n\x0b\x63ompression\x18\x07 \x01(\t\"\x1e\n\tHeartbeat\x12\x11\n\ttimestamp\x18\x01 \x01(\x03\"9\n\x11HeartbeatResponse\x12\x11\n\ttenant_id\x18\x01 \x01(\t\x12\x11\n\ttimestamp\x18\x02 \x01(\x03\x32[\n\x10\x43onnectorService\x12G\n\x07\x43onnect\x12\x1b.connector.ConnectorMessage\x1a\x19.connector.GatewayCommand\"\x00(\x01\x30\x01\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0f\x63onnector.proto\x12\tconnector\"\xaa\x02\n\x10\x43onnectorMessage\x12\x12\n\nrequest_id\x18\x01 \x01(\t\x12.\n\x08register\x18\x02 \x01(\x0b\x32\x1a.connector.RegisterRequestH\x00\x12\x34\n\x0b\x66light_info\x18\x03 \x01(\x0b\x32\x1d.connector.FlightInfoResponseH\x00\x12,\n\x0b\x61rrow_chunk\x18\x04 \x01(\x0b\x32\x15.connector.ArrowChunkH\x00\x12\x30\n\rstream_status\x18\x05 \x01(\x0b\x32\x17.connector.StreamStatusH\x00\x12\x31\n\theartbeat\x18\x06 \x01(\x0b\x32\x1c.connector.HeartbeatResponseH\x00\x42\t\n\x07payload\"\xfb\x01\n\x0eGatewayCommand\x12\x12\n\nrequest_id\x18\x01 \x01(\t\x12\x38\n\x11register_response\x18\x02 \x01(\x0b\x32\x1b.connector.RegisterResponseH\x00\x12:\n\x0fget_flight_info\x18\x03 \x01(\x0b\x32\x1f.connector.GetFlightInfoRequestH\x00\x12)\n\x06\x64o_get\x18\x04 \x01(\x0b\x32\x17.connector.DoGetRequestH\x00\x12)\n\theartbeat\x18\x05 \x01(\x0b\x32\x14.connector.HeartbeatH\x00\x42\t\n\x07\x63ommand\"G\n\x0fRegisterRequest\x12\x11\n\ttenant_id\x18\x01 \x01(\t\x12\x0f\n\x07version\x18\x02 \x01(\t\x12\x10\n\x08\x64\x61tasets\x18\x03 \x03(\t\"E\n\x10RegisterResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x12\n\nsession_id\x18\x02 \x01(\t\x12\r\n\x05\x65rror\x18\x03 \x01(\t\"X\n\x14GetFlightInfoRequest\x12\x0c\n\x04path\x18\x01 \x03(\t\x12\x0c\n\x04rows\x18\x02 \x01(\x03\x12\x15\n\rknown_version\x18\x03 \x01(\t\x12\r\n\x05query\x18\x04 \x01(\t\"\xbb\x01\n\x12\x46lightInfoResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x0e\n\x06schema\x18\x02 \x01(\x0c\x12\x15\n\rtotal_records\x18\x03 \x01(\x03\x12\x13\n\x0btotal_bytes\x18\x04 \x01(\x03\x12\x0f\n\x07\x64\x61taset\x18\x05 \x01(\t\x12\x12\n\npartitions\x18\x06 \x01(\x05\x12\r\n\x05\x65rror\x18\x07 \x01(\t\x12\x0f\n\x07version\x18\x08 \x01(\t\x12\x14\n\x0cnot_modified\x18\t \x01(\x08\"\x1e\n\x0c\x44oGetRequest\x12\x0e\n\x06ticket\x18\x01 \x01(\t\"-\n\nArrowChunk\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c\x12\x11\n\tpartition\x18\x02 \x01(\x05\"\xd1\x01\n\x0cStreamStatus\x12\x0c\n\x04type\x18\x01 \x01(\t\x12\x0e\n\x06schema\x18\x02 \x01(\x0c\x12\x11\n\tpartition\x18\x03 \x01(\x05\x12\x18\n\x10total_partitions\x18\x04 \x01(\x05\x12\x13\n\x0btotal_bytes\x18\x05 \x01(\x03\x12\r\n\x05\x65rror\x18\x06 \x01(\t\x12\x13\n\x0b\x63ompression\x18\x07 \x01(\t\x12\x16\n\x0ehigh_watermark\x18\x08 \x01(\t\x12\x0f\n\x07version\x18\t \x01(\t\x12\x14\n\x0cnot_modified\x18\n \x01(\x08\"\x1e\n\tHeartbeat\x12\x11\n\ttimestamp\x18\x01 \x01(\x03\"9\n\x11HeartbeatResponse\x12\x11\n\ttenant_id\x18\x01 \x01(\t\x12\x11\n\ttimestamp\x18\x02 \x01(\x03\x32[\n\x10\x43onnectorService\x12G\n\x07\x43onnect\x12\x1b.connector.ConnectorMessage\x1a\x19.connector.GatewayCommand\"\x00(\x01\x30\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -40,19 +40,19 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_REGISTERRESPONSE']._serialized_start=658
   _globals['_REGISTERRESPONSE']._serialized_end=727
   _globals['_GETFLIGHTINFOREQUEST']._serialized_start=729
-  _globals['_GETFLIGHTINFOREQUEST']._serialized_end=779
-  _globals['_FLIGHTINFORESPONSE']._serialized_start=782
-  _globals['_FLIGHTINFORESPONSE']._serialized_end=930
-  _globals['_DOGETREQUEST']._serialized_start=932
-  _globals['_DOGETREQUEST']._serialized_end=962
-  _globals['_ARROWCHUNK']._serialized_start=964
-  _globals['_ARROWCHUNK']._serialized_end=1009
-  _globals['_STREAMSTATUS']._serialized_start=1012
-  _globals['_STREAMSTATUS']._serialized_end=1158
-  _globals['_HEARTBEAT']._serialized_start=1160
-  _globals['_HEARTBEAT']._serialized_end=1190
-  _globals['_HEARTBEATRESPONSE']._serialized_start=1192
-  _globals['_HEARTBEATRESPONSE']._serialized_end=1249
-  _globals['_CONNECTORSERVICE']._serialized_start=1251
-  _globals['_CONNECTORSERVICE']._serialized_end=1342
+  _globals['_GETFLIGHTINFOREQUEST']._serialized_end=817
+  _globals['_FLIGHTINFORESPONSE']._serialized_start=820
+  _globals['_FLIGHTINFORESPONSE']._serialized_end=1007
+  _globals['_DOGETREQUEST']._serialized_start=1009
+  _globals['_DOGETREQUEST']._serialized_end=1039
+  _globals['_ARROWCHUNK']._serialized_start=1041
+  _globals['_ARROWCHUNK']._serialized_end=1086
+  _globals['_STREAMSTATUS']._serialized_start=1089
+  _globals['_STREAMSTATUS']._serialized_end=1298
+  _globals['_HEARTBEAT']._serialized_start=1300
+  _globals['_HEARTBEAT']._serialized_end=1330
+  _globals['_HEARTBEATRESPONSE']._serialized_start=1332
+  _globals['_HEARTBEATRESPONSE']._serialized_end=1389
+  _globals['_CONNECTORSERVICE']._serialized_start=1391
+  _globals['_CONNECTORSERVICE']._serialized_end=1482
 # @@protoc_insertion_point(module_scope)
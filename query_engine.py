@@ -0,0 +1,217 @@
+"""
+Consultas SQL sobre los datasets con DuckDB embebido.
+
+Un ticket (o FlightInfo) con 'query' ejecuta un SELECT sobre los datasets
+por su nombre: "SELECT category, sum(value) FROM sales GROUP BY 1". Cada
+tabla referenciada se expone a DuckDB según dónde esté:
+
+  - en memoria (caché de DataLoader o el sintético 'sales'): la tabla Arrow
+    registrada zero-copy
+  - archivo Parquet/CSV/NDJSON, o directorio/glob: vista sobre read_parquet /
+    read_csv / read_json (lectura paralela con pushdown de columnas y filtros)
+  - archivo .duckdb: su tabla 'data' (ATTACH de sólo lectura)
+  - Feather/Arrow IPC: dataset de pyarrow escaneado por DuckDB
+
+El resultado se guarda en la caché de DataLoader como un dataset más
+('query:<hash>'), con huella = SQL normalizado + versión de cada dataset
+usado, y se activa: el DoGet lo envía en batches como cualquier dataset (con
+particiones, compresión y versiones). Repetir la consulta sin cambios en
+los archivos no vuelve a ejecutarla.
+
+Sólo se acepta una sentencia SELECT, y DuckDB no puede acceder a archivos
+fuera de datasets/.
+"""
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+
+import pyarrow as pa
+
+from data_loader import DATASETS_DIR, DataLoader, data_loader
+
+try:
+    import duckdb
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    DUCKDB_AVAILABLE = False
+
+logger = logging.getLogger("QueryEngine")
+
+# Prefijo de la clave de caché (y nombre del dataset activo) de los resultados
+QUERY_DATASET_PREFIX = "query:"
+
+# Literales de texto e identificadores entre comillas: se conservan tal cual al normalizar
+_QUOTED = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+
+
+def _sql_string(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+class QueryEngine:
+    """Ejecuta SELECTs sobre los datasets y cachea los resultados en DataLoader"""
+
+    def __init__(self, loader: DataLoader = None, enabled: bool = True,
+                 threads: int | None = None, memory_limit_mb: int | None = None):
+        self.loader = loader or data_loader
+        self.enabled = enabled and DUCKDB_AVAILABLE
+        self.threads = threads
+        self.memory_limit_mb = memory_limit_mb
+        # Una consulta a la vez: DuckDB ya paraleliza cada una con sus hilos
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize_sql(sql: str) -> str:
+        """
+        Forma canónica para la clave de caché: espacios colapsados fuera de
+        comillas y sin ';' final.
+        """
+        parts = _QUOTED.split(sql.strip().rstrip(';').strip())
+        for i in range(0, len(parts), 2):
+            parts[i] = re.sub(r"\s+", " ", parts[i])
+        return "".join(parts).strip()
+
+    def activate(self, sql: str) -> pa.Table:
+        """
+        Ejecuta la consulta (o toma el resultado cacheado) y lo deja como
+        dataset activo. Lanza ValueError si la consulta no es válida.
+        Pensado para correr en un hilo.
+        """
+        if not self.enabled:
+            raise ValueError("SQL queries are not available (duckdb not installed or query.enabled is false)")
+        normalized = self.normalize_sql(sql)
+        with self._lock:
+            con = self._connect()
+            try:
+                self._check_statement(con, normalized)
+                canonical = self._canonical_sql(con, normalized)
+                sources = self._resolve_sources(con, normalized)
+                # La huella cambia si cambia la consulta o cualquiera de sus datasets
+                digest = hashlib.sha1(canonical.encode('utf-8'))
+                for name, (_, _, fingerprint) in sorted(sources.items()):
+                    digest.update(f"\n{name}:{fingerprint}".encode('utf-8'))
+                fingerprint = digest.hexdigest()[:16]
+                key = QUERY_DATASET_PREFIX + hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:12]
+                return self.loader.load_result(key, fingerprint,
+                                               lambda: self._execute(con, normalized, sources))
+            finally:
+                con.close()
+
+    def _connect(self):
+        """Conexión en memoria que sólo puede leer archivos de datasets/"""
+        con = duckdb.connect()
+        if self.threads:
+            con.execute(f"SET threads = {int(self.threads)}")
+        if self.memory_limit_mb:
+            con.execute(f"SET memory_limit = '{int(self.memory_limit_mb)}MB'")
+        con.execute("SET allowed_directories = [?]", [f"{DATASETS_DIR.resolve()}/"])
+        con.execute("SET enable_external_access = false")
+        con.execute("SET lock_configuration = true")
+        return con
+
+    @staticmethod
+    def _check_statement(con, sql: str):
+        try:
+            statements = con.extract_statements(sql)
+        except duckdb.Error as e:
+            raise ValueError(f"Invalid SQL: {e}") from e
+        if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+            raise ValueError("Only a single SELECT statement is allowed")
+
+    @staticmethod
+    def _canonical_sql(con, sql: str) -> str:
+        """
+        Árbol sintáctico de la consulta (json_serialize_sql) sin posiciones:
+        mayúsculas/minúsculas de palabras clave y espacios no cambian la
+        clave de caché. Sin la extensión json, el SQL normalizado.
+        """
+        try:
+            tree = json.loads(con.execute("SELECT json_serialize_sql(?)", [sql]).fetchone()[0])
+        except (duckdb.Error, ValueError):
+            return sql
+        if tree.get('error'):
+            return sql
+
+        def strip_locations(node):
+            if isinstance(node, dict):
+                return {k: strip_locations(v) for k, v in node.items() if k != 'query_location'}
+            if isinstance(node, list):
+                return [strip_locations(v) for v in node]
+            return node
+        return json.dumps(strip_locations(tree), sort_keys=True)
+
+    def _resolve_sources(self, con, sql: str) -> dict[str, tuple]:
+        """Expone a DuckDB cada dataset referenciado; retorna nombre -> (tipo, origen, huella)"""
+        try:
+            names = con.get_table_names(sql)
+        except duckdb.Error as e:
+            raise ValueError(f"Invalid SQL: {e}") from e
+        sources = {}
+        for name in names:
+            source = self.loader.query_source(name)
+            if source is None:
+                # Puede ser un CTE o un alias: si no existe, DuckDB lo reporta al ejecutar
+                continue
+            try:
+                self._register(con, name, *source)
+            except duckdb.Error as e:
+                raise ValueError(f"Cannot read dataset '{name}': {e}") from e
+            sources[name] = source
+        return sources
+
+    @staticmethod
+    def _register(con, name: str, kind: str, source, fingerprint: str):
+        view = '"' + name.replace('"', '""') + '"'
+        if kind == 'table':
+            con.register(name, source)
+            return
+        if kind == 'fileset':
+            paths, file_format, hive = [str(f) for f in source.files], source.format, source.base_dir is not None
+        else:
+            paths, hive = [str(source)], False
+            file_format = source.suffix.lower().lstrip('.')
+        if file_format == 'duckdb':
+            alias = 'db_' + hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]
+            con.execute(f"ATTACH {_sql_string(paths[0])} AS {alias} (READ_ONLY)")
+            con.execute(f"CREATE TEMP VIEW {view} AS SELECT * FROM {alias}.data")
+            return
+        if file_format in ('ipc', 'feather', 'arrow'):
+            # Arrow IPC: DuckDB escanea el dataset de pyarrow (con pushdown), sin cargarlo
+            import pyarrow.dataset as ds
+            con.register(name, ds.dataset(paths, format='ipc'))
+            return
+        function = {'parquet': 'read_parquet', 'pq': 'read_parquet', 'csv': 'read_csv'}.get(file_format, 'read_json')
+        # Las vistas no admiten parámetros: la lista de archivos va como literal
+        files = "[" + ", ".join(_sql_string(p) for p in paths) + "]"
+        con.execute(f"CREATE TEMP VIEW {view} AS SELECT * FROM "
+                    f"{function}({files}, hive_partitioning = {'true' if hive else 'false'})")
+
+    @staticmethod
+    def _execute(con, sql: str, sources: dict) -> pa.Table:
+        started = time.time()
+        try:
+            result = con.execute(sql).arrow()
+        except duckdb.Error as e:
+            raise ValueError(f"Query failed: {e}") from e
+        # duckdb >= 1.4 retorna un RecordBatchReader; versiones anteriores, una Table
+        table = result.read_all() if isinstance(result, pa.RecordBatchReader) else result
+        logger.info(f"Query over {', '.join(sorted(sources)) or 'no datasets'} executed in "
+                    f"{time.time() - started:.2f}s: {table.num_rows:,} rows, "
+                    f"{table.nbytes / 1024 / 1024:.2f} MB")
+        return table
+
+
+def query_engine_from_config(config: dict) -> QueryEngine:
+    """Crea el motor de consultas a partir de la sección 'query' de config.yml"""
+    cfg = config.get('query', {}) or {}
+    engine = QueryEngine(
+        enabled=cfg.get('enabled', True),
+        threads=cfg.get('threads'),
+        memory_limit_mb=cfg.get('memory_limit_mb'),
+    )
+    if cfg.get('enabled', True) and not DUCKDB_AVAILABLE:
+        logger.warning("SQL queries disabled: duckdb not installed")
+    return engine
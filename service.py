@@ -6,10 +6,15 @@ Uso:
   python service.py install  (Instalar servicio)
   python service.py start    (Iniciar servicio)
   python service.py --test   (Ejecutar en consola para pruebas)
+  python service.py --test --workers 4  (Supervisor con 4 procesos conector)
 """
 import sys
+import os
+import time
 import asyncio
 import logging
+import tempfile
+import multiprocessing
 from pathlib import Path
 
 import yaml
@@ -24,7 +29,8 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Cargar configuración
-CONFIG_PATH = Path(__file__).parent / "config.yml"
+# CONNECTOR_CONFIG permite usar otro archivo (p. ej. el que genera bench/)
+CONFIG_PATH = Path(os.environ.get("CONNECTOR_CONFIG") or Path(__file__).parent / "config.yml")
 
 def load_config():
     """Carga configuración desde config.yml"""
@@ -35,6 +41,22 @@ def load_config():
 
 CONFIG = load_config()
 
+# Modo multiproceso: N procesos conector, cada uno con su propio event loop y registro
+WORKER_PROCESSES = CONFIG.get('performance', {}).get('worker_processes', 1)
+# Directorio de datasets compartidos: 'auto' = /dev/shm si existe, si no el temporal del sistema
+SHARED_MEMORY_DIR = CONFIG.get('performance', {}).get('shared_memory_dir', 'auto')
+# Espera antes de reiniciar un proceso caído (segundos)
+RESTART_DELAY = CONFIG.get('performance', {}).get('reconnect_delay', 5)
+
+
+def resolve_shared_memory_dir() -> Path:
+    """Resuelve el directorio donde los procesos publican los datasets mapeados"""
+    if SHARED_MEMORY_DIR and SHARED_MEMORY_DIR != 'auto':
+        return Path(SHARED_MEMORY_DIR)
+    shm = Path("/dev/shm")
+    base = shm if shm.is_dir() else Path(tempfile.gettempdir())
+    return base / "data-connector"
+
 
 def run_connector():
     """Ejecuta el conector según el modo de transporte configurado"""
@@ -57,10 +79,69 @@ def run_connector():
         logger.error(f"Error: {e}")
 
 
+def _worker_main(index: int, shared_dir: str):
+    """Punto de entrada de cada proceso conector del supervisor"""
+    from data_loader import data_loader
+    logger.info(f"=== Connector worker process {index} (pid {os.getpid()}) ===")
+    data_loader.enable_shared_memory(Path(shared_dir))
+    run_connector()
+
+
+def run_supervisor(workers: int):
+    """
+    Lanza N procesos conector y los reinicia si terminan inesperadamente.
+    
+    Cada proceso tiene su propio event loop y GIL, así la codificación y el
+    envío escalan con los núcleos. Los datasets se cargan una sola vez y se
+    comparten como archivos Arrow IPC mapeados en memoria.
+    """
+    shared_dir = resolve_shared_memory_dir()
+    logger.info(f"=== Supervisor starting {workers} connector processes (shared datasets: {shared_dir}) ===")
+    
+    # spawn: mismo comportamiento en Windows y Linux, sin heredar estado del padre
+    ctx = multiprocessing.get_context("spawn")
+    processes: dict[int, multiprocessing.Process] = {}
+    
+    def start(index: int):
+        process = ctx.Process(target=_worker_main, args=(index, str(shared_dir)),
+                              name=f"connector-{index}")
+        process.start()
+        processes[index] = process
+        logger.info(f"Started connector process {index} (pid {process.pid})")
+    
+    for index in range(workers):
+        start(index)
+    
+    try:
+        while True:
+            time.sleep(1)
+            for index, process in list(processes.items()):
+                if not process.is_alive():
+                    logger.warning(f"Connector process {index} exited with code {process.exitcode}. "
+                                   f"Restarting in {RESTART_DELAY}s...")
+                    time.sleep(RESTART_DELAY)
+                    start(index)
+    except KeyboardInterrupt:
+        logger.info("Stopping connector processes...")
+    finally:
+        for process in processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in processes.values():
+            process.join(timeout=10)
+
+
 def run_test_mode():
     """Ejecución manual para desarrollo/testing"""
     logger.info("--- RUNNING IN TEST MODE (Console) ---")
-    run_connector()
+    workers = WORKER_PROCESSES
+    if '--workers' in sys.argv:
+        workers = int(sys.argv[sys.argv.index('--workers') + 1])
+    
+    if workers > 1:
+        run_supervisor(workers)
+    else:
+        run_connector()
 
 
 # === Windows Service Support ===
@@ -0,0 +1,233 @@
+"""
+Per-request tracing for the Data Connector.
+
+Each sampled GetFlightInfo/DoGet produces one trace: a root span for the
+request plus child spans for receive, queue, dataset resolve/load, every batch
+encode/compress and every send/drain. Spans carry request_id, partition,
+bytes, rows and codec, so connector timings can be lined up with the
+gateway-side latencies for the same request_id.
+
+Traces are written by a background thread to a rotating JSONL file. Each line
+is an OTLP/JSON ExportTraceServiceRequest, the same format the OpenTelemetry
+Collector file exporter writes, so the files can be replayed into any OTLP
+backend.
+
+Usage:
+    from tracing import tracer_from_config
+
+    tracer = tracer_from_config(config)
+    trace = tracer.start_trace("DoGet", request_id=req_id, partition=0)
+    started = time.perf_counter()
+    ...
+    trace.span("encode", started, time.perf_counter(), bytes=len(data))
+    trace.end()
+"""
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger("Tracing")
+
+SCOPE_NAME = "data-connector"
+
+# OTLP span kinds / status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+def _attribute(key: str, value) -> dict:
+    """Encode one attribute as an OTLP KeyValue."""
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        # OTLP/JSON encodes 64-bit integers as strings
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class Trace:
+    """
+    One sampled request. Spans are recorded after the fact from
+    time.perf_counter() readings, so the hot path only pays for two clock
+    reads per span.
+    """
+
+    def __init__(self, tracer: "Tracer", name: str, start: float, attributes: dict):
+        self._tracer = tracer
+        self.trace_id = os.urandom(16).hex()
+        self.root_id = os.urandom(8).hex()
+        self.name = name
+        self.start = start
+        self.attributes = attributes
+        self.spans: list[dict] = []
+        # perf_counter -> unix epoch nanoseconds
+        self._offset_ns = time.time_ns() - time.perf_counter_ns()
+
+    def _unix_ns(self, perf: float) -> str:
+        return str(int(perf * 1e9) + self._offset_ns)
+
+    def span(self, name: str, start: float, end: float, **attributes):
+        """Record a finished child span (start/end are perf_counter values)."""
+        self.spans.append({
+            "traceId": self.trace_id,
+            "spanId": os.urandom(8).hex(),
+            "parentSpanId": self.root_id,
+            "name": name,
+            "kind": SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": self._unix_ns(start),
+            "endTimeUnixNano": self._unix_ns(end),
+            "attributes": [_attribute(k, v) for k, v in attributes.items() if v is not None],
+        })
+
+    def end(self, error: str | None = None, **attributes):
+        """Close the root span and hand the trace to the writer thread."""
+        self.attributes.update(attributes)
+        root = {
+            "traceId": self.trace_id,
+            "spanId": self.root_id,
+            "name": self.name,
+            "kind": SPAN_KIND_SERVER,
+            "startTimeUnixNano": self._unix_ns(self.start),
+            "endTimeUnixNano": self._unix_ns(time.perf_counter()),
+            "attributes": [_attribute(k, v) for k, v in self.attributes.items() if v is not None],
+            "status": {"code": STATUS_ERROR, "message": error} if error else {"code": STATUS_OK},
+        }
+        self._tracer._export([root] + self.spans)
+
+
+class _NoopTrace:
+    """Returned for unsampled requests; every call is a no-op."""
+
+    def span(self, name: str, start: float, end: float, **attributes):
+        pass
+
+    def end(self, error: str | None = None, **attributes):
+        pass
+
+    def __bool__(self):
+        return False
+
+
+NOOP_TRACE = _NoopTrace()
+
+
+class Tracer:
+    """Samples requests and writes their traces to a rotating JSONL file."""
+
+    def __init__(self, path: str | Path, enabled: bool = False, sample_rate: float = 0.1,
+                 max_bytes: int = 50 * 1024 * 1024, backup_count: int = 5,
+                 service_name: str = "data-connector", max_queue: int = 1000):
+        """
+        Args:
+            path: JSONL output file (rotated to path.1 .. path.N)
+            enabled: If False, start_trace() always returns NOOP_TRACE
+            sample_rate: Fraction of requests traced (0.0 - 1.0)
+            max_bytes: Rotate the file once it exceeds this size
+            backup_count: Rotated files to keep
+            service_name: OTLP resource service.name
+            max_queue: Traces buffered for the writer; extra traces are dropped
+        """
+        self.path = Path(path)
+        self.enabled = enabled and sample_rate > 0
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.resource = {"attributes": [_attribute("service.name", service_name),
+                                        _attribute("host.name", os.uname().nodename if hasattr(os, "uname") else "")]}
+        self.dropped = 0
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def start_trace(self, name: str, start: float | None = None, **attributes) -> Trace | _NoopTrace:
+        """
+        Start a trace if this request is sampled.
+
+        Args:
+            name: Root span name (e.g. "DoGet")
+            start: perf_counter value when the request arrived (default: now)
+        """
+        if not self.enabled or random.random() >= self.sample_rate:
+            return NOOP_TRACE
+        return Trace(self, name, start or time.perf_counter(), attributes)
+
+    def close(self, timeout: float = 5.0):
+        """Flush pending traces and stop the writer thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    # =========================================================================
+    # Writer thread
+    # =========================================================================
+
+    def _export(self, spans: list[dict]):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._write_loop, name="trace-writer", daemon=True)
+                self._thread.start()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            self.dropped += 1
+
+    def _write_loop(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        f = open(self.path, "a", encoding="utf-8")
+        try:
+            while True:
+                spans = self._queue.get()
+                if spans is None:
+                    break
+                line = json.dumps({"resourceSpans": [{
+                    "resource": self.resource,
+                    "scopeSpans": [{"scope": {"name": SCOPE_NAME}, "spans": spans}],
+                }]}, separators=(",", ":"))
+                f.write(line + "\n")
+                if self._queue.empty():
+                    f.flush()
+                if f.tell() >= self.max_bytes:
+                    f.close()
+                    self._rotate()
+                    f = open(self.path, "a", encoding="utf-8")
+        except Exception as e:
+            logger.error(f"Trace writer stopped: {e}")
+        finally:
+            f.close()
+
+    def _rotate(self):
+        """path -> path.1 -> ... -> path.N (oldest discarded)"""
+        for i in range(self.backup_count - 1, 0, -1):
+            src = self.path.with_name(f"{self.path.name}.{i}")
+            if src.exists():
+                os.replace(src, self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if self.backup_count > 0:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+
+
+def tracer_from_config(config: dict, base_dir: Path | None = None) -> Tracer:
+    """Create the tracer from the 'tracing' section of config.yml."""
+    cfg = config.get('tracing', {}) or {}
+    path = Path(cfg.get('path', 'traces/connector-traces.jsonl'))
+    if not path.is_absolute():
+        path = (base_dir or Path(__file__).parent) / path
+    return Tracer(
+        path=path,
+        enabled=cfg.get('enabled', False),
+        sample_rate=cfg.get('sample_rate', 0.1),
+        max_bytes=int(cfg.get('max_file_mb', 50) * 1024 * 1024),
+        backup_count=cfg.get('backup_count', 5),
+    )
@@ -0,0 +1,106 @@
+"""
+Precarga de datasets en segundo plano.
+
+El conector se registra en el Gateway sin esperar a ningún dataset; después
+carga en un hilo, por prioridad, los datasets configurados en
+datasets.warmup. La precarga sólo llena la caché de DataLoader: el dataset
+activo y los streams en curso no cambian.
+
+Un FlightInfo de un dataset que se está precargando espera a esa carga en
+lugar de repetirla (DatasetWarmup.wait), y luego lo toma de la caché.
+"""
+import asyncio
+import logging
+import time
+
+from data_loader import DataLoader, data_loader
+
+logger = logging.getLogger("Warmup")
+
+
+class DatasetWarmup:
+    """Carga secuencial de datasets en un hilo, ordenada por prioridad"""
+
+    def __init__(self, datasets: list[dict] | None = None, enabled: bool = True, loader: DataLoader = None):
+        self.enabled = enabled
+        self.loader = loader or data_loader
+        # Menor 'priority' primero; a igual prioridad, el orden de la lista
+        self.datasets = sorted(datasets or [], key=lambda d: d.get('priority', 0))
+        self._task: asyncio.Task | None = None
+        self._pending: dict[str, asyncio.Future] = {}
+        self.completed: list[str] = []
+
+    def start(self):
+        """Programa la precarga en el event loop actual (no bloquea)"""
+        if not self.enabled or not self.datasets or self._task is not None:
+            return
+        loop = asyncio.get_running_loop()
+        # Registrar todo por adelantado: un FlightInfo puede llegar antes de que empiece su turno
+        for entry in self.datasets:
+            key = DataLoader.dataset_key(entry.get('name'), entry.get('rows'))
+            self._pending.setdefault(key, loop.create_future())
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        """Cancela la precarga pendiente (una carga ya en curso en el hilo termina sola)"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._release_waiters()
+
+    async def wait(self, dataset_name: str | None, rows: int | None = None):
+        """Espera la precarga del dataset si está pendiente o en curso"""
+        future = self._pending.get(DataLoader.dataset_key(dataset_name, rows))
+        if future is None:
+            return
+        logger.info(f"Waiting for warm-up of '{dataset_name or 'sales'}'")
+        # shield: si se cancela el request, la precarga sigue para los demás
+        await asyncio.shield(future)
+
+    async def _run(self):
+        started = time.perf_counter()
+        for entry in self.datasets:
+            name, rows = entry.get('name'), entry.get('rows')
+            key = DataLoader.dataset_key(name, rows)
+            future = self._pending.get(key)
+            if future is None or future.done():
+                continue
+            try:
+                if self.loader.is_cached(name, rows):
+                    ok = True
+                else:
+                    load_started = time.perf_counter()
+                    ok = await asyncio.to_thread(self.loader.preload, name, rows)
+                    if ok:
+                        logger.info(f"Warmed dataset '{key}' in {time.perf_counter() - load_started:.2f}s")
+                    else:
+                        logger.warning(f"Warm-up of dataset '{key}' failed")
+                if ok:
+                    self.completed.append(key)
+            except Exception as e:
+                logger.error(f"Warm-up of dataset '{key}' failed: {e}")
+            finally:
+                self._pending.pop(key, None)
+                if not future.done():
+                    future.set_result(None)
+        logger.info(f"Dataset warm-up finished in {time.perf_counter() - started:.2f}s "
+                    f"({len(self.completed)}/{len(self.datasets)} datasets)")
+
+    def _release_waiters(self):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_result(None)
+        self._pending.clear()
+
+
+def warmup_from_config(config: dict) -> DatasetWarmup:
+    """
+    Crea la precarga a partir de la sección 'datasets' de config.yml (la
+    configuración del loader la aplica data_loader.configure_loader).
+    """
+    cfg = config.get('datasets', {}) or {}
+    entries = []
+    for entry in cfg.get('warmup', []) or []:
+        # Acepta "nombre" o {name, rows, priority}
+        entries.append({'name': entry} if isinstance(entry, str) else dict(entry))
+    return DatasetWarmup(entries, enabled=cfg.get('warmup_enabled', True))